@@ -1,20 +1,29 @@
-import pandas as pd
-import matplotlib.pyplot as plt
+import argparse
 import seaborn as sns
 import os
 import numpy as np
 
+from diagramme import Diagramm, rendere_diagramme
+from glaettung import glaette_tabelle
+from hierarchie_cube import cube_ebene, lade_oder_baue_cube
+from monatscode import code_zu_datum, monats_codes
+from rohdaten_cache import load_rohdaten_cached
+from sharding import nach_werk, worker_anzahl
+from sporadisch import SPORADISCH_AB
+from tracing import TRACE_DIR, aktiviere, spanne, verfolgt
+
 sns.set_theme(style="whitegrid")
 
+@verfolgt
 def load_data(filepath="dieEchtenDaten.xlsb"):
     """
-    Lädt die Excel-Rohdaten.
+    Lädt die Excel-Rohdaten (über den Parquet-Cache, siehe rohdaten_cache.py).
     """
     try:
-        df_raw = pd.read_excel(filepath, engine="pyxlsb")
+        df_raw = load_rohdaten_cached(filepath, engine="pyxlsb")
         print(f"Datei '{filepath}' erfolgreich geladen: {df_raw.shape[0]} Zeilen, {df_raw.shape[1]} Spalten.")
         
-        df_raw['bedmo_date'] = pd.to_datetime(df_raw['bedmo'], format='%Y%m')
+        df_raw['bedmo_date'] = code_zu_datum(monats_codes(df_raw['bedmo']))
         
     except FileNotFoundError:
         print(f"FEHLER: Datei nicht gefunden: '{filepath}'")
@@ -27,42 +36,27 @@ def load_data(filepath="dieEchtenDaten.xlsb"):
 
 # --- Schritt 2: Effizient Aggregieren ---
 
-def aggregate_data(data):
+@verfolgt
+def aggregate_data_aus_cube(cube):
     """
-    Aggregiert die Rohdaten auf die beiden geforderten Ebenen:
+    Aggregiert auf die beiden geforderten Ebenen:
     1. Pro Baumarkt & Monat
-    2. Pro Baumarktartikel & Monat
+    2. Pro Baumarktartikel (Teilegruppe) & Monat
+    als Abfrage auf den Hierarchie-Cube (siehe hierarchie_cube.py) statt
+    neuer groupby-Läufe über die Rohdaten.
+    Es werden nur Monate mit Ist-Daten (bedmo) geliefert; die Prognosen
+    stehen im Cube unter ihrem eigenen Prognosemonat (progmo/progmo2).
     """
-    
-    # Aggregations-Logik definieren
-    agg_definition = {
-        "wavor_bstlmg": "sum",
-        "progmo": "first",
-        "prog_mg1": "sum",
-        "progmo2": "first",
-        "prog_mg2": "sum",
-    }
-    
-    # --- 1. Aggregation pro Baumarkt & Monat ---
-    print("Aggregiere Daten pro Baumarkt und Monat...")
-    df_baumarkt_agg = (
-        data.groupby(["werk", "bedmo_date"])
-        .agg(agg_definition)
-        .reset_index()
-    )
-    df_baumarkt_agg = df_baumarkt_agg.sort_values(by=["werk", "bedmo_date"])
-    
-    # --- 2. Aggregation pro Baumarktartikel & Monat ---
-    print("Aggregiere Daten pro Baumarktartikel und Monat...")
-    df_artikelgruppe_agg = (
-        data.groupby(["modulgruppen", "bedmo_date"])
-        .agg(agg_definition)
-        .reset_index()
-    )
-    df_artikelgruppe_agg = df_artikelgruppe_agg.sort_values(by=["modulgruppen", "bedmo_date"])
+    ergebnisse = []
+    for ebene, spalte in (("Kunde", "werk"), ("Teilegruppe", "modulgruppen")):
+        print(f"Lese Ebene '{ebene}' x Monat aus dem Cube...")
+        df = cube_ebene(cube, ebene).dropna(subset=["wavor_bstlmg"])
+        df = df.rename(columns={ebene: spalte})
+        df.insert(1, "bedmo_date", code_zu_datum(df.pop("Monat")))
+        ergebnisse.append(df.sort_values(by=[spalte, "bedmo_date"]).reset_index(drop=True))
 
     print("Aggregation abgeschlossen.")
-    return df_baumarkt_agg, df_artikelgruppe_agg
+    return ergebnisse[0], ergebnisse[1]
 
 
 # --- Schritt 3: Störgrößen erkennen UND Glätten  ---
@@ -70,6 +64,8 @@ def aggregate_data(data):
 def detect_and_smooth(df_group, metric_col='wavor_bstlmg', window=3):
     """
     VERBESSERTE Version: Findet Ausreißer basierend auf prozentualer Abweichung.
+    Für viele Serien auf einmal: glaettung.glaette_gruppen (gleiches Ergebnis
+    bis auf Rundung in der letzten Stelle).
     """
     df_group = df_group.copy()
     
@@ -88,43 +84,62 @@ def detect_and_smooth(df_group, metric_col='wavor_bstlmg', window=3):
     return df_group
 
 # --- Schritt 4: PLOT-FUNKTIONEN FÜR DIE PRÄSENTATION ---
+#     plot_task_*: bereiten die Daten auf und liefern einen Diagramm-Auftrag,
+#     zeichne_*: zeichnen ihn (siehe diagramme.py, nur bei geänderten Daten)
+
+def zeichne_trends(fig, df_trend):
+    ax = fig.subplots()
+    sns.lineplot(data=df_trend, x='bedmo_date', y='Gesamtvolumen', linewidth=2.5, ax=ax)
+    sns.lineplot(data=df_trend, x='bedmo_date', y='Trend_geglaettet', color='red', linestyle='--', label='6-Monats-Trend', ax=ax)
+    
+    ax.set_title('Analyse: Gesamtmarkt-Trend (Alle Baumärkte)', fontsize=16)
+    ax.set_ylabel('Summiertes Bestellvolumen (wavor_bstlmg)')
+    ax.set_xlabel('Monat')
+    ax.legend()
+    fig.tight_layout()
 
-def plot_task_trends(df_baumarkt_agg, output_dir):
+@verfolgt(kategorie="plot")
+def plot_task_trends(df_baumarkt_agg):
     """
     AUFGABE: Analyse von Trends (Gesamtmarkt)
     Erstellt einen Plot, der den Gesamt-Trend aller Verkäufe zeigt.
     """
-    print("Erstelle Plot: 1_Gesamtmarkt_Trend.png")
-    
     # Alle Baumärkte pro Monat summieren, um den Gesamtmarkt zu erhalten
     df_trend = df_baumarkt_agg.groupby('bedmo_date').agg(Gesamtvolumen=('wavor_bstlmg', 'sum')).reset_index()
     
-    plt.figure(figsize=(12, 6))
-    sns.lineplot(data=df_trend, x='bedmo_date', y='Gesamtvolumen', linewidth=2.5)
-    
     # Einen geglätteten Trend (gleitender Durchschnitt) hinzufügen
     df_trend['Trend_geglaettet'] = df_trend['Gesamtvolumen'].rolling(window=6, center=True, min_periods=1).mean()
-    sns.lineplot(data=df_trend, x='bedmo_date', y='Trend_geglaettet', color='red', linestyle='--', label='6-Monats-Trend')
-    
     
+    return Diagramm("1_Gesamtmarkt_Trend.png", zeichne_trends, {"df_trend": df_trend},
+                    figsize=(12, 6), dpi="figure")
+
+def zeichne_seasonality(fig, df_top_groups):
+    ax = fig.subplots()
+    sns.lineplot(
+        data=df_top_groups,
+        x='bedmo_date',
+        y='wavor_bstlmg',
+        hue='modulgruppen', 
+        style='modulgruppen', 
+        linewidth=2,
+        markers=True,
+        ax=ax
+    )
     
-    plt.title('Analyse: Gesamtmarkt-Trend (Alle Baumärkte)', fontsize=16)
-    plt.ylabel('Summiertes Bestellvolumen (wavor_bstlmg)')
-    plt.xlabel('Monat')
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, "1_Gesamtmarkt_Trend.png"))
-    plt.close()
-
-def plot_task_seasonality(df_artikelgruppe_agg, output_dir):
+    ax.set_title('Analyse: Saisonalität (Top 5 Gruppen mit höchster Schwankung)', fontsize=16)
+    ax.set_ylabel('Bestellvolumen (wavor_bstlmg)')
+    ax.set_xlabel('Monat')
+    ax.legend(title='Artikelgruppe', bbox_to_anchor=(1.02, 1), loc='upper left')
+    fig.tight_layout()
+
+@verfolgt(kategorie="plot")
+def plot_task_seasonality(df_artikelgruppe_agg):
     """
     AUFGABE: Analyse von Saisonalität (auf Teilegruppen-Ebene)
     
     NEU: Zeigt die 5 Gruppen mit der HÖCHSTEN SCHWANKUNG (Volatilität),
     nicht das höchste Gesamtvolumen.
     """
-    print("Erstelle Plot: 2_Saisonalitaet_Staerste_Schwankung.png")
-    
     # Berechne die Volatilität (Schwankung) für jede Gruppe
     # Wir nutzen den Variationskoeffizienten (Std / Mean)
     df_volatility = df_artikelgruppe_agg.groupby('modulgruppen')['wavor_bstlmg'].agg(
@@ -142,84 +157,54 @@ def plot_task_seasonality(df_artikelgruppe_agg, output_dir):
 
     df_top_groups = df_artikelgruppe_agg[df_artikelgruppe_agg['modulgruppen'].isin(top_volatile_groups)]
 
-    plt.figure(figsize=(12, 7))
-    sns.lineplot(
-        data=df_top_groups,
-        x='bedmo_date',
-        y='wavor_bstlmg',
-        hue='modulgruppen', 
-        style='modulgruppen', 
-        linewidth=2,
-        markers=True
-    )
-    
+    return Diagramm("2_Saisonalitaet_Staerste_Schwankung.png", zeichne_seasonality,
+                    {"df_top_groups": df_top_groups}, figsize=(12, 7), dpi="figure")
     
+def zeichne_outliers(fig, df_plot, example_group_name):
+    outliers = df_plot[df_plot['is_outlier']]
+    ax = fig.subplots()
     
-    plt.title('Analyse: Saisonalität (Top 5 Gruppen mit höchster Schwankung)', fontsize=16)
-    plt.ylabel('Bestellvolumen (wavor_bstlmg)')
-    plt.xlabel('Monat')
-    plt.legend(title='Artikelgruppe', bbox_to_anchor=(1.02, 1), loc='upper left')
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, "2_Saisonalitaet_Staerste_Schwankung.png"))
-    plt.close()
-    
-def plot_task_outliers(df_baumarkt_smoothed, output_dir):
+    sns.lineplot(data=df_plot, x='bedmo_date', y='wavor_bstlmg_geglättet', 
+                 label='Geglättete Daten (Prognosebasis)', color='blue', linewidth=2.5, zorder=3, ax=ax)
+                 
+    sns.scatterplot(data=df_plot, x='bedmo_date', y='wavor_bstlmg', 
+                    label='Original IST-Daten', color='gray', alpha=0.6, zorder=2, ax=ax)
+                    
+    if not outliers.empty:
+        sns.scatterplot(data=outliers, x='bedmo_date', y='wavor_bstlmg', 
+                        label='Erkannte Störgröße (z.B. Umbau)', color='red', s=150, zorder=5, ax=ax)
+
+    ax.set_title(f'Analyse: Störgrößen & Glättung (Beispiel: Baumarkt {example_group_name})', fontsize=16)
+    ax.set_ylabel('Bestellvolumen (wavor_bstlmg)')
+    ax.set_xlabel('Monat')
+    ax.legend()
+    fig.tight_layout()
+
+@verfolgt(kategorie="plot")
+def plot_task_outliers(df_baumarkt_smoothed):
     """
     AUFGABE: Analyse von Ausreißern (auf Kunden-Ebene)
     Zeigt ein klares Beispiel für eine Störgröße und deren Glättung.
     """
-    print("Erstelle Plot: 3_Ausreisser_Glaettung.png")
-    
     # Finde den Baumarkt mit den meisten Ausreißern als gutes Beispiel
     outlier_counts = df_baumarkt_smoothed.groupby('werk')['is_outlier'].sum().nlargest(1)
     
     if outlier_counts.empty:
         print("Keine Ausreißer gefunden. Überspringe Plot.")
-        return
+        return None
         
     example_group_name = outlier_counts.index[0]
-    df_group = df_baumarkt_smoothed[df_baumarkt_smoothed['werk'] == example_group_name]
-    
-    
-    df_plot = df_group.copy()
-    outliers = df_plot[df_plot['is_outlier']]
-
-    plt.figure(figsize=(12, 6))
-    
-    sns.lineplot(data=df_plot, x='bedmo_date', y='wavor_bstlmg_geglättet', 
-                 label='Geglättete Daten (Prognosebasis)', color='blue', linewidth=2.5, zorder=3)
-                 
-    sns.scatterplot(data=df_plot, x='bedmo_date', y='wavor_bstlmg', 
-                    label='Original IST-Daten', color='gray', alpha=0.6, zorder=2)
-                    
-    if not outliers.empty:
-        sns.scatterplot(data=outliers, x='bedmo_date', y='wavor_bstlmg', 
-                        label='Erkannte Störgröße (z.B. Umbau)', color='red', s=150, zorder=5)
-
+    df_plot = df_baumarkt_smoothed[df_baumarkt_smoothed['werk'] == example_group_name]
     
-    
-    plt.title(f'Analyse: Störgrößen & Glättung (Beispiel: Baumarkt {example_group_name})', fontsize=16)
-    plt.ylabel('Bestellvolumen (wavor_bstlmg)')
-    plt.xlabel('Monat')
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, "3_Ausreisser_Glaettung.png"))
-    plt.close()
+    return Diagramm("3_Ausreisser_Glaettung.png", zeichne_outliers,
+                    {"df_plot": df_plot, "example_group_name": example_group_name},
+                    figsize=(12, 6), dpi="figure")
 
 
 # --- NEUE FUNKTION: Plot 4  ---
 
-def plot_task_trends_per_baumarkt(df_baumarkt_agg, output_dir, top_n=10):
-    """
-    AUFGABE: Analyse von Trends pro Baumarkt (Top-Kunden)
-    Erstellt einen Plot, der die Trends der Top N Baumärkte vergleicht.
-    """
-    print(f"Erstelle Plot: 4_Top_{top_n}_Baumarkt_Trends.png")
-    
-    top_baumaerkte = df_baumarkt_agg.groupby('werk')['wavor_bstlmg'].sum().nlargest(top_n).index
-    df_top_baumaerkte = df_baumarkt_agg[df_baumarkt_agg['werk'].isin(top_baumaerkte)]
-    
-    plt.figure(figsize=(12, 7))
+def zeichne_trends_per_baumarkt(fig, df_top_baumaerkte, top_n):
+    ax = fig.subplots()
     sns.lineplot(
         data=df_top_baumaerkte,
         x='bedmo_date',
@@ -227,22 +212,33 @@ def plot_task_trends_per_baumarkt(df_baumarkt_agg, output_dir, top_n=10):
         hue='werk', 
         style='werk', 
         linewidth=2,
-        markers=True
+        markers=True,
+        ax=ax
     )
     
+    ax.set_title(f'Analyse: Kunden-Trends (Top {top_n} Werke)', fontsize=16)
+    ax.set_ylabel('Summiertes Bestellvolumen (wavor_bstlmg)')
+    ax.set_xlabel('Monat')
+    ax.legend(title='Werk', bbox_to_anchor=(1.02, 1), loc='upper left')
+    fig.tight_layout()
+
+@verfolgt(kategorie="plot")
+def plot_task_trends_per_baumarkt(df_baumarkt_agg, top_n=10):
+    """
+    AUFGABE: Analyse von Trends pro Baumarkt (Top-Kunden)
+    Erstellt einen Plot, der die Trends der Top N Baumärkte vergleicht.
+    """
+    top_baumaerkte = df_baumarkt_agg.groupby('werk')['wavor_bstlmg'].sum().nlargest(top_n).index
+    df_top_baumaerkte = df_baumarkt_agg[df_baumarkt_agg['werk'].isin(top_baumaerkte)]
     
-    
-    plt.title(f'Analyse: Kunden-Trends (Top {top_n} Werke)', fontsize=16)
-    plt.ylabel('Summiertes Bestellvolumen (wavor_bstlmg)')
-    plt.xlabel('Monat')
-    plt.legend(title='Werk', bbox_to_anchor=(1.02, 1), loc='upper left')
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, f"4_Top_{top_n}_Baumarkt_Trends.png"))
-    plt.close()
+    return Diagramm(f"4_Top_{top_n}_Baumarkt_Trends.png", zeichne_trends_per_baumarkt,
+                    {"df_top_baumaerkte": df_top_baumaerkte, "top_n": top_n},
+                    figsize=(12, 7), dpi="figure")
 
 
 
-def main():
+@verfolgt
+def main(workers=1):
     # Output-Verzeichnisse erstellen
     os.makedirs("./output", exist_ok=True)
     plot_dir = "./output/plots/1"
@@ -254,34 +250,57 @@ def main():
         print("Daten konnten nicht geladen werden. Skript wird beendet.")
         return
 
-    # 2. Aggregieren (Ebenen 3 und 4)
-    df_baumarkt_agg, df_artikelgruppe_agg = aggregate_data(data)
+    # 2. Aggregieren (Ebenen 3 und 4) - einmal alle Ebenen in den Cube
+    #    (bei workers > 1 nach Werk aufgeteilt), danach nur noch Abfragen
+    cube = lade_oder_baue_cube(data=data, workers=workers)
+    df_baumarkt_agg, df_artikelgruppe_agg = aggregate_data_aus_cube(cube)
     
     # 3. Glättungs-Daten berechnen (Notwendig für den Ausreißer-Plot)
     print("\nStarte Analyse & Glättung für 'Werk'...")
-    df_baumarkt_smoothed = (
-        df_baumarkt_agg.groupby('werk')
-        .apply(detect_and_smooth)
-        .reset_index(drop=True)
-    )
-    
-    # 4. PRÄSENTATIONS-PLOTS ERSTELLEN
-    
-    # Plot 1: Gesamt-Trend
-    plot_task_trends(df_baumarkt_agg, plot_dir)
-    
-    # Plot 2: Saisonalität
-    plot_task_seasonality(df_artikelgruppe_agg, plot_dir)
-    
-    # Plot 3: Ausreißer / Störgrößen
-    plot_task_outliers(df_baumarkt_smoothed, plot_dir)
-    
-    # Plot 4: Trends pro Baumarkt
-    plot_task_trends_per_baumarkt(df_baumarkt_agg, plot_dir, top_n=10)
+    #    (alle Werke auf einmal aus dem Panel Werk x Monat, gleiche Regeln wie
+    #    detect_and_smooth; fehlende Monate zählen als 0 statt übersprungen zu werden;
+    #    bei workers > 1 nach Werk aufgeteilt)
+    #    (sporadische Werke mit vielen Nullmonaten: Nullen sind keine Störgröße)
+    with spanne("glaettung", zeilen=len(df_baumarkt_agg)):
+        df_baumarkt_smoothed = nach_werk(
+            glaette_tabelle,
+            [df_baumarkt_agg[['werk', 'bedmo_date', 'wavor_bstlmg']]],
+            'werk',
+            workers,
+            spalte='werk',
+            metric_col='wavor_bstlmg',
+            monat_spalte='bedmo_date',
+            sporadisch_ab=SPORADISCH_AB,
+        )
+    df_baumarkt_smoothed['bedmo_date'] = code_zu_datum(df_baumarkt_smoothed.pop('Monat'))
+    
+    # 4. PRÄSENTATIONS-PLOTS ERSTELLEN (nur geänderte werden neu gezeichnet)
+    diagramme = [
+        # Plot 1: Gesamt-Trend
+        plot_task_trends(df_baumarkt_agg),
+        # Plot 2: Saisonalität
+        plot_task_seasonality(df_artikelgruppe_agg),
+        # Plot 3: Ausreißer / Störgrößen
+        plot_task_outliers(df_baumarkt_smoothed),
+        # Plot 4: Trends pro Baumarkt
+        plot_task_trends_per_baumarkt(df_baumarkt_agg, top_n=10),
+    ]
+    rendere_diagramme([d for d in diagramme if d is not None], plot_dir, workers)
     
     print(f"\nAlle Analyse-Plots wurden im Ordner '{plot_dir}' gespeichert.")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Datenverständnis: Aggregation, Glättung, Plots")
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Prozesse für Cube, Glättung und Plots (0 = alle Kerne)"
+    )
+    parser.add_argument(
+        "--trace",
+        default=TRACE_DIR,
+        help="Ordner für eine Chrome-Trace-Datei mit Zeit/Speicher pro Stufe",
+    )
+    args = parser.parse_args()
+    aktiviere(args.trace)
+    main(worker_anzahl(args.workers))
 
 
@@ -1,14 +1,40 @@
+import argparse
 import pandas as pd
 import numpy as np
 import os
-from datetime import datetime
+import time
 import warnings
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 
-warnings.filterwarnings("ignore")
+from diagramme import Diagramm, trage_ein, zeichne_offene
+from hierarchie_cube import cube_ebene, lade_oder_baue_cube
+from monatscode import UNGUELTIG_CODE, monats_codes
+from panel import baue_panels
+from programmblatt import parse_programmblatt
+from rohdaten_cache import load_rohdaten_cached
+from rohdaten_stream import aggregiere_chunkweise, iter_rohdaten_chunks
+from sharding import nach_werk, worker_anzahl
+from tracing import TRACE_DIR, aktiviere, verfolgt
 
+warnings.filterwarnings("ignore")
 
+# --- KONFIGURATION ---
+INPUT_FILE_ROHDATEN = "dieEchtenDaten.xlsb"
+# > 0: Rohdaten im Stream lesen (nur benötigte Spalten, Chunks dieser Größe)
+STREAM_CHUNKSIZE = 0
+ROHDATEN_SPALTEN = [
+    "werk",
+    "bedmo",
+    "wavor_bstlmg",
+    "progmo",
+    "prog_mg1",
+    "progmo2",
+    "prog_mg2",
+]
+
+
+@verfolgt
 def load_rohdaten():
     """
     Lädt die Rohdaten aus rohdaten.xlsx
@@ -17,7 +43,7 @@ def load_rohdaten():
         pd.DataFrame: Rohdaten mit Bestellinformationen
     """
     try:
-        df_raw = pd.read_excel("dieEchtenDaten.xlsb", engine="pyxlsb")
+        df_raw = load_rohdaten_cached(INPUT_FILE_ROHDATEN, engine="pyxlsb")
         print(
             f"✅ Rohdaten geladen: {df_raw.shape[0]} Zeilen, {df_raw.shape[1]} Spalten"
         )
@@ -37,6 +63,30 @@ def load_rohdaten():
         return None
 
 
+@verfolgt
+def load_cube():
+    """
+    Lädt den Hierarchie-Cube zu den Rohdaten (siehe hierarchie_cube.py).
+    Die Rohdaten selbst werden nur gelesen, wenn der Cube noch nicht existiert.
+
+    Returns:
+        pd.DataFrame: Cube mit allen Ebenen x Monat
+    """
+    try:
+        cube = lade_oder_baue_cube(INPUT_FILE_ROHDATEN)
+        print(f"✅ Cube geladen: {len(cube)} Zellen")
+        return cube
+
+    except FileNotFoundError:
+        print(f"❌ Datei '{INPUT_FILE_ROHDATEN}' nicht gefunden!")
+        return None
+
+    except Exception as e:
+        print(f"❌ Fehler beim Laden des Cubes: {e}")
+        return None
+
+
+@verfolgt
 def load_baumarktprogramm():
     """
     Lädt das Werkprogramm aus BAUMARKTPROGRAMM.xlsx
@@ -65,21 +115,22 @@ def load_baumarktprogramm():
         return None
 
 
-def agg_Rohdaten(data):
+def _teilaggregate_rohdaten(data):
     """
-    Aggregiert Rohdaten mit Integration der Prognosedaten.
-    Prognosemonate werden unter wavor_bstlmg angezeigt.
-    Bei doppelten Daten wird der größere Wert genommen.
+    Schritte 1-2 von agg_Rohdaten: Bestellungen und beide Prognosen
+    jeweils pro Werk/Monat summieren (Spalten: werk, bedmo, wavor_bstlmg).
     """
 
     # Schritt 1: Normale Bestelldaten aggregieren
     bestelldaten_agg = (
-        data.groupby(["werk", "bedmo"]).agg({"wavor_bstlmg": "sum"}).reset_index()
+        data.groupby(["werk", "bedmo"], observed=True)
+        .agg({"wavor_bstlmg": "sum"})
+        .reset_index()
     )
 
     # Schritt 2: Prognosedaten als zusätzliche 'bedmo' behandeln
     prognose1 = (
-        data.groupby(["werk", "progmo"])
+        data.groupby(["werk", "progmo"], observed=True)
         .agg({"prog_mg1": "sum"})
         .reset_index()
         .copy()
@@ -89,7 +140,7 @@ def agg_Rohdaten(data):
     )
 
     prognose2 = (
-        data.groupby(["werk", "progmo2"])
+        data.groupby(["werk", "progmo2"], observed=True)
         .agg({"prog_mg2": "sum"})
         .reset_index()
         .copy()
@@ -98,38 +149,26 @@ def agg_Rohdaten(data):
         columns={"progmo2": "bedmo", "prog_mg2": "wavor_bstlmg"}
     )
 
+    return [bestelldaten_agg, prognose1, prognose2]
+
+
+def _finalisiere_rohdaten(teile):
+    """
+    Schritte 3-6 von agg_Rohdaten auf den Teilaggregaten.
+    """
+
     # Schritt 3: Zusammenfügen (Bestellungen + Prognosen)
-    combined = pd.concat(
-        [bestelldaten_agg, prognose1, prognose2], ignore_index=True, sort=False
-    )
+    combined = pd.concat(teile, ignore_index=True, sort=False)
 
     # Schritt 4: Fehlende oder ungültige Monate entfernen und Monat normalisieren
     combined = combined.dropna(subset=["bedmo", "wavor_bstlmg"])
 
-    def _normalize_month(val):
-        try:
-            if isinstance(val, float) and np.isnan(val):
-                return np.nan
-            if isinstance(val, float):
-                # z.B. 202610.0 -> 202610
-                return int(val)
-            if isinstance(val, (int, np.integer)):
-                return int(val)
-            if isinstance(val, (pd.Timestamp, datetime)):
-                return int(val.strftime("%Y%m"))
-            s = str(val).strip()
-            if s.endswith(".0"):
-                s = s[:-2]
-            return int(s)
-        except Exception:
-            return np.nan
-
-    combined["bedmo"] = combined["bedmo"].apply(_normalize_month)
-    combined = combined.dropna(subset=["bedmo"])
+    combined["bedmo"] = monats_codes(combined["bedmo"])
+    combined = combined[combined["bedmo"] != UNGUELTIG_CODE].copy()
     combined["bedmo"] = combined["bedmo"].astype(int)
 
     # Schritt 5: Bei doppelten Werk/bedmo den größeren Wert nehmen
-    finale_daten = combined.groupby(["werk", "bedmo"], as_index=False).agg(
+    finale_daten = combined.groupby(["werk", "bedmo"], as_index=False, observed=True).agg(
         {"wavor_bstlmg": "max"}
     )
 
@@ -144,83 +183,130 @@ def agg_Rohdaten(data):
     return finale_daten
 
 
+@verfolgt
+def agg_Rohdaten(data):
+    """
+    Aggregiert Rohdaten mit Integration der Prognosedaten.
+    Prognosemonate werden unter wavor_bstlmg angezeigt.
+    Bei doppelten Daten wird der größere Wert genommen.
+    """
+    return _finalisiere_rohdaten(_teilaggregate_rohdaten(data))
+
+
+@verfolgt
+def agg_Rohdaten_aus_cube(cube):
+    """
+    Wie agg_Rohdaten, aber als Abfrage auf die Kunde-Ebene des Cubes:
+    Bestellungen (nach bedmo) und beide Prognosen (nach progmo/progmo2)
+    liegen dort schon pro Werk/Monat summiert vor, pro Zelle wird wie
+    bisher der größte der drei Werte genommen.
+    Zellen ohne Werte (im Cube NaN) zählen wie bei groupby().sum() als 0
+    und bleiben erhalten.
+    """
+    kunde = cube_ebene(cube, "Kunde")
+    werte = kunde[["wavor_bstlmg", "prog_mg1", "prog_mg2"]]
+    finale_daten = pd.DataFrame(
+        {
+            "Werk": kunde["Kunde"],
+            "Monat": kunde["Monat"].astype(int),
+            "Zahl": werte.max(axis=1).fillna(0.0),
+        }
+    )
+    return finale_daten.sort_values(["Werk", "Monat"]).reset_index(drop=True)
+
+
+@verfolgt
+def agg_Rohdaten_chunked(chunks):
+    """
+    Wie agg_Rohdaten, aber über einen Chunk-Iterator (siehe rohdaten_stream.py).
+    Die drei Teilaggregate (Bestellungen, Prognose 1, Prognose 2) werden pro
+    Chunk gestapelt und mit aggregiere_chunkweise sofort verdichtet, der
+    Speicherbedarf bleibt dadurch bei einem Chunk plus Werk x Monat.
+    """
+
+    def gestapelt():
+        for chunk in chunks:
+            teile = _teilaggregate_rohdaten(chunk)
+            yield pd.concat(
+                [teil.assign(quelle=i) for i, teil in enumerate(teile)], ignore_index=True
+            )
+
+    summen = aggregiere_chunkweise(
+        gestapelt(), ["quelle", "werk", "bedmo"], {"wavor_bstlmg": "sum"}
+    )
+    if summen.empty:
+        return pd.DataFrame(columns=["Werk", "Monat", "Zahl"])
+    teile = [
+        summen.loc[summen["quelle"] == i, ["werk", "bedmo", "wavor_bstlmg"]] for i in range(3)
+    ]
+    return _finalisiere_rohdaten(teile)
+
+
+@verfolgt
 def agg_Werkprogramm(data):
     """
     Wandelt das BAUMARKTPROGRAMM-DataFrame in langes Format um:
     Spalten: ['Werk', 'Monat', 'Zahl']
     Monat ist im Format JJJJMM (int). Fehlende Werte werden als 0 behandelt.
-    Mapping der Spaltenbereiche:
-      2025: E-P  (Index 4-15)
-      2026: R-AC (Index 17-28)
-      2027: AE-AP (Index 30-41)
-      2028: AR-BC (Index 43-54)
+    Die Jahresblöcke (Jahr im Spaltenkopf, JAN-DEZ in der Beschriftungszeile)
+    werden automatisch erkannt, siehe programmblatt.py.
     Entfernt Zeilen, bei denen die Werk-Spalte den Text "Werk" enthält.
     """
-    if data is None or data.empty:
-        return pd.DataFrame(columns=["Werk", "Monat", "Zahl"])
+    return parse_programmblatt(data, key_name="Werk")
+
+
+def zeichne_vergleich(fig, bm, dates, werte_r, werte_p):
+    """Vergleichsplot eines Werks (Rohdaten vs. skaliertes Werkprogramm)."""
+    series_r = pd.Series(werte_r, index=dates)
+    series_p = pd.Series(werte_p, index=dates)
+
+    # Skalierungsfaktor berechnen (auf Basis des Maximums)
+    max_r = series_r.max()
+    max_p = series_p.max()
+    factor = 1.0
+    if max_p > 0 and max_r > 0:
+        factor = max_r / max_p
+
+    # Plot erstellen
+    ax = fig.subplots()
+    ax.plot(
+        dates,
+        series_r.values,
+        label="Rohdaten",
+        color="C0",
+        marker="o",
+        linewidth=1,
+    )
+    if series_p.sum() > 0:
+        ax.plot(
+            dates,
+            (series_p * factor).values,
+            label=f"Werkprogramm (skaliert)",
+            color="C1",
+            linestyle="--",
+            marker="s",
+            linewidth=1,
+        )
 
-    # Spaltenbereiche (Index)
-    spalten_mapping = {
-        "2025": list(range(4, 16)),  # E-P -> 4..15
-        "2026": list(range(17, 29)),  # R-AC -> 17..28
-        "2027": list(range(30, 42)),  # AE-AP -> 30..41
-        "2028": list(range(43, 55)),  # AR-BC -> 43..54
-    }
-
-    rows = []
-    for _, row in data.iterrows():
-        baumarkt = row.iloc[0]
-        if pd.isna(baumarkt):
-            continue
-        bname = str(baumarkt).strip()
-        if bname == "" or bname.lower() == "werk":
-            continue
-        for jahr, indices in spalten_mapping.items():
-            for m_idx in range(12):
-                col_idx = indices[m_idx] if m_idx < len(indices) else None
-                wert = 0.0
-                if col_idx is not None and col_idx < len(row):
-                    val = row.iloc[col_idx]
-                    if pd.notna(val):
-                        try:
-                            wert = float(val)
-                        except Exception:
-                            try:
-                                wert = float(
-                                    str(val).replace(",", ".").replace(" ", "")
-                                )
-                            except Exception:
-                                wert = 0.0
-                monat_code = int(f"{jahr}{m_idx+1:02d}")
-                rows.append({"Werk": bname, "Monat": monat_code, "Zahl": wert})
-
-    result = pd.DataFrame(rows, columns=["Werk", "Monat", "Zahl"])
-    # Falls mehrere Zeilen für gleichen Werk/Monat existieren, zusammenfassen (Summe)
-    result = result.groupby(["Werk", "Monat"], as_index=False).agg({"Zahl": "sum"})
-    # Entferne eventuelle verbleibende Zeilen mit dem Wort "baumarkt"
-    result = result[
-        ~result["Werk"].astype(str).str.strip().str.lower().eq("werk")
-    ]
-    result = result.sort_values(["Werk", "Monat"]).reset_index(drop=True)
-    return result
+    # Formatierung
+    ax.set_title(f"{bm} — Rohdaten vs. Werkprogramm")
+    ax.set_xlabel("Monat")
+    ax.set_ylabel("Zahl (Programm skaliert)")
+    ax.xaxis.set_major_locator(mdates.AutoDateLocator())
+    ax.xaxis.set_major_formatter(mdates.DateFormatter("%Y-%m"))
+    plt.setp(ax.get_xticklabels(), rotation=45, ha="right")
+    ax.legend()
+    ax.grid(alpha=0.3)
+    fig.tight_layout()
 
 
-def plot_vergleich_baumarkt(rohdaten_agg, baumarkt_prog, out_dir="./output/images"):
+def vergleich_pro_werk(rohdaten_agg, baumarkt_prog, out_dir):
     """
-    Vergleichsplots pro Werk:
-    - Maßstab der Achsen ist angepasst
+    Vergleichsplots der Werke in rohdaten_agg/baumarkt_prog aufbereiten und
+    die geänderten zeichnen (siehe diagramme.zeichne_offene). Jedes Werk
+    hängt nur von seinen eigenen Zeilen ab, die Funktion läuft also auch
+    pro Shard in einem Worker (sharding.nach_werk).
     """
-    os.makedirs(out_dir, exist_ok=True)
-
-    # Prüfung der benötigten Spalten
-    required = {"Werk", "Monat", "Zahl"}
-    if not required.issubset(set(rohdaten_agg.columns)) or not required.issubset(
-        set(baumarkt_prog.columns)
-    ):
-        raise ValueError(
-            "Beide DataFrames müssen die Spalten 'Werk', 'Monat' und 'Zahl' enthalten."
-        )
-
     # Alle Baumärkte aus beiden DataFrames
     baumaerkte = sorted(
         set(rohdaten_agg["Werk"].dropna().unique()).union(
@@ -228,138 +314,99 @@ def plot_vergleich_baumarkt(rohdaten_agg, baumarkt_prog, out_dir="./output/image
         )
     )
 
-    def _to_datetime_month(series):
-        # Konvertieren von Monat (JJJJMM) in datetime (erster Tag im Monat)
-        s = series.dropna().astype(str).str.strip()
-        s = s.str.replace(r"\.0$", "", regex=True)
-        s = s[s.str.match(r"^\d{6}$")]
-        result = pd.to_datetime(
-            series.astype(str).str.replace(r"\.0$", "", regex=True),
-            format="%Y%m",
-            errors="coerce",
-        )
-        return result
+    # Beide Tabellen als Panel Werk x Monat mit gemeinsamer Monatsachse,
+    # fehlende Monate sind 0 (siehe panel.py)
+    (panel_r, panel_p), _ = baue_panels(
+        [rohdaten_agg, baumarkt_prog], ["Werk"], ["Zahl", "Zahl"]
+    )
+    datum = pd.DatetimeIndex(panel_r.datum)
 
+    diagramme = []
     for bm in baumaerkte:
-        df_r = rohdaten_agg[rohdaten_agg["Werk"] == bm][["Monat", "Zahl"]].copy()
-        df_p = baumarkt_prog[baumarkt_prog["Werk"] == bm][["Monat", "Zahl"]].copy()
-
-        if df_r.empty and df_p.empty:
-            continue
-
-        # Monat -> datetime
-        df_r["Month_dt"] = (
-            _to_datetime_month(df_r["Monat"])
-            if not df_r.empty
-            else pd.Series(dtype="datetime64[ns]")
-        )
-        df_p["Month_dt"] = (
-            _to_datetime_month(df_p["Monat"])
-            if not df_p.empty
-            else pd.Series(dtype="datetime64[ns]")
-        )
+        werk_r, werk_p = panel_r[bm], panel_p[bm]
 
-        # Drop Zeilen ohne gültiges Datum
-        if not df_r.empty:
-            df_r = df_r.dropna(subset=["Month_dt"]).copy()
-        if not df_p.empty:
-            df_p = df_p.dropna(subset=["Month_dt"]).copy()
-
-        # gemeinsamer Zeitraum bestimmen
-        min_dt = None
-        max_dt = None
-        if not df_r.empty:
-            min_dt = df_r["Month_dt"].min()
-            max_dt = df_r["Month_dt"].max()
-        if not df_p.empty:
-            if min_dt is None or (df_p["Month_dt"].min() < min_dt):
-                min_dt = df_p["Month_dt"].min()
-            if max_dt is None or (df_p["Month_dt"].max() > max_dt):
-                max_dt = df_p["Month_dt"].max()
-
-        if min_dt is None or max_dt is None:
+        # gemeinsamer Zeitraum: erster bis letzter Monat mit Daten in einer der Quellen
+        belegt = np.flatnonzero(werk_r.belegt | werk_p.belegt)
+        if len(belegt) == 0:
             continue
+        von, bis = belegt[0], belegt[-1] + 1
 
-        # vollständige Monatsreihe
-        dates = pd.date_range(start=min_dt, end=max_dt, freq="MS")
-        df_full = pd.DataFrame({"Month_dt": dates})
-
-        # Merge und Serien erstellen (fehlende Monate -> 0)
-        series_r = (
-            pd.merge(df_full, df_r[["Month_dt", "Zahl"]], on="Month_dt", how="left")
-            .set_index("Month_dt")["Zahl"]
-            .fillna(0)
-            .astype(float)
+        safe_name = (
+            "".join(c for c in bm if c.isalnum() or c in (" ", "_", "-"))
+            .strip()
+            .replace(" ", "_")
         )
-        series_p = (
-            pd.merge(df_full, df_p[["Month_dt", "Zahl"]], on="Month_dt", how="left")
-            .set_index("Month_dt")["Zahl"]
-            .fillna(0)
-            .astype(float)
+        # vollständige Monatsreihe (zusammenhängender Ausschnitt aus dem Panel)
+        diagramme.append(
+            Diagramm(
+                f"{safe_name}_vergleich.png",
+                zeichne_vergleich,
+                {
+                    "bm": bm,
+                    "dates": datum[von:bis],
+                    "werte_r": werk_r.werte[von:bis].astype(float),
+                    "werte_p": werk_p.werte[von:bis].astype(float),
+                },
+                figsize=(10, 4),
+            )
         )
 
-        # Skalierungsfaktor berechnen (auf Basis des Maximums)
-        max_r = series_r.max()
-        max_p = series_p.max()
-        factor = 1.0
-        if max_p > 0 and max_r > 0:
-            factor = max_r / max_p
+    return zeichne_offene(diagramme, out_dir)
 
-        # Plot erstellen
-        fig, ax = plt.subplots(figsize=(10, 4))
-        ax.plot(
-            dates,
-            series_r.values,
-            label="Rohdaten",
-            color="C0",
-            marker="o",
-            linewidth=1,
-        )
-        if series_p.sum() > 0:
-            ax.plot(
-                dates,
-                (series_p * factor).values,
-                label=f"Werkprogramm (skaliert)",
-                color="C1",
-                linestyle="--",
-                marker="s",
-                linewidth=1,
-            )
 
-        # Formatierung
-        ax.set_title(f"{bm} — Rohdaten vs. Werkprogramm")
-        ax.set_xlabel("Monat")
-        ax.set_ylabel("Zahl (Programm skaliert)")
-        ax.xaxis.set_major_locator(mdates.AutoDateLocator())
-        ax.xaxis.set_major_formatter(mdates.DateFormatter("%Y-%m"))
-        plt.setp(ax.get_xticklabels(), rotation=45, ha="right")
-        ax.legend()
-        ax.grid(alpha=0.3)
-
-        # Speichern
-        safe_name = (
-            "".join(c for c in bm if c.isalnum() or c in (" ", "_", "-"))
-            .strip()
-            .replace(" ", "_")
+@verfolgt(kategorie="plot")
+def plot_vergleich_baumarkt(rohdaten_agg, baumarkt_prog, out_dir="./output/images", workers=1):
+    """
+    Vergleichsplots pro Werk:
+    - Maßstab der Achsen ist angepasst
+    - nur Werke mit geänderten Daten werden neu gezeichnet (siehe diagramme.py),
+      bei workers > 1 nach Werk aufgeteilt im Prozesspool (Aufbereitung und
+      Zeichnen, siehe sharding.py)
+    """
+    # Prüfung der benötigten Spalten
+    required = {"Werk", "Monat", "Zahl"}
+    if not required.issubset(set(rohdaten_agg.columns)) or not required.issubset(
+        set(baumarkt_prog.columns)
+    ):
+        raise ValueError(
+            "Beide DataFrames müssen die Spalten 'Werk', 'Monat' und 'Zahl' enthalten."
         )
-        out_path = os.path.join(out_dir, f"{safe_name}_vergleich.png")
-        fig.tight_layout()
-        fig.savefig(out_path, dpi=150)
-        plt.close(fig)
 
-    return
+    start = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    spalten = ["Werk", "Monat", "Zahl"]
+    stand = nach_werk(
+        vergleich_pro_werk,
+        [rohdaten_agg[spalten], baumarkt_prog[spalten]],
+        "Werk",
+        workers,
+        out_dir=out_dir,
+    )
+    # Manifest schreibt nur der Hauptprozess
+    trage_ein(out_dir, stand, start)
 
 
-def main():
+@verfolgt
+def main(workers=1, chunksize=STREAM_CHUNKSIZE):
     print("Abweichungsanalyse - Datenimport")
     print("=" * 50)
 
-    rohdaten = load_rohdaten()
+    cube = None if chunksize > 0 else load_cube()
     baumarktprogramm = load_baumarktprogramm()
 
     print("🔬 Abweichungsanalyse - Aufbereitung")
     print("=" * 50)
-    rohdaten_agg = agg_Rohdaten(rohdaten)
+    if chunksize > 0:
+        print(f"🌊 Streame Rohdaten in Chunks zu {chunksize} Zeilen")
+        rohdaten_agg = agg_Rohdaten_chunked(
+            iter_rohdaten_chunks(
+                INPUT_FILE_ROHDATEN,
+                columns=ROHDATEN_SPALTEN,
+                chunksize=chunksize,
+            )
+        )
+    else:
+        rohdaten_agg = agg_Rohdaten_aus_cube(cube)
     os.makedirs("./output", exist_ok=True)
     rohdaten_agg.to_excel("./output/agg_rohdaten.xlsx", index=False)
 
@@ -367,8 +414,27 @@ def main():
     baumarktProgamm_agg = agg_Werkprogramm(baumarktprogramm)
     baumarktProgamm_agg.to_excel("./output/agg_baumarktprogramm.xlsx", index=False)
 
-    plot_vergleich_baumarkt(rohdaten_agg, baumarktProgamm_agg, out_dir="./output/plots/2")
+    plot_vergleich_baumarkt(
+        rohdaten_agg, baumarktProgamm_agg, out_dir="./output/plots/2", workers=workers
+    )
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Abweichungsanalyse Rohdaten vs. Werkprogramm")
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Prozesse für die Plots (0 = alle Kerne)"
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=STREAM_CHUNKSIZE,
+        help="> 0: Rohdaten im Stream lesen, Chunks mit so vielen Zeilen (0 = ohne Stream)",
+    )
+    parser.add_argument(
+        "--trace",
+        default=TRACE_DIR,
+        help="Ordner für eine Chrome-Trace-Datei mit Zeit/Speicher pro Stufe",
+    )
+    args = parser.parse_args()
+    aktiviere(args.trace)
+    main(worker_anzahl(args.workers), args.chunksize)
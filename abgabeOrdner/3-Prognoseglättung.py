@@ -1,14 +1,61 @@
+import argparse
 import pandas as pd
 import numpy as np
 import os
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from abgleich import abgleich_ebene, runde_summentreu, zellen_ids
+from ergebnis_cube import entferne_cube, schreibe_cube
+from hierarchie_abgleich import METHODEN, abgleich_hierarchisch
+from holt_winters import prognose_aus_historie
+from monatscode import monats_codes
+from rohdaten_stream import iter_rohdaten_chunks
+from schluessel import normalisiere_schluessel
+from sharding import ZEILE, nach_werk, worker_anzahl
+from sporadisch import ersetze_sporadische_serien
+from sternschema import lade_oder_baue_sternschema
+from tracing import TRACE_DIR, aktiviere, verfolgt
+
 # --- KONFIGURATION ---
 INPUT_FILE_ROHDATEN = "dieEchtenDaten.xlsb"
 INPUT_FILE_PLAN = "agg_baumarktprogramm.xlsx"
 OUTPUT_DIR = "./output/final"
 OUTPUT_FILE_EXCEL = "Final_Forecast_2026_2027.xlsx"
+# Memory-Map für Schritt 4/5 und Notebooks (.bin + .json, siehe ergebnis_cube.py)
+OUTPUT_CUBE = "Final_Forecast_2026_2027"
+# > 0: Rohdaten im Stream lesen (nur Prognosespalten, Chunks dieser Größe)
+STREAM_CHUNKSIZE = 0
+PROGNOSE_SPALTEN = [
+    "matnr",
+    "werk",
+    "modulgruppen",
+    "progmo",
+    "prog_mg1",
+    "progmo2",
+    "prog_mg2",
+]
+# Prognosequelle: "erp" (prog_mg1/prog_mg2 aus den Rohdaten) oder
+# "holt-winters" (eigene Prognose aus der Bedarfshistorie, siehe holt_winters.py)
+PROGNOSE_QUELLE = "erp"
+HISTORIE_SPALTEN = ["matnr", "werk", "modulgruppen", "bedmo", "bedmo_mg"]
+HW_SAISON = "add"  # "add" oder "mul"
+# "auto": sporadische Serien (viele Nullmonate) über Croston/SBA/TSB, siehe sporadisch.py
+HW_METHODE = "auto"
+# ERP-Prognose: sporadische Artikel x Werk-Serien durch Croston/SBA/TSB ersetzen
+SPORADISCH_ERSETZEN = False
+# Abgleich: "faktor" (Artikel proportional auf Kunde x Monat) oder
+# hierarchisch über Artikel -> Gruppe -> Kunde -> Gesamt (siehe
+# hierarchie_abgleich.py): "bottom-up" (ignoriert den Plan, nur zum
+# Vergleich), "top-down", "mint-ols", "mint-wls" (Plan als Nebenbedingung;
+# mit nur dem Kundenplan als Ziel liefern beide dasselbe)
+ABGLEICH_METHODE = "faktor"
+# Rundung auf ganze Stück: "summentreu" (Largest Remainder je Kunde x Monat,
+# Summe = gerundete Zielsumme) oder "einzeln" (jede Zeile für sich)
+RUNDUNG = "summentreu"
+OUTPUT_FILE_KONSISTENZ = "Konsistenz_Report.xlsx"
+# Abweichung Kunde/Monat-Summe vs. Plan, ab der eine Zelle gemeldet wird (Stück)
+KONSISTENZ_TOLERANZ = 1
 
 # Erstelle Ausgabeordner
 os.makedirs(OUTPUT_DIR, exist_ok=True)
@@ -22,32 +69,45 @@ sns.set_theme(style="whitegrid")
 def clean_keys(df, col_kunde="Kunde", col_monat="Monat"):
     """Bereinigt Schlüssel für sauberen Merge."""
     # Monat zu Int
-    df[col_monat] = pd.to_numeric(df[col_monat], errors="coerce").fillna(0).astype(int)
-    # Kunde zu Upper-Case String
+    df[col_monat] = monats_codes(df[col_monat])
+    # Kunde zu Upper-Case String (nur eindeutige Werte werden bearbeitet)
     if col_kunde in df.columns:
-        df[col_kunde] = df[col_kunde].astype(str).str.strip().str.upper()
+        df[col_kunde] = normalisiere_schluessel(df[col_kunde])
     return df
 
 
-def calculate_factor(row):
-    """Berechnet den Faktor pro Zeile."""
-    ziel = row["Ziel_Summe"]
-    ist = row["Bottom_Up_Summe"]
+# ---------------------------------------------------------
+# 2. DATEN LADEN
+# ---------------------------------------------------------
 
-    if ist == 0:
-        return 0.0  # Keine Basis -> 0
-    if ziel == 0:
-        return 1.0  # Kein Plan -> Prognose behalten (statt löschen)
 
-    return ziel / ist
+def build_forecast(df_raw):
+    """Stapelt Prognose Jahr 1 + 2 zu Artikel/Kunde/Gruppe/Monat/Menge."""
+    p1 = df_raw[["matnr", "werk", "modulgruppen", "progmo", "prog_mg1"]].copy()
+    p1.columns = ["Artikel", "Kunde", "Gruppe", "Monat", "Menge"]
 
+    p2 = df_raw[["matnr", "werk", "modulgruppen", "progmo2", "prog_mg2"]].copy()
+    p2.columns = ["Artikel", "Kunde", "Gruppe", "Monat", "Menge"]
 
-# ---------------------------------------------------------
-# 2. DATEN LADEN
-# ---------------------------------------------------------
+    df_forecast = pd.concat([p1, p2], ignore_index=True)
+    df_forecast = df_forecast.dropna(subset=["Monat", "Menge"])
+    return df_forecast[df_forecast["Menge"] > 0]
+
+
+def _lade_historie(chunksize=STREAM_CHUNKSIZE):
+    """Bedarfshistorie (HISTORIE_SPALTEN) aus Stream oder Sternschema."""
+    if chunksize > 0:
+        chunks = iter_rohdaten_chunks(
+            INPUT_FILE_ROHDATEN,
+            columns=HISTORIE_SPALTEN,
+            chunksize=chunksize,
+        )
+        return pd.concat(list(chunks), ignore_index=True)
+    return lade_oder_baue_sternschema(INPUT_FILE_ROHDATEN).spalten(HISTORIE_SPALTEN)
 
 
-def load_data():
+@verfolgt
+def load_data(prognose=PROGNOSE_QUELLE, sporadisch=SPORADISCH_ERSETZEN, chunksize=STREAM_CHUNKSIZE):
     print("Step 1: Lade Daten...")
 
     # A) Prognose
@@ -55,19 +115,30 @@ def load_data():
         print(f"❌ Fehler: {INPUT_FILE_ROHDATEN} fehlt.")
         return pd.DataFrame(), pd.DataFrame()
 
-    df_raw = pd.read_excel(INPUT_FILE_ROHDATEN, engine="pyxlsb")
-
     # Forecast zusammenbauen (Jahr 1 + 2)
     try:
-        p1 = df_raw[["matnr", "werk", "modulgruppen", "progmo", "prog_mg1"]].copy()
-        p1.columns = ["Artikel", "Kunde", "Gruppe", "Monat", "Menge"]
-
-        p2 = df_raw[["matnr", "werk", "modulgruppen", "progmo2", "prog_mg2"]].copy()
-        p2.columns = ["Artikel", "Kunde", "Gruppe", "Monat", "Menge"]
-
-        df_forecast = pd.concat([p1, p2], ignore_index=True)
-        df_forecast = df_forecast.dropna(subset=["Monat", "Menge"])
-        df_forecast = df_forecast[df_forecast["Menge"] > 0]
+        if prognose == "holt-winters":
+            # Eigene Prognose aus der Historie (Artikel x Werk x Monat)
+            df_forecast = prognose_aus_historie(
+                _lade_historie(chunksize), saison=HW_SAISON, methode=HW_METHODE
+            )
+        elif chunksize > 0:
+            # Nur die Prognosespalten lesen, jeden Chunk sofort filtern
+            chunks = iter_rohdaten_chunks(
+                INPUT_FILE_ROHDATEN,
+                columns=PROGNOSE_SPALTEN,
+                chunksize=chunksize,
+            )
+            df_forecast = pd.concat(
+                [build_forecast(chunk) for chunk in chunks], ignore_index=True
+            )
+        else:
+            # Prognosespalten aus Faktentabelle + Artikel-/Kundendimension
+            stern = lade_oder_baue_sternschema(INPUT_FILE_ROHDATEN)
+            df_forecast = build_forecast(stern.spalten(PROGNOSE_SPALTEN))
+        if prognose == "erp" and sporadisch:
+            # Sporadische Long-Tail-Serien verzerren sonst die Kunden-Faktoren
+            df_forecast = ersetze_sporadische_serien(df_forecast, _lade_historie(chunksize))
         df_forecast = clean_keys(df_forecast, col_kunde="Kunde", col_monat="Monat")
         print(f"   ✅ Prognose geladen: {len(df_forecast)} Zeilen.")
 
@@ -110,22 +181,99 @@ def load_data():
 # ---------------------------------------------------------
 
 
-def run_reconciliation(df_forecast, df_plan):
-    print("\nStep 2: Führe Abgleich durch...")
+def abgleich_pro_kunde(df_forecast, df_plan):
+    """
+    Summen pro Kunde/Monat-Zelle und Faktor pro Artikelzeile (vektorisiert,
+    siehe abgleich.py). Rechnet je Kunde unabhängig, läuft also auch pro
+    Shard in einem Worker.
+
+    Returns:
+        (Faktor als Series mit dem Index von df_forecast, merged pro Kunde/Monat)
+    """
+    faktor, merged = abgleich_ebene(df_forecast, df_plan, ebene="Kunde")
+    return pd.Series(faktor, index=df_forecast.index, name="Faktor"), merged
 
-    # 1. Aggregation Bottom-Up
-    bu_agg = df_forecast.groupby(["Kunde", "Monat"])["Menge"].sum().reset_index()
-    bu_agg = bu_agg.rename(columns={"Menge": "Bottom_Up_Summe"})
 
-    # 2. Merge
-    merged = pd.merge(bu_agg, df_plan, on=["Kunde", "Monat"], how="inner")
+def abgleich_hierarchie(df_forecast, df_plan, methode):
+    """
+    Hierarchischer Abgleich mit dem Kundenplan als Ziel der Kunde-Ebene.
+    MinT trifft den Plan als harte Vorgabe (auch ohne negative Mengen,
+    siehe hierarchie_abgleich.mint), bottom-up übernimmt die Prognose
+    unverändert (Plan wird nur im Bericht verglichen).
+
+    Returns:
+        (Faktor als Series mit dem Index von df_forecast, merged pro Kunde/Monat)
+    """
+    faktor, uebersicht = abgleich_hierarchisch(
+        df_forecast, {"Kunde": df_plan}, methode, harte_ebenen=("Kunde",)
+    )
+    merged = uebersicht.loc[
+        uebersicht["Ebene"] == "Kunde",
+        ["Kunde", "Monat", "Bottom_Up_Summe", "Ziel_Summe", "Faktor"],
+    ].reset_index(drop=True)
+    return pd.Series(faktor, index=df_forecast.index, name="Faktor"), merged
+
+
+def pruefe_konsistenz(gerundet, zelle_f, zelle_m, merged):
+    """
+    Konsistenzprüfung direkt nach dem Abgleich (statt Schritt 4 mit neuem
+    Laden): Summe der gerundeten Artikelmengen je Kunde/Monat gegen den Plan.
+
+    zelle_f, zelle_m: gemeinsame Kunde/Monat-Zellen der Artikelzeilen und
+    der Zeilen von merged (siehe zellen_ids)
+
+    Returns:
+        pd.DataFrame wie der Report aus Schritt 4
+    """
+    ist = np.bincount(zelle_f, weights=gerundet, minlength=int(zelle_m.max(initial=-1)) + 1)
+    bericht = merged[["Kunde", "Monat", "Ziel_Summe"]].reset_index(drop=True)
+    bericht.insert(2, "Ist_Summe_Neu", ist[zelle_m])
+    bericht["Differenz"] = bericht["Ist_Summe_Neu"] - bericht["Ziel_Summe"]
+    bericht["Differenz_Abs"] = bericht["Differenz"].abs()
+
+    auffaellig = bericht["Differenz_Abs"] > KONSISTENZ_TOLERANZ
+    print(
+        f"   🔎 Konsistenz: {len(bericht)} Kunde/Monat-Zellen, "
+        f"Abweichung gesamt {bericht['Differenz_Abs'].sum():,.0f} Stück, "
+        f"max. {bericht['Differenz_Abs'].max():,.1f} Stück"
+    )
+    if auffaellig.any():
+        print(f"      ⚠️ {int(auffaellig.sum())} Zellen weichen um mehr als {KONSISTENZ_TOLERANZ} Stück ab:")
+        print(bericht[auffaellig].head())
+    else:
+        print("      ✅ Summen treffen den Plan (bis auf Rundung des Plans).")
+    return bericht
+
+
+@verfolgt
+def run_reconciliation(
+    df_forecast, df_plan, workers=1, methode=ABGLEICH_METHODE, rundung=RUNDUNG
+):
+    """
+    Returns:
+        (df_final mit Faktor und Menge_Geglaettet, Konsistenzbericht pro
+        Kunde/Monat); beide leer, wenn es keine Treffer gibt
+    """
+    print("\nStep 2: Führe Abgleich durch...")
+
+    if methode == "faktor":
+        # 1.-3. Summen und Faktoren, bei workers > 1 nach Kunde aufgeteilt
+        # (gleiche Zeilenfolge wie mit einem Prozess). An die Worker gehen
+        # nur die Spalten, die der Abgleich braucht.
+        faktor, merged = nach_werk(
+            abgleich_pro_kunde,
+            [df_forecast[["Kunde", "Monat", "Menge"]], df_plan[["Kunde", "Monat", "Ziel_Summe"]]],
+            "Kunde",
+            workers,
+            sortierung=[ZEILE, None],
+        )
+    else:
+        # Gruppen und Gesamt hängen über alle Kunden zusammen: kein Sharding
+        faktor, merged = abgleich_hierarchie(df_forecast, df_plan, methode)
 
     if merged.empty:
         print("❌ FEHLER: Keine Matches (Kunde/Monat) gefunden!")
-        return pd.DataFrame()
-
-    # 3. Faktor berechnen
-    merged["Faktor"] = merged.apply(calculate_factor, axis=1)
+        return pd.DataFrame(), pd.DataFrame()
 
     # --- STATISTIK CHECK (Das löst Ihre Verwirrung) ---
     avg_factor = merged["Faktor"].mean()
@@ -150,13 +298,9 @@ def run_reconciliation(df_forecast, df_plan):
     else:
         print("      ✅ Plausibilität OK.")
 
-    # 4. Anwenden
-    df_final = pd.merge(
-        df_forecast,
-        merged[["Kunde", "Monat", "Faktor"]],
-        on=["Kunde", "Monat"],
-        how="left",
-    )
+    # 4. Anwenden: Faktor kommt bereits pro Artikelzeile zurück (kein Merge)
+    df_final = df_forecast.reset_index(drop=True)
+    df_final["Faktor"] = faktor.to_numpy()
 
     # Fallback für fehlende Pläne
     missing_count = df_final["Faktor"].isna().sum()
@@ -164,11 +308,23 @@ def run_reconciliation(df_forecast, df_plan):
         print(f"   ℹ️  Info: {missing_count} Zeilen ohne Plan behalten (Faktor 1.0).")
 
     df_final["Faktor"] = df_final["Faktor"].fillna(1.0)
-    df_final["Menge_Geglaettet"] = (
-        (df_final["Menge"] * df_final["Faktor"]).round(0).astype(int)
+    menge = df_final["Menge"].to_numpy(dtype=float) * df_final["Faktor"].to_numpy()
+
+    # Kunde/Monat-Zellen für Artikelzeilen und Plan-Treffer in einem Durchlauf
+    n = len(df_final)
+    zellen = zellen_ids(
+        np.concatenate([df_final["Kunde"].to_numpy(dtype=object), merged["Kunde"].to_numpy(dtype=object)]),
+        np.concatenate([df_final["Monat"].to_numpy(), merged["Monat"].to_numpy()]),
     )
+    zelle_f, zelle_m = zellen[:n], zellen[n:]
+
+    if rundung == "summentreu":
+        df_final["Menge_Geglaettet"] = runde_summentreu(menge, zelle_f)
+    else:
+        df_final["Menge_Geglaettet"] = np.round(menge).astype(int)
 
-    return df_final
+    bericht = pruefe_konsistenz(df_final["Menge_Geglaettet"].to_numpy(), zelle_f, zelle_m, merged)
+    return df_final, bericht
 
 
 # ---------------------------------------------------------
@@ -176,19 +332,30 @@ def run_reconciliation(df_forecast, df_plan):
 # ---------------------------------------------------------
 
 
-def main():
+@verfolgt
+def main(
+    workers=1,
+    prognose=PROGNOSE_QUELLE,
+    sporadisch=SPORADISCH_ERSETZEN,
+    abgleich=ABGLEICH_METHODE,
+    rundung=RUNDUNG,
+    chunksize=STREAM_CHUNKSIZE,
+):
     # Laden
-    df_forecast, df_plan = load_data()
+    df_forecast, df_plan = load_data(prognose, sporadisch, chunksize)
     if df_forecast.empty:
         return
 
     # Rechnen
-    df_final = run_reconciliation(df_forecast, df_plan)
+    df_final, bericht = run_reconciliation(df_forecast, df_plan, workers, abgleich, rundung)
     if df_final.empty:
         return
 
     # Speichern
     out_path = os.path.join(OUTPUT_DIR, OUTPUT_FILE_EXCEL)
+    cube_basis = os.path.join(OUTPUT_DIR, OUTPUT_CUBE)
+    # Alten Cube zuerst weg: scheitert unten etwas, lesen 4/5 das neue Excel
+    entferne_cube(cube_basis)
     cols = [
         "Artikel",
         "Kunde",
@@ -200,6 +367,14 @@ def main():
     ]
     df_final[cols].to_excel(out_path, index=False)
     print(f"\n✅ FERTIG! Datei gespeichert: {out_path}")
+    bericht.to_excel(os.path.join(OUTPUT_DIR, OUTPUT_FILE_KONSISTENZ), index=False)
+    print(f"   Konsistenz-Report gespeichert: {OUTPUT_FILE_KONSISTENZ}")
+
+    try:
+        schreibe_cube(df_final[cols], cube_basis, quelle=out_path)
+        print(f"   💾 Cube für Schritt 4/5 gespeichert: {cube_basis}.bin / .json")
+    except (OSError, ValueError) as e:
+        print(f"   ⚠️ Cube konnte nicht geschrieben werden: {e}")
 
     # Kleiner Plot zur Bestätigung
     try:
@@ -223,4 +398,55 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Prognoseglättung (Abgleich mit dem Plan)")
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Prozesse für den Abgleich (0 = alle Kerne)"
+    )
+    parser.add_argument(
+        "--prognose",
+        choices=["erp", "holt-winters"],
+        default=PROGNOSE_QUELLE,
+        help="ERP-Prognose skalieren oder eigene Holt-Winters-Prognose",
+    )
+    parser.add_argument(
+        "--sporadisch",
+        action="store_true",
+        default=SPORADISCH_ERSETZEN,
+        help="ERP-Prognose: sporadische Serien durch Croston/SBA/TSB ersetzen",
+    )
+    parser.add_argument(
+        "--abgleich",
+        choices=["faktor", *METHODEN],
+        default=ABGLEICH_METHODE,
+        help="Faktor pro Kunde/Monat oder hierarchischer Abgleich; faktor, top-down und "
+        "mint-* treffen den Plan je Kunde/Monat mit Prognose (bis auf die Rundung), "
+        "bottom-up ignoriert ihn (nur Vergleich); mint-ols und mint-wls rechnen mit "
+        "nur dem Kundenplan als Ziel gleich",
+    )
+    parser.add_argument(
+        "--rundung",
+        choices=["summentreu", "einzeln"],
+        default=RUNDUNG,
+        help="summentreu: Artikelmengen je Kunde/Monat summieren genau auf die gerundete Zielsumme",
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=STREAM_CHUNKSIZE,
+        help="> 0: Rohdaten im Stream lesen, Chunks mit so vielen Zeilen (0 = ohne Stream)",
+    )
+    parser.add_argument(
+        "--trace",
+        default=TRACE_DIR,
+        help="Ordner für eine Chrome-Trace-Datei mit Zeit/Speicher pro Stufe",
+    )
+    args = parser.parse_args()
+    aktiviere(args.trace)
+    main(
+        worker_anzahl(args.workers),
+        args.prognose,
+        args.sporadisch,
+        args.abgleich,
+        args.rundung,
+        args.chunksize,
+    )
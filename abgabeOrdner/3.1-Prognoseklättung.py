@@ -4,6 +4,10 @@ import os
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from abgleich import abgleich_ebene
+from monatscode import monats_codes
+from schluessel import normalisiere_schluessel
+
 # --- KONFIGURATION ---
 INPUT_FILE_LIVE = "final.xlsx" 
 OUTPUT_DIR = "./output/final"
@@ -20,30 +24,15 @@ sns.set_theme(style="whitegrid")
 def clean_keys(df, col_kunde='Kunde', col_monat='Monat'):
     """Bereinigt Schlüssel für sauberen Merge."""
     # Monat zu Int (Fehler abfangen)
-    df[col_monat] = pd.to_numeric(df[col_monat], errors='coerce').fillna(0).astype(int)
+    df[col_monat] = monats_codes(df[col_monat])
     
-    # Kunde (Werk) zu String ohne ".0" am Ende
+    # Kunde (Werk) zu String ohne ".0" am Ende, Whitespace weg und Großbuchstaben
+    # (nur die eindeutigen Werte werden bearbeitet)
     if col_kunde in df.columns:
-        # Erst in String wandeln
-        s = df[col_kunde].astype(str)
-        # ".0" entfernen (falls Excel Zahlen als Floats lädt)
-        s = s.str.replace(r'\.0$', '', regex=True)
-        # Whitespace weg und Großbuchstaben
-        # HIER WAR DER FEHLER: Es muss .str.upper() heißen
-        df[col_kunde] = s.str.strip().str.upper()
+        df[col_kunde] = normalisiere_schluessel(df[col_kunde])
         
     return df
 
-def calculate_factor(row):
-    """Berechnet den Faktor pro Zeile."""
-    ziel = row['Ziel_Summe']
-    ist = row['Bottom_Up_Summe']
-    
-    if ist == 0: return 0.0
-    if ziel == 0: return 1.0
-    
-    return ziel / ist
-
 # ---------------------------------------------------------
 # 2. DATEN LADEN & DEMO-PLAN GENERIEREN
 # ---------------------------------------------------------
@@ -138,25 +127,19 @@ def load_and_prep_data():
 def run_reconciliation(df_forecast, df_plan):
     print("\nStep 2: Führe Abgleich durch...")
     
-    # Aggregation
-    bu_agg = df_forecast.groupby(['Kunde', 'Monat'])['Menge'].sum().reset_index()
-    bu_agg = bu_agg.rename(columns={'Menge': 'Bottom_Up_Summe'})
-    
-    # Merge
-    merged = pd.merge(bu_agg, df_plan, on=['Kunde', 'Monat'], how='inner')
+    # Aggregation, Abgleich und Faktor pro Kunde/Monat (vektorisiert, siehe abgleich.py)
+    faktor, merged = abgleich_ebene(df_forecast, df_plan, ebene='Kunde')
     
     if merged.empty:
         print("❌ FEHLER: Keine Matches gefunden! Kunde/Monat passen nicht zusammen.")
         return pd.DataFrame()
 
-    # Faktor
-    merged['Faktor'] = merged.apply(calculate_factor, axis=1)
-    
     avg_factor = merged['Faktor'].mean()
     print(f"   📊 Statistik: Ø Faktor = {avg_factor:.2f}")
     
-    # Anwenden
-    df_final = pd.merge(df_forecast, merged[['Kunde', 'Monat', 'Faktor']], on=['Kunde', 'Monat'], how='left')
+    # Anwenden: Faktor liegt schon pro Artikelzeile vor (kein zweiter Merge)
+    df_final = df_forecast.reset_index(drop=True)
+    df_final['Faktor'] = faktor
     
     df_final['Faktor'] = df_final['Faktor'].fillna(1.0)
     df_final['Menge_Geglaettet'] = (df_final['Menge'] * df_final['Faktor']).round(0).astype(int)
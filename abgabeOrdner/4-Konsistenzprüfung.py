@@ -2,27 +2,62 @@ import pandas as pd
 import numpy as np
 import os
 
+from ergebnis_cube import CUBE_BASIS, cube_aus_dataframe, oeffne_cube
+from monatscode import code_zu_ordinal, monats_codes, ordinal_zu_code
+from schluessel import Schluesselraum, Zellenraster, normalisiere_schluessel
+from tracing import aktiviere, verfolgt
+
 # --- KONFIGURATION ---
 FILE_FORECAST_FINAL = "./output/final/Final_Forecast_2026_2027.xlsx"
 FILE_PLAN = "agg_baumarktprogramm.xlsx"
+# Report, den Schritt 3 direkt nach dem Abgleich schreibt (wird nur gelesen)
+FILE_REPORT_SCHRITT_3 = "./output/final/Konsistenz_Report.xlsx"
+# Eigener Report, falls der aus Schritt 3 fehlt oder älter als der Forecast ist
+FILE_REPORT = "./output/final/Konsistenz_Report_Schritt4.xlsx"
 
 def clean_keys(df, col_kunde='Kunde', col_monat='Monat'):
     """Stellt sicher, dass wir Text und Zahlen vergleichen können."""
-    df[col_monat] = pd.to_numeric(df[col_monat], errors='coerce').fillna(0).astype(int)
+    df[col_monat] = monats_codes(df[col_monat])
     if col_kunde in df.columns:
-        df[col_kunde] = df[col_kunde].astype(str).str.strip().str.upper()
+        df[col_kunde] = normalisiere_schluessel(df[col_kunde])
     return df
 
-def main():
-    print("=== TEILAUFGABE 4: KONSISTENZPRÜFUNG ===")
-    
-    # 1. Daten laden
-    if not os.path.exists(FILE_FORECAST_FINAL):
-        print("❌ FEHLER: Finaler Forecast fehlt. Bitte erst Schritt 3 ausführen.")
-        return
+def report_aus_schritt_3():
+    """
+    Der Konsistenz-Report aus Schritt 3, wenn er zum aktuellen Forecast
+    gehört (nicht älter als die Excel-Datei), sonst None.
+    """
+    if not os.path.exists(FILE_REPORT_SCHRITT_3):
+        return None
+    if os.path.exists(FILE_FORECAST_FINAL) and (
+        os.path.getmtime(FILE_REPORT_SCHRITT_3) < os.path.getmtime(FILE_FORECAST_FINAL)
+    ):
+        return None
+    return pd.read_excel(FILE_REPORT_SCHRITT_3)
 
+@verfolgt
+def pruefe_neu():
+    """
+    Rechnet die Prüfung selbst: Forecast und Plan laden, Summen pro
+    Kunde/Monat vergleichen. Nur nötig ohne aktuellen Report aus Schritt 3.
+
+    Returns:
+        pd.DataFrame wie der Report aus Schritt 3, None ohne Forecast
+    """
+    # 1. Daten laden (Memory-Map aus Schritt 3, sonst Excel)
     print("1. Lade geglättete Artikeldaten...")
-    df_final = pd.read_excel(FILE_FORECAST_FINAL)
+    try:
+        cube = oeffne_cube(CUBE_BASIS, quelle=FILE_FORECAST_FINAL)
+        print(f"   ⚡ Cube gemappt: {len(cube)} Zeilen (ohne Kopie)")
+    except (FileNotFoundError, ValueError) as e:
+        if not os.path.exists(FILE_FORECAST_FINAL):
+            print("❌ FEHLER: Finaler Forecast fehlt. Bitte erst Schritt 3 ausführen.")
+            return None
+        print(f"   ℹ️  Kein Cube ({e}), lese Excel...")
+        cube = cube_aus_dataframe(pd.read_excel(FILE_FORECAST_FINAL))
+
+    # Summen pro Kunde/Monat direkt auf den Code-Spalten
+    df_final = cube.aggregiere(['Kunde', 'Monat'], 'Menge_Geglaettet')
     
     print("2. Lade ursprünglichen Vertriebsplan...")
     df_plan = pd.read_excel(FILE_PLAN)
@@ -35,18 +70,48 @@ def main():
     df_final = clean_keys(df_final)
     df_plan = clean_keys(df_plan)
 
-    # 2. Aggregation: Wir summieren die neuen Artikelwerte wieder hoch
+    # 2. Abgleich der Kunde/Monat-Summen mit dem Plan
+    #    (Kunde/Monat als int-Codes, Summen per Zelle statt groupby + merge)
     print("\n3. Prüfe Summen...")
-    agg_check = df_final.groupby(['Kunde', 'Monat'])['Menge_Geglaettet'].sum().reset_index()
-    agg_check = agg_check.rename(columns={'Menge_Geglaettet': 'Ist_Summe_Neu'})
+    raum = Schluesselraum()
+    kunde_f, kunde_p = raum.codes(df_final['Kunde']), raum.codes(df_plan['Kunde'])
+    ord_f, ord_p = code_zu_ordinal(df_final['Monat']), code_zu_ordinal(df_plan['Monat'])
+    raster = Zellenraster(len(raum), ord_f, ord_p)
+    ist, ist_belegt = raster.summe(raster.index(kunde_f, ord_f), df_final['Menge_Geglaettet'])
+    ziel, ziel_belegt = raster.summe(raster.index(kunde_p, ord_p), df_plan['Ziel_Summe'])
 
-    # 3. Vergleich mit dem Plan
-    merged = pd.merge(agg_check, df_plan, on=['Kunde', 'Monat'], how='inner')
+    # 3. Vergleich mit dem Plan (nur Zellen, die in beiden vorkommen)
+    zellen = np.flatnonzero(ist_belegt & ziel_belegt)
+    kunde_z, ord_z = raster.zerlege(zellen)
+    merged = pd.DataFrame({
+        'Kunde': raum.labels(kunde_z),
+        'Monat': ordinal_zu_code(ord_z),
+        'Ist_Summe_Neu': ist[zellen],
+        'Ziel_Summe': ziel[zellen],
+    })
     
     # Differenz berechnen
     merged['Differenz'] = merged['Ist_Summe_Neu'] - merged['Ziel_Summe']
     merged['Differenz_Abs'] = merged['Differenz'].abs()
-    
+
+    merged.to_excel(FILE_REPORT, index=False)
+    print(f"\n   Detaillierter Report gespeichert: {FILE_REPORT}")
+    return merged
+
+@verfolgt
+def main():
+    print("=== TEILAUFGABE 4: KONSISTENZPRÜFUNG ===")
+
+    # Schritt 3 prüft direkt nach dem Abgleich; dessen Report nur auswerten
+    merged = report_aus_schritt_3()
+    if merged is not None:
+        print(f"1. Lese Konsistenz-Report aus Schritt 3: {FILE_REPORT_SCHRITT_3}")
+    else:
+        print("ℹ️  Kein aktueller Report aus Schritt 3, prüfe selbst...")
+        merged = pruefe_neu()
+        if merged is None:
+            return
+
     # 4. Ergebnis-Analyse
     total_diff = merged['Differenz_Abs'].sum()
     max_diff = merged['Differenz_Abs'].max()
@@ -70,9 +135,7 @@ def main():
         print("   Schauen Sie sich diese Fälle genauer an:")
         print(merged[merged['Differenz_Abs'] > 1000].head())
 
-    # Optional: Export der Prüfung
-    merged.to_excel("./output/final/Konsistenz_Report.xlsx", index=False)
-    print(f"\n   Detaillierter Report gespeichert: ./output/final/Konsistenz_Report.xlsx")
-
 if __name__ == "__main__":
+    # Trace nur über PROGNOSE_TRACE_DIR (dieses Skript hat keine Argumente)
+    aktiviere()
     main()
\ No newline at end of file
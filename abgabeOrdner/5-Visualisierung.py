@@ -1,46 +1,61 @@
+import argparse
+import numpy as np
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
 import os
 
+from diagramme import (
+    Diagramm,
+    entferne_diagramme,
+    rendere_diagramme,
+    rendere_pdf,
+    seiten,
+    seiten_name,
+)
+from ergebnis_cube import CUBE_BASIS, cube_aus_dataframe, oeffne_cube
+from sharding import worker_anzahl
+from tracing import TRACE_DIR, aktiviere, verfolgt
+
 # --- KONFIGURATION ---
 INPUT_FILE = "./output/final/Final_Forecast_2026_2027.xlsx"
 OUTPUT_DIR_PLOTS = "./output/final/plots"
+# Heatmap: feste Seitengröße, darüber weitere Seiten (PNG je Seite + eine PDF)
+HEATMAP_KUNDEN_PRO_SEITE = 40
+# Werte in den Zellen nur bis zu dieser Zellenzahl pro Seite
+HEATMAP_ANNOTATION_MAX_ZELLEN = 1000
 
 # Setup
 os.makedirs(OUTPUT_DIR_PLOTS, exist_ok=True)
 sns.set_theme(style="whitegrid") 
 
+@verfolgt
 def load_data():
-    if not os.path.exists(INPUT_FILE):
-        print(f"❌ FEHLER: Datei '{INPUT_FILE}' fehlt.")
-        return pd.DataFrame()
-    
+    """Memory-Map aus Schritt 3 (ohne Kopie), sonst die Excel-Datei."""
     print("1. Lade Daten für Visualisierung...")
-    df = pd.read_excel(INPUT_FILE)
-    # Monat als String für diskrete Achse
-    df['Monat_Str'] = df['Monat'].astype(str)
-    return df
+    try:
+        return oeffne_cube(CUBE_BASIS, quelle=INPUT_FILE)
+    except (FileNotFoundError, ValueError) as e:
+        if not os.path.exists(INPUT_FILE):
+            print(f"❌ FEHLER: Datei '{INPUT_FILE}' fehlt.")
+            return None
+        print(f"   ℹ️  Kein Cube ({e}), lese Excel...")
+        return cube_aus_dataframe(pd.read_excel(INPUT_FILE))
+
+def monatssummen(cube, maske=None):
+    """Menge und Menge_Geglaettet pro Monat, Monat als String für diskrete Achse."""
+    agg = cube.aggregiere('Monat', ['Menge', 'Menge_Geglaettet'], maske=maske)
+    agg.insert(0, 'Monat_Str', agg.pop('Monat').astype(str))
+    return agg
 
 # ---------------------------------------------------------
 # PLOT 1: MANAGEMENT SUMMARY (Legende UNTEN)
 # ---------------------------------------------------------
-def plot_management_summary(df):
-    print("2. Erstelle Management-Summary...")
-    
-    agg = df.groupby('Monat_Str')[['Menge', 'Menge_Geglaettet']].sum().reset_index()
-    agg_melt = agg.melt(id_vars='Monat_Str', value_vars=['Menge', 'Menge_Geglaettet'], 
-                        var_name='Typ', value_name='Stückzahl')
-    
-    agg_melt['Typ'] = agg_melt['Typ'].replace({
-        'Menge': 'Ursprüngliche Prognose (Bottom-Up)', 
-        'Menge_Geglaettet': 'Angepasster Plan (Final)'
-    })
-
-    plt.figure(figsize=(14, 8)) # Etwas höher für die Legende unten
-    ax = sns.lineplot(data=agg_melt, x='Monat_Str', y='Stückzahl', hue='Typ', style='Typ', 
-                      markers=True, dashes=False, linewidth=3)
+def zeichne_management_summary(fig, agg_melt):
+    ax = fig.subplots()
+    sns.lineplot(data=agg_melt, x='Monat_Str', y='Stückzahl', hue='Typ', style='Typ', 
+                 markers=True, dashes=False, linewidth=3, ax=ax)
     
     # Farben setzen
     palette = {'Ursprüngliche Prognose (Bottom-Up)': 'grey', 'Angepasster Plan (Final)': '#2ecc71'}
@@ -55,71 +70,86 @@ def plot_management_summary(df):
     # bbox_to_anchor=(x, y): (0.5, -0.2) bedeutet "Mittig, unterhalb der Achse"
     sns.move_legend(ax, "upper center", bbox_to_anchor=(0.5, -0.15), ncol=2, title=None, frameon=False)
     
-    plt.title("Gesamtvolumen: Anpassung an den Vertriebsplan", pad=20, fontsize=16, fontweight='bold')
-    plt.xlabel("")
-    plt.ylabel("Absatzmenge (Stück)")
-    plt.xticks(rotation=45)
+    ax.set_title("Gesamtvolumen: Anpassung an den Vertriebsplan", pad=20, fontsize=16, fontweight='bold')
+    ax.set_xlabel("")
+    ax.set_ylabel("Absatzmenge (Stück)")
+    plt.setp(ax.get_xticklabels(), rotation=45)
     
     # Wichtig: Layout anpassen, damit Legende nicht abgeschnitten wird
-    plt.tight_layout() 
+    fig.tight_layout() 
+
+@verfolgt(kategorie="plot")
+def plot_management_summary(cube):
+    print("2. Erstelle Management-Summary...")
     
-    save_path = os.path.join(OUTPUT_DIR_PLOTS, "1_Management_Summary.png")
-    plt.savefig(save_path, dpi=150, bbox_inches='tight') # bbox_inches='tight' schützt die Legende zusätzlich
-    print(f"   ✅ Gespeichert: {save_path}")
+    agg = monatssummen(cube)
+    agg_melt = agg.melt(id_vars='Monat_Str', value_vars=['Menge', 'Menge_Geglaettet'], 
+                        var_name='Typ', value_name='Stückzahl')
+    
+    agg_melt['Typ'] = agg_melt['Typ'].replace({
+        'Menge': 'Ursprüngliche Prognose (Bottom-Up)', 
+        'Menge_Geglaettet': 'Angepasster Plan (Final)'
+    })
+
+    # Etwas höher für die Legende unten; bbox_inches='tight' schützt die Legende zusätzlich
+    return Diagramm("1_Management_Summary.png", zeichne_management_summary, {"agg_melt": agg_melt},
+                    figsize=(14, 8), bbox_inches='tight')
 
 # ---------------------------------------------------------
 # PLOT 2: HEATMAP (Dynamische Größe gegen Quetschen)
 # ---------------------------------------------------------
-def plot_correction_heatmap(df):
+def zeichne_correction_heatmap(fig, pivot_faktor, vmin, vmax, titel_zusatz=""):
+    ax = fig.subplots()
+    # Zellen gerastert (PDF bleibt klein), Beschriftung nur bei wenigen Zellen
+    annot = pivot_faktor.size <= HEATMAP_ANNOTATION_MAX_ZELLEN
+    sns.heatmap(pivot_faktor, cmap="vlag_r", center=1.0, vmin=vmin, vmax=vmax,
+                annot=annot, fmt=".2f", linewidths=.5 if annot else 0, square=True,
+                cbar_kws={'label': 'Korrekturfaktor (1.0 = Neutral)', 'shrink': 0.8},
+                annot_kws={"size": 9}, rasterized=True, ax=ax)
+    
+    ax.set_title("Intensität der Eingriffe pro Kunde (Rot = Kürzung, Blau = Erhöhung)" + titel_zusatz, pad=20, fontsize=16, fontweight='bold')
+    ax.set_xlabel("")
+    ax.set_ylabel("")
+    plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
+    plt.setp(ax.get_yticklabels(), rotation=0)
+    fig.tight_layout()
+
+@verfolgt(kategorie="plot")
+def plot_correction_heatmap(cube):
     print("3. Erstelle Heatmap...")
     
-    pivot_faktor = df.pivot_table(index='Kunde', columns='Monat_Str', values='Faktor', aggfunc='mean')
+    faktor = cube.aggregiere(['Kunde', 'Monat'], 'Faktor', funktion='mean')
+    faktor['Monat_Str'] = faktor['Monat'].astype(str)
+    pivot_faktor = faktor.pivot(index='Kunde', columns='Monat_Str', values='Faktor')
     
-    # Dynamische Größe berechnen (verhindert Quetschen)
+    # Dynamische Größe berechnen (verhindert Quetschen), höchstens eine Seite hoch
     n_customers = len(pivot_faktor.index)
     n_months = len(pivot_faktor.columns)
     
-    fig_height = max(8, n_customers * 0.6)
+    fig_height = max(8, min(n_customers, HEATMAP_KUNDEN_PRO_SEITE) * 0.6)
     fig_width = max(12, n_months * 0.5)
     
-    plt.figure(figsize=(fig_width, fig_height))
-    
-    sns.heatmap(pivot_faktor, cmap="vlag_r", center=1.0, annot=True, fmt=".2f", 
-                linewidths=.5, square=True,
-                cbar_kws={'label': 'Korrekturfaktor (1.0 = Neutral)', 'shrink': 0.8},
-                annot_kws={"size": 9})
-    
-    plt.title("Intensität der Eingriffe pro Kunde (Rot = Kürzung, Blau = Erhöhung)", pad=20, fontsize=16, fontweight='bold')
-    plt.xlabel("")
-    plt.ylabel("")
-    plt.xticks(rotation=45, ha='right')
-    plt.yticks(rotation=0)
-    plt.tight_layout()
-    
-    save_path = os.path.join(OUTPUT_DIR_PLOTS, "2_Korrektur_Heatmap.png")
-    plt.savefig(save_path, dpi=150, bbox_inches='tight')
-    print(f"   ✅ Gespeichert: {save_path}")
+    # Eine Farbskala für alle Seiten
+    werte = pivot_faktor.to_numpy(dtype=float)
+    vmin, vmax = (np.nanmin(werte), np.nanmax(werte)) if np.isfinite(werte).any() else (None, None)
+    
+    teile = seiten(n_customers, HEATMAP_KUNDEN_PRO_SEITE)
+    diagramme = []
+    for i, teil in enumerate(teile):
+        titel_zusatz = f"\nSeite {i + 1}/{len(teile)}" if len(teile) > 1 else ""
+        diagramme.append(
+            Diagramm(seiten_name("2_Korrektur_Heatmap.png", i, len(teile)), zeichne_correction_heatmap,
+                     {"pivot_faktor": pivot_faktor.iloc[teil], "vmin": vmin, "vmax": vmax,
+                      "titel_zusatz": titel_zusatz},
+                     figsize=(fig_width, fig_height), bbox_inches='tight')
+        )
+    return diagramme
 
 # ---------------------------------------------------------
 # PLOT 3: DETAIL-STRUKTUR (Legende UNTEN)
 # ---------------------------------------------------------
-def plot_detail_structure(df):
-    print("4. Erstelle Detail-Plot...")
-    
-    top_kunde = df.groupby('Kunde')['Menge'].sum().idxmax()
-    col_gruppe = 'Gruppe' if 'Gruppe' in df.columns else df.columns[2]
-    
-    try:
-        beispiel_gruppe = df[df['Kunde'] == top_kunde][col_gruppe].value_counts().index[0]
-    except IndexError:
-        print("   ⚠️ Keine Daten für Detail-Plot gefunden.")
-        return
-
-    data_subset = df[(df['Kunde'] == top_kunde) & (df[col_gruppe] == beispiel_gruppe)].copy()
-    agg_subset = data_subset.groupby('Monat_Str')[['Menge', 'Menge_Geglaettet']].sum().reset_index()
-    
-    plt.figure(figsize=(14, 8)) # Etwas höher
-    ax1 = plt.gca()
+def zeichne_detail_structure(fig, agg_subset, top_kunde, beispiel_gruppe):
+    ax1 = fig.subplots()
     ax2 = ax1.twinx()
     
     l1 = ax1.plot(agg_subset['Monat_Str'], agg_subset['Menge'], color='grey', linestyle='--', label='Original (Links)', linewidth=2)
@@ -134,24 +164,67 @@ def plot_detail_structure(df):
     # bbox_to_anchor=(0.5, -0.15) -> Unter das Diagramm
     ax1.legend(lns, labs, loc='upper center', bbox_to_anchor=(0.5, -0.15), ncol=2, frameon=False)
     
-    plt.title(f"Struktur-Check: {top_kunde} / {beispiel_gruppe}", pad=20, fontsize=16)
+    # Titel auf der zweiten Achse (liegt oben, wie bisher plt.title nach twinx)
+    ax2.set_title(f"Struktur-Check: {top_kunde} / {beispiel_gruppe}", pad=20, fontsize=16)
     ax1.set_xticklabels(agg_subset['Monat_Str'], rotation=45)
-    plt.tight_layout()
+    fig.tight_layout()
+
+@verfolgt(kategorie="plot")
+def plot_detail_structure(cube):
+    print("4. Erstelle Detail-Plot...")
     
-    save_path = os.path.join(OUTPUT_DIR_PLOTS, "3_Detail_Struktur.png")
-    plt.savefig(save_path, dpi=150, bbox_inches='tight')
-    print(f"   ✅ Gespeichert: {save_path}")
+    kunden = cube.aggregiere('Kunde', 'Menge')
+    gruppen = pd.DataFrame()
+    if not kunden.empty:
+        top_kunde = kunden.loc[kunden['Menge'].idxmax(), 'Kunde']
+        im_kunden = cube['Kunde'] == cube.code('Kunde', top_kunde)
+        gruppen = cube.aggregiere('Gruppe', maske=im_kunden)
+    if gruppen.empty:
+        print("   ⚠️ Keine Daten für Detail-Plot gefunden.")
+        return None
+    # Häufigste Gruppe des Kunden (wie value_counts().index[0])
+    beispiel_gruppe = gruppen.loc[gruppen['Anzahl'].idxmax(), 'Gruppe']
 
-def main():
-    print("=== TEILAUFGABE 5: VISUALISIERUNG (FIXED LAYOUT) ===")
-    df = load_data()
-    if df.empty: return
+    in_gruppe = cube['Gruppe'] == cube.code('Gruppe', beispiel_gruppe)
+    agg_subset = monatssummen(cube, maske=im_kunden & in_gruppe)
     
-    plot_management_summary(df)
-    plot_correction_heatmap(df)
-    plot_detail_structure(df)
+    # Etwas höher
+    return Diagramm("3_Detail_Struktur.png", zeichne_detail_structure,
+                    {"agg_subset": agg_subset, "top_kunde": top_kunde, "beispiel_gruppe": beispiel_gruppe},
+                    figsize=(14, 8), bbox_inches='tight')
+
+@verfolgt
+def main(workers=1):
+    print("=== TEILAUFGABE 5: VISUALISIERUNG (FIXED LAYOUT) ===")
+    cube = load_data()
+    if cube is None: return
+    
+    heatmap_seiten = plot_correction_heatmap(cube)
+    diagramme = [
+        plot_management_summary(cube),
+        *heatmap_seiten,
+        plot_detail_structure(cube),
+    ]
+    # Nur Plots mit geänderten Daten werden neu gezeichnet (siehe diagramme.py)
+    rendere_diagramme([d for d in diagramme if d is not None], OUTPUT_DIR_PLOTS, workers)
+    if len(heatmap_seiten) > 1:
+        rendere_pdf(heatmap_seiten, os.path.join(OUTPUT_DIR_PLOTS, "2_Korrektur_Heatmap.pdf"))
+    else:
+        # Eine Seite liegt nur als PNG vor: PDF eines früheren Laufs entfernen
+        entferne_diagramme(OUTPUT_DIR_PLOTS, ["2_Korrektur_Heatmap.pdf"])
     
     print("\n✅ Fertig! Plots befinden sich in ./output/final/plots/")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Visualisierung des abgeglichenen Forecasts")
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Prozesse für die Plots (0 = alle Kerne)"
+    )
+    parser.add_argument(
+        "--trace",
+        default=TRACE_DIR,
+        help="Ordner für eine Chrome-Trace-Datei mit Zeit/Speicher pro Stufe",
+    )
+    args = parser.parse_args()
+    aktiviere(args.trace)
+    main(worker_anzahl(args.workers))
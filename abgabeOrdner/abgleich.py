@@ -0,0 +1,229 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from monatscode import code_zu_ordinal, monats_codes, ordinal_zu_code
+from panel import baue_panels
+
+# Ebene -> Schlüsselspalte (None = eine Gruppe über alles, nur nach Monat)
+EBENEN = {"Kunde": "Kunde", "Gruppe": "Gruppe", "Gesamt": None}
+GESAMT_LABEL = "GESAMT"
+
+
+def faktoren(ist, ziel):
+    """
+    Abgleichsfaktor Ziel / Ist als Array-Operation, gleiche Regeln wie
+    calculate_factor: Ist == 0 -> 0.0, Ziel == 0 -> 1.0, sonst Ziel / Ist.
+    """
+    ist = np.asarray(ist, dtype=float)
+    ziel = np.asarray(ziel, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        quote = ziel / ist
+    return np.where(ist == 0, 0.0, np.where(ziel == 0, 1.0, quote))
+
+
+def runde_summentreu(werte, gruppen):
+    """
+    Rundet auf ganze Stück, so dass jede Gruppe (z.B. Kunde x Monat) in
+    Summe genau ihre gerundete Summe trifft (Largest Remainder): alle
+    Werte werden abgerundet, die fehlenden Stück bekommen die Zeilen mit
+    dem größten Rest. Vektorisiert über Sortierung nach (Gruppe, -Rest)
+    und den Rang innerhalb der Gruppe, bei gleichem Rest entscheidet die
+    Zeilenreihenfolge.
+
+    Args:
+        werte: nicht negative Mengen (z.B. Menge * Faktor)
+        gruppen: int-Gruppe pro Zeile
+
+    Returns:
+        np.ndarray (int64)
+    """
+    werte = np.asarray(werte, dtype=float)
+    gruppen = np.asarray(gruppen)
+    basis = np.floor(werte)
+    if len(werte) == 0:
+        return basis.astype(np.int64)
+
+    reihenfolge = np.lexsort((basis - werte, gruppen))
+    g = gruppen[reihenfolge]
+    neu = np.r_[True, g[1:] != g[:-1]]
+    start = np.flatnonzero(neu)
+    gruppe_nr = np.cumsum(neu) - 1
+    rang = np.arange(len(g)) - start[gruppe_nr]
+
+    fehlend = np.round(np.add.reduceat(werte[reihenfolge], start)) - np.add.reduceat(
+        basis[reihenfolge], start
+    )
+    plus = reihenfolge[rang < fehlend[gruppe_nr]]
+    basis[plus] += 1
+    return basis.astype(np.int64)
+
+
+def zellen_ids(*spalten):
+    """Gruppe pro Zeile aus mehreren Schlüsselspalten (NaN = eigener Wert)."""
+    codes, groessen = [], []
+    for spalte in spalten:
+        c, uniques = pd.factorize(spalte, use_na_sentinel=False)
+        codes.append(c)
+        groessen.append(max(len(uniques), 1))
+    return np.ravel_multi_index(codes, groessen)
+
+
+def abgleich_ebene(
+    df_forecast,
+    df_plan,
+    ebene="Kunde",
+    col_menge="Menge",
+    col_ziel="Ziel_Summe",
+    ord_forecast=None,
+):
+    """
+    Faktoren für eine Ebene (Kunde, Gruppe oder Gesamt) x Monat.
+
+    Prognose und Plan werden als Panels (Serie x Monat, siehe panel.py)
+    summiert, der Faktor pro Zelle vektorisiert berechnet und über die
+    Panel-Position jeder Artikelzeile zurückgegeben (kein zweiter Merge).
+
+    Returns:
+        np.ndarray: Faktor pro Prognosezeile (NaN = kein Plan für die Zelle),
+        pd.DataFrame: [ebene, 'Monat', 'Bottom_Up_Summe', 'Ziel_Summe', 'Faktor']
+        für alle Zellen, die in Prognose und Plan vorkommen
+
+    ord_forecast: bereits berechnete Monats-Ordinale der Prognose (spart die
+    Umrechnung, wenn mehrere Ebenen nacheinander abgeglichen werden)
+    """
+    if ebene not in EBENEN:
+        raise ValueError(f"Unbekannte Ebene '{ebene}' (erlaubt: {', '.join(EBENEN)})")
+    spalte = EBENEN[ebene]
+    if spalte is not None and spalte not in df_plan.columns:
+        raise KeyError(f"Plan hat keine Spalte '{spalte}' für Ebene '{ebene}'")
+
+    if ord_forecast is None:
+        ord_forecast = code_zu_ordinal(monats_codes(df_forecast["Monat"]))
+
+    # Ist und Plan als Panels mit gemeinsamen Serien/Monaten (Summe je Zelle)
+    (ist, ziel), ((serie_f, pos_f), _) = baue_panels(
+        [df_forecast, df_plan],
+        [] if spalte is None else [spalte],
+        [col_menge, col_ziel],
+        normalisieren=True,
+        dtype=np.float64,
+        ordinale=[ord_forecast, None],
+    )
+
+    # "Merge" (inner) = Zellen, die in beiden belegt sind
+    beide = ist.belegt & ziel.belegt
+    faktor_zelle = np.full(ist.werte.shape, np.nan)
+    faktor_zelle[beide] = faktoren(ist.werte[beide], ziel.werte[beide])
+
+    # Jede Artikelzeile liest ihre Zelle
+    faktor_zeile = np.full(len(serie_f), np.nan)
+    ok = serie_f >= 0
+    faktor_zeile[ok] = faktor_zelle[serie_f[ok], pos_f[ok]]
+
+    serie_z, pos_z = np.nonzero(beide)
+    labels = (
+        ist.namen(serie_z)[spalte]
+        if spalte is not None
+        else np.full(len(serie_z), GESAMT_LABEL, dtype=object)
+    )
+    merged = pd.DataFrame(
+        {
+            ebene: labels,
+            "Monat": ist.monate[pos_z],
+            "Bottom_Up_Summe": ist.werte[serie_z, pos_z],
+            "Ziel_Summe": ziel.werte[serie_z, pos_z],
+            "Faktor": faktor_zelle[serie_z, pos_z],
+        }
+    )
+    return faktor_zeile, merged
+
+
+def abgleichen(df_forecast, df_plan, ebenen="Kunde", col_menge="Menge", rundung="einzeln"):
+    """
+    Gleicht die Artikelprognose auf eine oder mehrere Ebenen ab.
+
+    Args:
+        ebenen: "Kunde", "Gruppe", "Gesamt" oder eine Liste davon
+        df_plan: ein Plan für alle Ebenen oder dict {ebene: plan}
+        rundung: "einzeln" (jede Zeile für sich) oder "summentreu" (Summe
+            je Ebene x Monat bleibt erhalten, siehe runde_summentreu)
+
+    Bei einer Ebene entstehen die Spalten 'Faktor' und 'Menge_Geglaettet',
+    bei mehreren 'Faktor_<Ebene>' und 'Menge_Geglaettet_<Ebene>'.
+    Zeilen ohne Plan behalten ihre Menge (Faktor 1.0).
+
+    Returns:
+        pd.DataFrame: Prognose mit Faktor-Spalten, dict {ebene: Zellen-Übersicht}
+    """
+    einzeln = isinstance(ebenen, str)
+    liste = [ebenen] if einzeln else list(ebenen)
+
+    df_final = df_forecast.reset_index(drop=True)
+    menge = df_final[col_menge].to_numpy(dtype=float)
+    ord_f = code_zu_ordinal(monats_codes(df_final["Monat"]))
+    uebersichten = {}
+    for ebene in liste:
+        plan = df_plan[ebene] if isinstance(df_plan, dict) else df_plan
+        faktor, uebersichten[ebene] = abgleich_ebene(
+            df_final, plan, ebene=ebene, col_menge=col_menge, ord_forecast=ord_f
+        )
+        faktor = np.where(np.isnan(faktor), 1.0, faktor)
+        suffix = "" if einzeln else f"_{ebene}"
+        df_final["Faktor" + suffix] = faktor
+        if rundung == "summentreu":
+            spalte = EBENEN[ebene]
+            gruppen = zellen_ids(ord_f) if spalte is None else zellen_ids(df_final[spalte], ord_f)
+            gerundet = runde_summentreu(menge * faktor, gruppen)
+        elif rundung == "einzeln":
+            gerundet = np.round(menge * faktor).astype(int)
+        else:
+            raise ValueError(f"Unbekannte Rundung '{rundung}' (erlaubt: einzeln, summentreu)")
+        df_final["Menge_Geglaettet" + suffix] = gerundet
+
+    return df_final, uebersichten
+
+
+def _benchmark(n_zeilen, n_kunden, n_gruppen, n_monate, seed=0):
+    """Synthetische Artikelzeilen, misst den Abgleich auf allen Ebenen."""
+    rng = np.random.default_rng(seed)
+    kunden = np.array([f"W{i:03d}" for i in range(n_kunden)], dtype=object)
+    gruppen = np.array([f"G{i:02d}" for i in range(n_gruppen)], dtype=object)
+    monate = ordinal_zu_code(2026 * 12 + np.arange(n_monate))
+
+    start = time.perf_counter()
+    df_forecast = pd.DataFrame(
+        {
+            "Kunde": kunden[rng.integers(0, n_kunden, n_zeilen)],
+            "Gruppe": gruppen[rng.integers(0, n_gruppen, n_zeilen)],
+            "Monat": monate[rng.integers(0, n_monate, n_zeilen)],
+            "Menge": rng.gamma(2.0, 50.0, n_zeilen),
+        }
+    )
+    plan_index = pd.MultiIndex.from_product(
+        [kunden, gruppen, monate], names=["Kunde", "Gruppe", "Monat"]
+    )
+    df_plan = plan_index.to_frame(index=False)
+    df_plan["Ziel_Summe"] = rng.gamma(2.0, 50.0, len(df_plan)) * n_zeilen / len(df_plan)
+    print(f"Testdaten: {n_zeilen:,} Zeilen in {time.perf_counter() - start:.2f}s")
+
+    for ebenen in (["Kunde"], ["Gruppe"], ["Gesamt"], list(EBENEN)):
+        start = time.perf_counter()
+        abgleichen(df_forecast, df_plan, ebenen=ebenen)
+        dauer = time.perf_counter() - start
+        print(
+            f"   {'+'.join(ebenen):<20} {dauer:7.2f}s  "
+            f"({n_zeilen / dauer / 1e6:6.1f} Mio. Zeilen/s)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Durchsatz des Abgleichs messen")
+    parser.add_argument("--zeilen", type=int, default=10_000_000)
+    parser.add_argument("--kunden", type=int, default=50)
+    parser.add_argument("--gruppen", type=int, default=20)
+    parser.add_argument("--monate", type=int, default=24)
+    args = parser.parse_args()
+    _benchmark(args.zeilen, args.kunden, args.gruppen, args.monate)
@@ -0,0 +1,209 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from hierarchie_cube import GRUPPIERUNGEN, cube_ebene, lade_oder_baue_cube
+
+# --- KONFIGURATION ---
+INPUT_FILE_ROHDATEN = "dieEchtenDaten.xlsb"
+OUTPUT_DIR = "./output/backtest"
+# Genauigkeits-Cube: Zellen (Ebene x Schlüssel x Horizont x Monat) und Kennzahlen
+OUTPUT_ZELLEN = "Genauigkeit_Monat.parquet"
+OUTPUT_KENNZAHLEN = "Genauigkeit.parquet"
+OUTPUT_EXCEL = "Genauigkeit.xlsx"
+IST = "bedmo_mg"
+# Horizont (Jahre) -> Prognosespalte im Hierarchie-Cube
+HORIZONTE = {1: "prog_mg1", 2: "prog_mg2"}
+# Ebenen aus hierarchie_cube.GRUPPIERUNGEN: Artikel -> Teilegruppe -> Kunde -> Gesamt
+EBENEN = ("Artikel", "Teilegruppe", "Kunde", "Gesamt")
+# Die Artikelebene ist für Excel zu groß, sie steht nur im Parquet
+EXCEL_EBENEN = ("Teilegruppe", "Kunde", "Gesamt")
+
+
+def _dims(ebene):
+    return list(GRUPPIERUNGEN[ebene])
+
+
+def _zeitfenster(gesamt, spalte):
+    """Erster und letzter Monat (JJJJMM), in dem die Spalte belegt ist."""
+    monate = gesamt.loc[gesamt[spalte].notna(), "Monat"]
+    if monate.empty:
+        return None
+    return int(monate.min()), int(monate.max())
+
+
+def richte_aus(cube, ebenen=EBENEN, horizonte=None, ist=IST):
+    """
+    Stellt Prognose und Ist pro Monat gegenüber (rollierender Ursprung).
+
+    Jede Rohzeile trägt die Prognose für progmo (1 Jahr) und progmo2
+    (2 Jahre); im Hierarchie-Cube sind beide schon auf Monat x Ebene
+    summiert und mit dem Ist (bedmo) über denselben Monat verbunden. Jeder
+    Prognosemonat ist damit ein eigener Ursprung, ausgewertet wird pro
+    Horizont nur der Zeitraum, in dem es sowohl Ist als auch Prognose gibt.
+    Fehlt eine Seite in einer Zelle, zählt sie als 0.
+
+    Returns:
+        pd.DataFrame: Ebene, Horizont, <Dimensionen>, Monat, Prognose, Ist,
+        Fehler (Prognose - Ist), AbsFehler, APE (NaN bei Ist = 0)
+    """
+    horizonte = HORIZONTE if horizonte is None else horizonte
+    gesamt = cube_ebene(cube, "Gesamt")
+    fenster_ist = _zeitfenster(gesamt, ist)
+
+    teile = []
+    for horizont, spalte in horizonte.items():
+        fenster = _zeitfenster(gesamt, spalte)
+        if fenster is None or fenster_ist is None:
+            print(f"   ⚠️ Horizont {horizont}: keine Prognose oder kein Ist vorhanden")
+            continue
+        von = max(fenster[0], fenster_ist[0])
+        bis = min(fenster[1], fenster_ist[1])
+        if von > bis:
+            print(f"   ⚠️ Horizont {horizont}: Prognose und Ist überlappen nicht")
+            continue
+
+        for ebene in ebenen:
+            dims = _dims(ebene)
+            teil = cube_ebene(cube, ebene)
+            monat = teil["Monat"].to_numpy()
+            prognose = teil[spalte].to_numpy(dtype=float)
+            wert_ist = teil[ist].to_numpy(dtype=float)
+            # Zellen ohne Prognose und ohne Ist gehören nicht zur Auswertung
+            ok = (monat >= von) & (monat <= bis) & ~(np.isnan(prognose) & np.isnan(wert_ist))
+            prognose = np.nan_to_num(prognose[ok])
+            wert_ist = np.nan_to_num(wert_ist[ok])
+            fehler = prognose - wert_ist
+            with np.errstate(divide="ignore", invalid="ignore"):
+                ape = np.where(wert_ist > 0, np.abs(fehler) / wert_ist, np.nan)
+
+            zellen = pd.DataFrame({"Ebene": ebene, "Horizont": np.int8(horizont)}, index=range(ok.sum()))
+            for dim in GRUPPIERUNGEN["Artikel"]:
+                zellen[dim] = teil[dim].to_numpy()[ok] if dim in dims else None
+            zellen["Monat"] = monat[ok]
+            zellen["Prognose"] = prognose
+            zellen["Ist"] = wert_ist
+            zellen["Fehler"] = fehler
+            zellen["AbsFehler"] = np.abs(fehler)
+            zellen["APE"] = ape
+            teile.append(zellen)
+
+    if not teile:
+        return pd.DataFrame()
+    return pd.concat(teile, ignore_index=True)
+
+
+def kennzahlen(zellen):
+    """
+    WAPE, MAPE und Bias je Ebene x Schlüssel x Horizont über alle Monate.
+
+    - WAPE = Σ|Prognose - Ist| / Σ Ist
+    - MAPE = Mittel der APE über die Monate mit Ist > 0
+    - Bias = Σ(Prognose - Ist) / Σ Ist (> 0: Überprognose)
+
+    Die Fehler werden auf der jeweiligen Ebene gebildet (erst summieren,
+    dann vergleichen), nicht aus den Artikelfehlern hochgerechnet.
+    """
+    if zellen.empty:
+        return pd.DataFrame()
+    ergebnisse = []
+    for ebene, teil in zellen.groupby("Ebene", sort=False):
+        keys = ["Horizont"] + _dims(ebene)
+        agg = (
+            teil.groupby(keys, sort=True, dropna=False)
+            .agg(
+                Monate=("Monat", "size"),
+                Prognose=("Prognose", "sum"),
+                Ist=("Ist", "sum"),
+                Fehler=("Fehler", "sum"),
+                AbsFehler=("AbsFehler", "sum"),
+                MAPE=("APE", "mean"),
+            )
+            .reset_index()
+        )
+        agg.insert(0, "Ebene", ebene)
+        ergebnisse.append(agg)
+
+    result = pd.concat(ergebnisse, ignore_index=True)
+    ist = result["Ist"].to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result["WAPE"] = np.where(ist > 0, result["AbsFehler"] / ist, np.nan)
+        result["Bias"] = np.where(ist > 0, result["Fehler"] / ist, np.nan)
+    spalten = ["Ebene", "Horizont"] + list(GRUPPIERUNGEN["Artikel"])
+    for dim in GRUPPIERUNGEN["Artikel"]:
+        if dim not in result:
+            result[dim] = None
+        result[dim] = result[dim].astype(object)
+    rest = [c for c in result.columns if c not in spalten]
+    return result[spalten + rest]
+
+
+def _schreibe_parquet(df, pfad):
+    tmp = f"{pfad}.{os.getpid()}.tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, pfad)
+
+
+def schreibe_genauigkeit(zellen, tabelle, out_dir=OUTPUT_DIR):
+    """Genauigkeits-Cube als Parquet (alle Ebenen) + Excel (ohne Artikelebene)."""
+    os.makedirs(out_dir, exist_ok=True)
+    try:
+        _schreibe_parquet(zellen, os.path.join(out_dir, OUTPUT_ZELLEN))
+        _schreibe_parquet(tabelle, os.path.join(out_dir, OUTPUT_KENNZAHLEN))
+    except ImportError:
+        print("   ⚠️ pyarrow ist NICHT installiert -> Genauigkeits-Cube wird nicht gespeichert")
+
+    with pd.ExcelWriter(os.path.join(out_dir, OUTPUT_EXCEL)) as writer:
+        for ebene in EXCEL_EBENEN:
+            teil = tabelle[tabelle["Ebene"] == ebene]
+            teil = teil.drop(columns=[d for d in GRUPPIERUNGEN["Artikel"] if d not in _dims(ebene)])
+            teil.to_excel(writer, sheet_name=ebene, index=False)
+    print(f"   💾 Genauigkeit gespeichert in {out_dir}")
+
+
+def backtest(filepath=INPUT_FILE_ROHDATEN, cube=None, ebenen=EBENEN):
+    """
+    Rollierender Backtest der ERP-Prognosen (Jahr 1 und 2) gegen das Ist.
+
+    Returns:
+        (zellen, kennzahlen) wie richte_aus() und kennzahlen()
+    """
+    start = time.perf_counter()
+    if cube is None:
+        cube = lade_oder_baue_cube(filepath)
+    zellen = richte_aus(cube, ebenen)
+    tabelle = kennzahlen(zellen)
+    print(
+        f"   🎯 Backtest: {len(zellen)} Zellen, {len(tabelle)} Kennzahlzeilen "
+        f"({time.perf_counter() - start:.2f}s)"
+    )
+    return zellen, tabelle
+
+
+def main(filepath=INPUT_FILE_ROHDATEN):
+    print("🚀 Starte Backtest der ERP-Prognosen")
+    if not os.path.exists(filepath):
+        print(f"❌ Fehler: {filepath} fehlt.")
+        return
+    zellen, tabelle = backtest(filepath)
+    if tabelle.empty:
+        print("❌ Keine auswertbaren Monate.")
+        return
+    schreibe_genauigkeit(zellen, tabelle)
+
+    gesamt = tabelle[tabelle["Ebene"] == "Gesamt"]
+    for _, zeile in gesamt.iterrows():
+        print(
+            f"   Horizont {zeile['Horizont']} Jahr(e): WAPE {zeile['WAPE']:.1%} | "
+            f"MAPE {zeile['MAPE']:.1%} | Bias {zeile['Bias']:+.1%} ({zeile['Monate']} Monate)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest der ERP-Prognosen gegen das Ist")
+    parser.add_argument("datei", nargs="?", default=INPUT_FILE_ROHDATEN)
+    args = parser.parse_args()
+    main(args.datei)
@@ -0,0 +1,355 @@
+import argparse
+import contextlib
+import gc
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from ergebnis_cube import oeffne_cube, schreibe_cube
+from diagramme import rendere_diagramme
+from glaettung import glaette_panel
+from panel import baue_panels
+from rohdaten_cache import cache_schluessel, load_rohdaten_cached
+from rohdaten_schema import ROHDATEN_SCHEMA
+from skripte import lade_skript
+from sporadisch import SPORADISCH_AB
+from synthetik import erzeuge_programmblatt, erzeuge_rohdaten
+
+# --- KONFIGURATION ---
+OUTPUT_DIR = "./output/benchmark"
+OUTPUT_FILE = "benchmark.csv"
+GROESSEN = (10**4, 10**5, 10**6, 10**7)
+STUFEN = (
+    "load_excel",
+    "load",
+    "agg_Rohdaten",
+    "agg_Werkprogramm",
+    "detect_and_smooth",
+    "run_reconciliation",
+    "cube",
+    "konsistenz",
+    "plots",
+)
+# load_excel: größter Auszug, der als .xlsx geschrieben wird. openpyxl
+# schreibt ~1000 Zeilen/s (52 Spalten), Excel fasst höchstens 1.048.575
+EXCEL_MAX_ZEILEN = 10**5
+# Braucht eine Stufe länger, wird sie bei den größeren Läufen ausgelassen
+MAX_SEKUNDEN = 120
+# Aufwärmlauf (ungemessen): Importe, erste Figuren, Caches von numpy/pandas
+AUFWAERM_ZEILEN = 2_000
+# Skalierungsexponent (Zeit ~ Zeilen^k) ab dem eine Stufe nicht mehr linear skaliert
+EXPONENT_WARNUNG = 1.2
+
+
+class _Ausgelassen(Exception):
+    """Stufe ist bei dieser Größe nicht messbar (Grund als Text)."""
+
+
+# ---------------------------------------------------------
+# Stufen: jede liest ihre Eingaben aus daten und legt ihr Ergebnis dort ab
+# ---------------------------------------------------------
+
+
+def _stufe_load_excel(daten):
+    # Erster Lauf: Excel parsen (openpyxl, xlsb lässt sich nicht schreiben),
+    # Schema anwenden, Parquet-Cache schreiben; eigener, leerer Cache-Ordner
+    if "xlsx" not in daten:
+        raise _Ausgelassen(f"> {EXCEL_MAX_ZEILEN:,} Zeilen")
+    load_rohdaten_cached(
+        daten["xlsx"], engine="openpyxl", cache_dir=os.path.join(daten["tmp"], "cache_excel")
+    )
+
+
+def _stufe_load(daten):
+    # Jeder weitere Lauf: Cache-Treffer von load_rohdaten_cached
+    daten["rohdaten"] = load_rohdaten_cached(
+        daten["quelle"], engine="openpyxl", cache_dir=daten["tmp"]
+    )
+
+
+def _stufe_agg_rohdaten(daten):
+    daten["rohdaten_agg"] = lade_skript("2-Abweichungsanalyse.py").agg_Rohdaten(daten["rohdaten"])
+
+
+def _stufe_agg_werkprogramm(daten):
+    daten["plan"] = lade_skript("2-Abweichungsanalyse.py").agg_Werkprogramm(daten["programmblatt"])
+    # Plan-Datei für Schritt 4 (Werk x Monat, klein)
+    daten["plan_xlsx"] = os.path.join(daten["tmp"], "agg_baumarktprogramm.xlsx")
+    daten["plan"].to_excel(daten["plan_xlsx"], index=False)
+
+
+def _stufe_detect_and_smooth(daten):
+    # Wie Schritt 1, aber auf Artikel x Werk statt nur Werk (skaliert mit den Daten)
+    (panel,), _ = baue_panels(
+        [daten["rohdaten"]], ["matnr", "werk"], ["wavor_bstlmg"], monat_spalte="bedmo"
+    )
+    daten["geglaettet"] = glaette_panel(panel, "wavor_bstlmg", sporadisch_ab=SPORADISCH_AB)
+
+
+def _stufe_run_reconciliation(daten):
+    schritt3 = lade_skript("3-Prognoseglättung.py")
+    df_forecast = schritt3.clean_keys(schritt3.build_forecast(daten["rohdaten"]))
+    df_plan = daten["plan"].rename(columns={"Werk": "Kunde", "Zahl": "Ziel_Summe"})
+    df_plan["Ziel_Summe"] = df_plan["Ziel_Summe"] * 1000
+    df_plan = schritt3.clean_keys(df_plan)
+    daten["final"], _ = schritt3.run_reconciliation(df_forecast, df_plan)
+
+
+def _stufe_cube(daten):
+    # Ausgabe von Schritt 3 für Schritt 4/5
+    daten["cube_basis"] = os.path.join(daten["tmp"], "forecast")
+    schreibe_cube(daten["final"], daten["cube_basis"])
+
+
+def _stufe_konsistenz(daten):
+    # Schritt 4 ohne Report aus Schritt 3: Cube mappen, Plan lesen, vergleichen
+    schritt4 = lade_skript("4-Konsistenzprüfung.py")
+    schritt4.CUBE_BASIS = daten["cube_basis"]
+    schritt4.FILE_FORECAST_FINAL = os.path.join(daten["tmp"], "fehlt.xlsx")
+    schritt4.FILE_PLAN = daten["plan_xlsx"]
+    schritt4.FILE_REPORT = os.path.join(daten["tmp"], "Konsistenz_Report.xlsx")
+    daten["konsistenz"] = schritt4.pruefe_neu()
+
+
+def _stufe_plots(daten):
+    schritt5 = lade_skript("5-Visualisierung.py")
+    cube = oeffne_cube(daten["cube_basis"])
+    diagramme = [
+        schritt5.plot_management_summary(cube),
+        *schritt5.plot_correction_heatmap(cube),
+        schritt5.plot_detail_structure(cube),
+    ]
+    # Jede Größe in einen eigenen Ordner: ohne Manifest wird alles gezeichnet
+    out_dir = os.path.join(daten["tmp"], "plots")
+    rendere_diagramme([d for d in diagramme if d is not None], out_dir)
+
+
+# Stufe -> (Funktion, Stufen, deren Ergebnis sie braucht)
+_STUFEN = {
+    "load_excel": (_stufe_load_excel, ()),
+    "load": (_stufe_load, ()),
+    "agg_Rohdaten": (_stufe_agg_rohdaten, ("load",)),
+    "agg_Werkprogramm": (_stufe_agg_werkprogramm, ()),
+    "detect_and_smooth": (_stufe_detect_and_smooth, ("load",)),
+    "run_reconciliation": (_stufe_run_reconciliation, ("load", "agg_Werkprogramm")),
+    "cube": (_stufe_cube, ("run_reconciliation",)),
+    "konsistenz": (_stufe_konsistenz, ("cube", "agg_Werkprogramm")),
+    "plots": (_stufe_plots, ("cube",)),
+}
+
+
+def _mit_vorgaengern(stufen):
+    """Gewünschte Stufen plus alle, deren Ergebnis sie (indirekt) brauchen."""
+    alle = set()
+    offen = list(stufen)
+    while offen:
+        stufe = offen.pop()
+        if stufe not in alle:
+            alle.add(stufe)
+            offen.extend(_STUFEN[stufe][1])
+    return alle
+
+
+# ---------------------------------------------------------
+# Messung
+# ---------------------------------------------------------
+
+
+def _bereite_vor(zeilen, tmp, seed, mit_excel=True):
+    """
+    Synthetischer Auszug (nicht gemessen): als .xlsx für load_excel (bis
+    EXCEL_MAX_ZEILEN), als Cache-Eintrag in tmp für load, dazu das
+    Programmblatt.
+    """
+    rohdaten = erzeuge_rohdaten(zeilen, seed=seed)
+    daten = {"tmp": tmp, "programmblatt": erzeuge_programmblatt(rohdaten, seed=seed)}
+    if mit_excel and zeilen <= EXCEL_MAX_ZEILEN:
+        daten["xlsx"] = os.path.join(tmp, f"synthetik_{zeilen}_{seed}.xlsx")
+        rohdaten.to_excel(daten["xlsx"], index=False)
+    # Quelle für load: der Cache-Schlüssel hängt nur am Inhalt, die Datei
+    # muss also kein echtes Excel sein (bei 10^7 Zeilen ginge das nicht)
+    daten["quelle"] = os.path.join(tmp, f"synthetik_{zeilen}_{seed}.bin")
+    with open(daten["quelle"], "w") as f:
+        f.write(f"synthetik zeilen={zeilen} seed={seed}\n")
+    schluessel = cache_schluessel(daten["quelle"], 0, "openpyxl", ROHDATEN_SCHEMA)
+    rohdaten.to_parquet(os.path.join(tmp, f"{schluessel}.parquet"), index=False)
+    return daten, rohdaten["matnr"].nunique()
+
+
+def miss(funktion, daten, speicher=True, leise=True):
+    """
+    Führt eine Stufe einmal aus.
+
+    speicher: Spitzenbedarf mit tracemalloc messen (numpy und pandas melden
+    ihre Puffer dort an; kostet etwas Laufzeit bei vielen Python-Objekten)
+
+    Returns:
+        (Sekunden, Spitze in MB oder NaN)
+    """
+    gc.collect()
+    if speicher:
+        tracemalloc.start()
+    ausgabe = io.StringIO() if leise else None
+    try:
+        with contextlib.redirect_stdout(ausgabe) if leise else contextlib.nullcontext():
+            start = time.perf_counter()
+            funktion(daten)
+            sekunden = time.perf_counter() - start
+        spitze = tracemalloc.get_traced_memory()[1] / 1024**2 if speicher else np.nan
+    finally:
+        if speicher:
+            tracemalloc.stop()
+    return sekunden, spitze
+
+
+def benchmark(groessen=GROESSEN, stufen=STUFEN, max_sekunden=MAX_SEKUNDEN, speicher=True, seed=0):
+    """
+    Misst jede Stufe auf synthetischen Auszügen wachsender Größe.
+
+    Eine Stufe, die bei einer Größe länger als max_sekunden braucht (oder
+    an Speicher scheitert), wird bei den größeren Läufen ausgelassen, ebenso
+    die Stufen, die ihr Ergebnis brauchen.
+
+    Returns:
+        pd.DataFrame: Stufe, Zeilen, Artikel, Sekunden, Spitze_MB, ns_pro_Zeile
+        (NaN, wenn ausgelassen), Status
+    """
+    noetig = _mit_vorgaengern(stufen)
+    with tempfile.TemporaryDirectory(prefix="benchmark_") as tmp:
+        daten, _ = _bereite_vor(AUFWAERM_ZEILEN, tmp, seed, "load_excel" in noetig)
+        for stufe in STUFEN:
+            if stufe in noetig:
+                miss(_STUFEN[stufe][0], daten, speicher=False)
+
+    zu_langsam = set()
+    ergebnisse = []
+    for zeilen in sorted(groessen):
+        with tempfile.TemporaryDirectory(prefix="benchmark_") as tmp:
+            start = time.perf_counter()
+            mit_excel = "load_excel" in noetig and "load_excel" not in zu_langsam
+            daten, n_artikel = _bereite_vor(zeilen, tmp, seed, mit_excel)
+            print(
+                f"\n📏 {zeilen:,} Zeilen, {n_artikel:,} Artikel "
+                f"(erzeugt in {time.perf_counter() - start:.1f}s)"
+            )
+            # Vorgänger laufen mit, damit die gewünschten Stufen ihre Eingaben
+            # bekommen; gemeldet werden nur die gewünschten
+            fertig = set()
+            for stufe in STUFEN:
+                if stufe not in noetig:
+                    continue
+                funktion, vorgaenger = _STUFEN[stufe]
+                zeile = {"Stufe": stufe, "Zeilen": zeilen, "Artikel": n_artikel}
+                if stufe in zu_langsam or any(v not in fertig for v in vorgaenger):
+                    zeile["Status"] = "ausgelassen"
+                else:
+                    try:
+                        sekunden, spitze = miss(funktion, daten, speicher)
+                    except _Ausgelassen as e:
+                        zeile["Status"] = f"ausgelassen ({e})"
+                    except MemoryError:
+                        zu_langsam.add(stufe)
+                        zeile["Status"] = "MemoryError"
+                        print(f"   ❌ {stufe:<20} MemoryError")
+                    else:
+                        fertig.add(stufe)
+                        zeile.update(
+                            Sekunden=sekunden,
+                            Spitze_MB=spitze,
+                            ns_pro_Zeile=sekunden / zeilen * 1e9,
+                            Status="ok",
+                        )
+                        if sekunden > max_sekunden:
+                            zu_langsam.add(stufe)
+                        print(f"   ⏱️  {stufe:<20} {sekunden:8.2f}s  {spitze:9,.1f} MB")
+                if stufe in stufen:
+                    ergebnisse.append(zeile)
+            daten.clear()
+    return skalierung(pd.DataFrame(ergebnisse))
+
+
+def skalierung(df):
+    """
+    Skalierungsexponent pro Stufe zwischen zwei aufeinanderfolgenden
+    Größen: k = log(t2/t1) / log(n2/n1). k ~ 1 heißt linear, deutlich
+    darüber wächst die Laufzeit schneller als die Daten. Sehr kurze
+    Messungen (< 10 ms) sind zu ungenau und bekommen kein k.
+    """
+    if df.empty:
+        return df
+    df = df.reindex(columns=["Stufe", "Zeilen", "Artikel", "Sekunden", "Spitze_MB", "ns_pro_Zeile", "Status"])
+    df = df.sort_values(["Stufe", "Zeilen"], kind="stable")
+    vorher_t = df.groupby("Stufe", sort=False)["Sekunden"].shift()
+    vorher_n = df.groupby("Stufe", sort=False)["Zeilen"].shift()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        k = np.log(df["Sekunden"] / vorher_t) / np.log(df["Zeilen"] / vorher_n)
+    df["Exponent"] = k.where(vorher_t >= 0.01)
+    reihenfolge = {s: i for i, s in enumerate(STUFEN)}
+    df = df.sort_values(["Stufe", "Zeilen"], key=lambda s: s.map(reihenfolge) if s.name == "Stufe" else s)
+    return df.reset_index(drop=True)
+
+
+def drucke_bericht(df, exponent_warnung=EXPONENT_WARNUNG):
+    if df.empty:
+        return
+    tabelle = df.pivot(index="Stufe", columns="Zeilen", values="Sekunden")
+    tabelle = tabelle.reindex([s for s in STUFEN if s in tabelle.index])
+    print("\n📊 Laufzeit in Sekunden (Zeilen ->):")
+    print(tabelle.to_string(float_format=lambda x: f"{x:,.2f}"))
+
+    print("\n📈 Skalierung:")
+    for stufe, teil in df.groupby("Stufe", sort=False):
+        k = teil["Exponent"].dropna()
+        if k.empty:
+            print(f"   {stufe:<20} zu wenig Messpunkte")
+            continue
+        knick = teil.loc[teil["Exponent"] > exponent_warnung, "Zeilen"]
+        if knick.empty:
+            print(f"   ✅ {stufe:<20} skaliert höchstens linear (k max. {k.max():.2f})")
+        else:
+            print(
+                f"   ⚠️ {stufe:<20} skaliert ab {int(knick.iloc[0]):,} Zeilen nicht mehr "
+                f"(k = {teil.loc[knick.index[0], 'Exponent']:.2f})"
+            )
+        ausgelassen = teil.loc[teil["Status"] != "ok", "Zeilen"]
+        if not ausgelassen.empty:
+            print(f"      ausgelassen ab {int(ausgelassen.iloc[0]):,} Zeilen ({teil.loc[ausgelassen.index[0], 'Status']})")
+
+
+def main(groessen=GROESSEN, stufen=STUFEN, max_sekunden=MAX_SEKUNDEN, speicher=True):
+    print("🚀 Starte Skalierungs-Benchmark")
+    df = benchmark(groessen, stufen, max_sekunden, speicher)
+    drucke_bericht(df)
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    pfad = os.path.join(OUTPUT_DIR, OUTPUT_FILE)
+    tmp = f"{pfad}.{os.getpid()}.tmp"
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, pfad)
+    print(f"\n💾 Ergebnisse gespeichert: {pfad}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Laufzeit und Speicher aller Stufen bei 10^4..10^7 Zeilen")
+    parser.add_argument(
+        "--zeilen", type=int, nargs="+", default=list(GROESSEN), help="Größen der synthetischen Auszüge"
+    )
+    parser.add_argument("--stufen", nargs="+", choices=STUFEN, default=list(STUFEN))
+    parser.add_argument(
+        "--max-sekunden",
+        type=float,
+        default=MAX_SEKUNDEN,
+        help="Stufen, die länger brauchen, bei größeren Läufen auslassen",
+    )
+    parser.add_argument(
+        "--ohne-speicher",
+        action="store_true",
+        help="Kein tracemalloc (genauere Zeiten, dafür kein Spitzenbedarf)",
+    )
+    args = parser.parse_args()
+    main(args.zeilen, args.stufen, args.max_sekunden, not args.ohne_speicher)
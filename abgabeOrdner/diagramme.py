@@ -0,0 +1,423 @@
+import hashlib
+import inspect
+import json
+import os
+import re
+import sys
+import time
+import types
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+
+from skripte import lade_skript, skript_dateien
+from tracing import verfolgt
+
+# --- KONFIGURATION ---
+DPI = 150
+# Pro Plot-Ordner: Datei -> Hash der Eingaben, aus denen das PNG gezeichnet wurde
+MANIFEST = ".diagramme.json"
+# Hochzählen, wenn sich etwas ändert, das der Hash nicht sieht (der Hash
+# kennt zeichne, die Funktionen, die sie über Modulnamen aufruft, die
+# rcParams und die matplotlib/seaborn-Version; nicht z.B. Schriftdateien)
+VERSION = 1
+# rcParams, die nur die Umgebung beschreiben, nicht das Bild
+RC_OHNE = ("backend", "backend_fallback", "interactive", "webagg.port", "savefig.directory")
+
+_RAENDER = ("left", "right", "bottom", "top", "wspace", "hspace")
+
+# Pro Prozess wiederverwendete Figuren, Schlüssel = figsize
+_FIGUREN = {}
+
+
+class Diagramm:
+    """
+    Ein Plot als Auftrag: Dateiname, Zeichenfunktion und ihre Eingaben.
+
+    zeichne(fig, **daten) zeichnet in eine leere Figur (ohne pyplot) und muss
+    auf Modulebene definiert sein, damit sie im Prozesspool läuft. Die
+    Eingaben sollen schon aufbereitet sein (kleine Reihen/Tabellen), denn
+    sie bilden zusammen mit dem Quelltext von zeichne den Hash.
+
+        Diagramm("Werk_A_vergleich.png", zeichne_vergleich, {"bm": "Werk A", ...})
+    """
+
+    __slots__ = ("datei", "zeichne", "daten", "figsize", "speichern")
+
+    def __init__(self, datei, zeichne, daten, figsize=(10, 4), **speichern):
+        self.datei = datei
+        self.zeichne = zeichne
+        self.daten = daten
+        self.figsize = tuple(figsize)
+        # Zusätzliche savefig-Argumente, z.B. bbox_inches="tight"
+        self.speichern = {"dpi": DPI, **speichern}
+
+
+# ---------------------------------------------------------
+# Inhalts-Hash
+# ---------------------------------------------------------
+
+
+def _hash_wert(h, wert):
+    """Schreibt einen Wert stabil (unabhängig von id/Speicheradresse) in den Hash."""
+    if isinstance(wert, pd.DataFrame):
+        h.update(repr((list(wert.columns), [str(t) for t in wert.dtypes])).encode())
+        h.update(pd.util.hash_pandas_object(wert, index=True).to_numpy().tobytes())
+    elif isinstance(wert, (pd.Series, pd.Index)):
+        h.update(repr((getattr(wert, "name", None), str(wert.dtype))).encode())
+        h.update(pd.util.hash_pandas_object(wert).to_numpy().tobytes())
+    elif isinstance(wert, np.ndarray):
+        h.update(repr((wert.dtype.str, wert.shape)).encode())
+        if wert.dtype == object:
+            h.update(pd.util.hash_array(wert.ravel()).tobytes())
+        else:
+            h.update(np.ascontiguousarray(wert).tobytes())
+    elif isinstance(wert, dict):
+        for k in sorted(wert, key=repr):
+            h.update(repr(k).encode())
+            _hash_wert(h, wert[k])
+    elif isinstance(wert, (list, tuple)):
+        h.update(f"{type(wert).__name__}{len(wert)}".encode())
+        for w in wert:
+            _hash_wert(h, w)
+    else:
+        h.update(f"{type(wert).__name__}:{wert!r}".encode())
+    h.update(b"\0")
+
+
+def _quelltext(funktion):
+    try:
+        return inspect.getsource(funktion)
+    except (OSError, TypeError):
+        return f"{funktion.__module__}.{funktion.__qualname__}"
+
+
+def _namen(code):
+    """Globale Namen eines Code-Objekts inkl. innerer Funktionen/Lambdas."""
+    namen = set(code.co_names)
+    for konstante in code.co_consts:
+        if isinstance(konstante, types.CodeType):
+            namen |= _namen(konstante)
+    return namen
+
+
+def _quelltexte(funktion):
+    """
+    Quelltext von funktion und aller Python-Funktionen, die sie über ihre
+    Modul-Globals aufruft (rekursiv, Bibliotheken ausgenommen), sortiert
+    nach Namen.
+    """
+    gesehen = {}
+    offen = [funktion]
+    while offen:
+        f = offen.pop()
+        name = f"{f.__module__}.{f.__qualname__}"
+        if name in gesehen:
+            continue
+        gesehen[name] = _quelltext(f)
+        for n in _namen(f.__code__):
+            g = f.__globals__.get(n)
+            if isinstance(g, types.FunctionType) and g.__module__ == f.__module__:
+                offen.append(g)
+    return sorted(gesehen.items())
+
+
+def _stil():
+    """rcParams (z.B. aus sns.set_theme) und Versionen, die das Bild bestimmen."""
+    rc = sorted(
+        (k, repr(v)) for k, v in matplotlib.rcParams.items() if k not in RC_OHNE
+    )
+    seaborn = sys.modules.get("seaborn")
+    return matplotlib.__version__, getattr(seaborn, "__version__", None), rc
+
+
+def diagramm_hash(diagramm, stil=None):
+    """
+    Hash über Eingaben, Zeichenfunktion (samt Hilfsfunktionen aus ihrem
+    Modul), Stil, Größe und Speicheroptionen.
+
+    stil: Ergebnis von _stil(), wenn viele Diagramme gehasht werden
+    """
+    h = hashlib.sha256()
+    _hash_wert(
+        h,
+        (
+            VERSION,
+            stil if stil is not None else _stil(),
+            _quelltexte(diagramm.zeichne),
+            diagramm.figsize,
+            diagramm.speichern,
+            diagramm.daten,
+        ),
+    )
+    return h.hexdigest()
+
+
+def _lese_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _schreibe_manifest(out_dir, manifest):
+    pfad = os.path.join(out_dir, MANIFEST)
+    tmp = f"{pfad}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=0, sort_keys=True)
+    os.replace(tmp, pfad)
+
+
+def _familie(datei):
+    """'plot_S02.png' -> ('plot', '.png'): alle Seiten eines Diagramms."""
+    stamm, endung = os.path.splitext(datei)
+    return re.sub(r"_S\d{2,}$", "", stamm), endung
+
+
+def _entferne(out_dir, manifest, dateien):
+    """Löscht Dateien und ihre Manifest-Einträge (Manifest schreibt der Aufrufer)."""
+    for datei in dateien:
+        try:
+            os.remove(os.path.join(out_dir, datei))
+        except FileNotFoundError:
+            pass
+        manifest.pop(datei, None)
+    if dateien:
+        print(f"   🗑️  {len(dateien)} veraltete Dateien in {out_dir} entfernt")
+
+
+def entferne_diagramme(out_dir, dateien):
+    """
+    Löscht Diagramme aus out_dir samt Manifest-Eintrag, z.B. eine PDF,
+    die nicht mehr geschrieben wird.
+    """
+    manifest = _lese_manifest(out_dir)
+    dateien = [d for d in dateien if d in manifest or os.path.exists(os.path.join(out_dir, d))]
+    if dateien:
+        _entferne(out_dir, manifest, dateien)
+        _schreibe_manifest(out_dir, manifest)
+
+
+# ---------------------------------------------------------
+# Zeichnen
+# ---------------------------------------------------------
+
+
+def _figur(figsize):
+    """Leere Agg-Figur; pro Größe wird eine Figur wiederverwendet."""
+    fig = _FIGUREN.get(figsize)
+    if fig is None:
+        fig = Figure(figsize=figsize)
+        FigureCanvasAgg(fig)
+        _FIGUREN[figsize] = fig
+        return fig
+    fig.clear()
+    # tight_layout der Vorgänger zurücksetzen
+    fig.set_layout_engine("none")
+    fig.subplots_adjust(**{k: matplotlib.rcParams[f"figure.subplot.{k}"] for k in _RAENDER})
+    return fig
+
+
+def _rendere(diagramm, out_dir):
+    """Zeichnet ein Diagramm; Returns: Fehlertext oder None."""
+    try:
+        fig = _figur(diagramm.figsize)
+        diagramm.zeichne(fig, **diagramm.daten)
+        pfad = os.path.join(out_dir, diagramm.datei)
+        tmp = f"{pfad}.{os.getpid()}.tmp"
+        fig.savefig(tmp, format="png", **diagramm.speichern)
+        os.replace(tmp, pfad)
+        return None
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+
+
+def _init_worker(skripte=()):
+    matplotlib.use("Agg")
+    # Lädt die Skripte wie im Hauptprozess (inkl. sns.set_theme auf Modulebene)
+    for datei in skripte:
+        lade_skript(datei)
+
+
+def _stand(diagramme, out_dir):
+    """
+    Returns:
+        pd.DataFrame ['datei', 'hash', 'neu', 'fehler'] pro Diagramm
+        (neu = PNG fehlt oder wurde aus anderen Eingaben gezeichnet)
+    """
+    manifest = _lese_manifest(out_dir)
+    stil = _stil()
+    hashes = [diagramm_hash(d, stil) for d in diagramme]
+    neu = [
+        manifest.get(d.datei) != h or not os.path.exists(os.path.join(out_dir, d.datei))
+        for d, h in zip(diagramme, hashes)
+    ]
+    return pd.DataFrame(
+        {
+            "datei": pd.Series([d.datei for d in diagramme], dtype=object),
+            "hash": pd.Series(hashes, dtype=object),
+            "neu": np.array(neu, dtype=bool),
+            "fehler": pd.Series([None] * len(diagramme), dtype=object),
+        }
+    )
+
+
+@verfolgt(kategorie="plot")
+def rendere_diagramme(diagramme, out_dir, workers=1):
+    """
+    Zeichnet nur Diagramme, deren Eingaben sich seit dem letzten Lauf
+    geändert haben (oder deren PNG fehlt), bei workers > 1 im Prozesspool.
+
+    Returns:
+        (Anzahl gezeichnet, Anzahl aktuell übersprungen)
+    """
+    start = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    stand = _stand(diagramme, out_dir)
+    offen = [diagramme[i] for i in np.flatnonzero(stand["neu"].to_numpy())]
+
+    if workers > 1 and len(offen) > 1:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(offen)),
+            initializer=_init_worker,
+            initargs=(skript_dateien(d.zeichne for d in offen),),
+        ) as pool:
+            fehler = list(
+                pool.map(
+                    _rendere,
+                    offen,
+                    [out_dir] * len(offen),
+                    chunksize=max(1, len(offen) // (4 * workers)),
+                )
+            )
+    else:
+        fehler = [_rendere(d, out_dir) for d in offen]
+
+    stand.loc[stand["neu"].to_numpy(), "fehler"] = np.array(fehler, dtype=object)
+    return trage_ein(out_dir, stand, start)
+
+
+def zeichne_offene(diagramme, out_dir):
+    """
+    Wie rendere_diagramme, aber im aktuellen Prozess und ohne das Manifest
+    zu schreiben: für Worker, die ihre Diagramme selbst aufbereiten (z.B.
+    pro Werk über sharding.nach_werk). Der Hauptprozess übernimmt die
+    zusammengeführten Ergebnisse mit trage_ein.
+
+    Returns:
+        pd.DataFrame ['datei', 'hash', 'neu', 'fehler'] pro Diagramm
+    """
+    stand = _stand(diagramme, out_dir)
+    for i in np.flatnonzero(stand["neu"].to_numpy()):
+        stand.at[i, "fehler"] = _rendere(diagramme[i], out_dir)
+    return stand
+
+
+def trage_ein(out_dir, stand, start):
+    """
+    Schreibt gezeichnete Diagramme (Ergebnis von zeichne_offene) ins
+    Manifest von out_dir; fehlgeschlagene werden ausgetragen.
+    Dateien aus dem Manifest, die zu einem Diagramm dieses Laufs gehören,
+    aber nicht mehr erzeugt werden (z.B. Seite 3 von früher 3, jetzt 2
+    Seiten), werden gelöscht.
+
+    Returns:
+        (Anzahl gezeichnet, Anzahl aktuell übersprungen)
+    """
+    manifest = _lese_manifest(out_dir)
+    gezeichnet = 0
+    for datei, h, neu, fehler in stand[["datei", "hash", "neu", "fehler"]].itertuples(index=False):
+        if not neu:
+            continue
+        if isinstance(fehler, str):
+            manifest.pop(datei, None)
+            print(f"   ⚠️ {datei} nicht gezeichnet: {fehler}")
+        else:
+            manifest[datei] = h
+            gezeichnet += 1
+
+    erzeugt = set(stand["datei"])
+    familien = {_familie(d) for d in erzeugt}
+    veraltet = sorted(d for d in manifest if d not in erzeugt and _familie(d) in familien)
+    _entferne(out_dir, manifest, veraltet)
+    if stand["neu"].any() or veraltet:
+        _schreibe_manifest(out_dir, manifest)
+
+    aktuell = int((~stand["neu"]).sum())
+    print(
+        f"   🖼️  Diagramme in {out_dir}: {gezeichnet} gezeichnet, {aktuell} aktuell "
+        f"({time.perf_counter() - start:.2f}s)"
+    )
+    return gezeichnet, aktuell
+
+
+# ---------------------------------------------------------
+# Seiten (große Kundenzahlen)
+# ---------------------------------------------------------
+
+
+def seiten(n, pro_seite):
+    """
+    Teilt n Elemente (Kunden, Baumärkte, ...) in Seiten fester Größe.
+    Jede Seite wird als eigene Figur fester Größe gezeichnet: Speicher und
+    Zeit pro Seite hängen nicht von n ab.
+
+    Returns:
+        list[slice]: mindestens eine (ggf. leere) Seite
+    """
+    pro_seite = max(int(pro_seite), 1)
+    return [slice(von, min(von + pro_seite, n)) for von in range(0, max(n, 1), pro_seite)]
+
+
+def seiten_name(datei, seite, n_seiten):
+    """'plot.png' -> 'plot_S01.png'; bei nur einer Seite bleibt der Name."""
+    if n_seiten <= 1:
+        return datei
+    stamm, endung = os.path.splitext(datei)
+    breite = max(2, len(str(n_seiten)))
+    return f"{stamm}_S{seite + 1:0{breite}d}{endung}"
+
+
+def rendere_pdf(diagramme, pfad):
+    """
+    Schreibt die Diagramme als Seiten einer PDF-Datei (Seite für Seite in
+    wiederverwendete Figuren). Übersprungen, wenn sich keine Seite
+    geändert hat (Manifest im Ordner der PDF).
+
+    Returns:
+        bool: True, wenn die PDF neu geschrieben wurde
+    """
+    start = time.perf_counter()
+    out_dir, datei = os.path.split(pfad)
+    out_dir = out_dir or "."
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = _lese_manifest(out_dir)
+
+    stil = _stil()
+    h = hashlib.sha256("".join(diagramm_hash(d, stil) for d in diagramme).encode()).hexdigest()
+    if manifest.get(datei) == h and os.path.exists(pfad):
+        print(f"   📄 {pfad}: aktuell ({len(diagramme)} Seiten)")
+        return False
+
+    tmp = f"{pfad}.{os.getpid()}.tmp"
+    # Ohne Erstellungsdatum: gleiche Eingaben -> gleiche Datei
+    with PdfPages(tmp, metadata={"CreationDate": None}) as pdf:
+        for diagramm in diagramme:
+            fig = _figur(diagramm.figsize)
+            diagramm.zeichne(fig, **diagramm.daten)
+            pdf.savefig(fig, **diagramm.speichern)
+    os.replace(tmp, pfad)
+
+    manifest[datei] = h
+    _schreibe_manifest(out_dir, manifest)
+    print(
+        f"   📄 {pfad}: {len(diagramme)} Seiten geschrieben "
+        f"({time.perf_counter() - start:.2f}s)"
+    )
+    return True
@@ -0,0 +1,251 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from monatscode import monats_codes
+
+# --- KONFIGURATION ---
+# Ergebnis von Schritt 3 als Memory-Map: <basis>.bin (Spalten) + <basis>.json (Index)
+CUBE_BASIS = "./output/final/Final_Forecast_2026_2027"
+DIMENSIONEN = ("Artikel", "Kunde", "Gruppe", "Monat")
+WERTE = {
+    "Menge": "float64",
+    "Faktor": "float64",
+    "Menge_Geglaettet": "int64",
+}
+# Jede Spalte beginnt auf einer 64-Byte-Grenze (Cache-Line)
+AUSRICHTUNG = 64
+VERSION = 1
+
+
+class ErgebnisCube:
+    """
+    Spaltenweise Sicht auf den abgeglichenen Forecast.
+
+    Dimensionen liegen als int32-Codes vor (-1 = fehlender Schlüssel), die
+    Labels stehen in index[<dimension>] (Monat: JJJJMM aufsteigend, sonst
+    in der Reihenfolge des ersten Auftretens wie beim Schluesselraum).
+    Mit oeffne_cube() sind alle Spalten schreibgeschützte np.memmap-Arrays:
+    kein Parsen, keine Kopie, mehrere Prozesse teilen sich die Seiten im
+    Page-Cache.
+
+        cube = oeffne_cube()
+        cube.aggregiere(["Kunde", "Monat"], "Menge_Geglaettet")
+    """
+
+    __slots__ = ("spalten", "index")
+
+    def __init__(self, spalten, index):
+        self.spalten = spalten
+        self.index = index
+
+    def __len__(self):
+        return len(next(iter(self.spalten.values()))) if self.spalten else 0
+
+    def __getitem__(self, spalte):
+        return self.spalten[spalte]
+
+    def code(self, dim, label):
+        """Label -> Code (-1, wenn es das Label nicht gibt)."""
+        treffer = np.flatnonzero(self.index[dim] == label)
+        return int(treffer[0]) if len(treffer) else -1
+
+    def labels(self, dim, codes):
+        """Codes -> Labels, -1 -> None."""
+        return np.append(self.index[dim], None)[np.asarray(codes)]
+
+    def aggregiere(self, dims, werte=(), maske=None, funktion="sum"):
+        """
+        groupby(dims)[werte].sum()/.mean() direkt auf den Code-Spalten
+        (np.bincount über das Raster aller Dimensionen).
+
+        Args:
+            dims: Dimension(en), nach denen gruppiert wird
+            werte: Wertspalte(n); leer = Anzahl Zeilen pro Gruppe ('Anzahl')
+            maske: optional bool-Array über alle Zeilen
+            funktion: "sum" oder "mean" (NaN wird wie bei pandas ignoriert)
+
+        Returns:
+            pd.DataFrame: dims (Labels) + Wertspalten, nur belegte Gruppen,
+            in Code-Reihenfolge der Dimensionen
+        """
+        dims = [dims] if isinstance(dims, str) else list(dims)
+        werte = [werte] if isinstance(werte, str) else list(werte)
+        if funktion not in ("sum", "mean"):
+            raise ValueError(f"Unbekannte Aggregation: {funktion}")
+
+        groessen = [len(self.index[d]) for d in dims]
+        zelle = np.zeros(len(self), dtype=np.int64)
+        ok = np.ones(len(self), dtype=bool) if maske is None else np.asarray(maske, bool)
+        for dim, groesse in zip(dims, groessen):
+            codes = self.spalten[dim]
+            zelle = zelle * groesse + codes
+            ok = ok & (codes >= 0)
+        if not ok.all():
+            zelle = zelle[ok]
+        n_zellen = int(np.prod(groessen)) if dims else 1
+
+        anzahl = np.bincount(zelle, minlength=n_zellen)
+        belegt = np.flatnonzero(anzahl)
+        result = pd.DataFrame(
+            {
+                dim: self.index[dim][codes]
+                for dim, codes in zip(dims, np.unravel_index(belegt, groessen))
+            }
+            if dims
+            else {}
+        )
+        if not werte:
+            result["Anzahl"] = anzahl[belegt]
+        for wert in werte:
+            x = np.asarray(self.spalten[wert], dtype=float)
+            x = x if ok.all() else x[ok]
+            nan = np.isnan(x)
+            summe = np.bincount(zelle, weights=np.where(nan, 0.0, x), minlength=n_zellen)
+            if funktion == "mean":
+                n = np.bincount(zelle[~nan], minlength=n_zellen)[belegt]
+                with np.errstate(invalid="ignore"):
+                    result[wert] = summe[belegt] / n
+            else:
+                result[wert] = summe[belegt]
+        return result
+
+    def zu_dataframe(self, spalten=None):
+        """Kopie als DataFrame mit Labels (für Notebooks / Excel-Export)."""
+        spalten = list(self.spalten) if spalten is None else spalten
+        return pd.DataFrame(
+            {
+                s: self.labels(s, self.spalten[s]) if s in self.index else self.spalten[s]
+                for s in spalten
+            }
+        )
+
+
+def _index_labels(uniques):
+    """Eindeutige Schlüssel als JSON-taugliche Python-Werte."""
+    return [u.item() if isinstance(u, np.generic) else u for u in uniques]
+
+
+def cube_aus_dataframe(df, dimensionen=DIMENSIONEN, werte=None):
+    """
+    Kodiert einen Forecast-DataFrame (wie Final_Forecast_2026_2027.xlsx) im
+    Speicher als ErgebnisCube: Dimensionen -> Labels + int32-Codes.
+    """
+    werte = WERTE if werte is None else werte
+    spalten, index = {}, {}
+    for dim in dimensionen:
+        if dim == "Monat":
+            codes, uniques = pd.factorize(monats_codes(df[dim]), sort=True)
+        else:
+            codes, uniques = pd.factorize(df[dim])
+        spalten[dim] = codes.astype(np.int32)
+        index[dim] = np.array(_index_labels(uniques), dtype=object)
+    for wert, dtype in werte.items():
+        spalten[wert] = df[wert].to_numpy(dtype=dtype)
+    return ErgebnisCube(spalten, index)
+
+
+def _merkmal(pfad):
+    """Größe und mtime einer Datei (erkennt ein neu geschriebenes Excel)."""
+    info = os.stat(pfad)
+    return {"groesse": info.st_size, "mtime_ns": info.st_mtime_ns}
+
+
+def entferne_cube(basis=CUBE_BASIS):
+    """Löscht <basis>.bin/.json, damit kein alter Cube ein neues Excel überdeckt."""
+    for endung in (".json", ".bin"):
+        try:
+            os.remove(f"{basis}{endung}")
+        except FileNotFoundError:
+            pass
+
+
+def schreibe_cube(df, basis=CUBE_BASIS, dimensionen=DIMENSIONEN, werte=None, quelle=None):
+    """
+    Schreibt den Forecast als <basis>.bin (alle Spalten hintereinander,
+    64-Byte-ausgerichtet) und <basis>.json (Labels pro Dimension, dtype und
+    Offset pro Spalte).
+
+    Beide Dateien werden über eine Temp-Datei + os.replace ersetzt: Leser,
+    die den alten Cube noch gemappt haben, behalten ihre (alte) Datei.
+
+    quelle: Excel-Datei mit denselben Daten (schon geschrieben). Größe und
+    mtime stehen im Index, oeffne_cube(quelle=...) erkennt damit einen
+    Cube, der nicht mehr zum Excel passt.
+
+    Returns:
+        ErgebnisCube (im Speicher)
+    """
+    cube = cube_aus_dataframe(df, dimensionen, werte)
+    meta = {"version": VERSION, "zeilen": len(df), "spalten": {}, "index": {}}
+    if quelle is not None:
+        meta["quelle"] = _merkmal(quelle)
+
+    ordner = os.path.dirname(basis)
+    if ordner:
+        os.makedirs(ordner, exist_ok=True)
+    tmp_bin = f"{basis}.bin.{os.getpid()}.tmp"
+    tmp_json = f"{basis}.json.{os.getpid()}.tmp"
+    try:
+        with open(tmp_bin, "wb") as f:
+            for name, arr in cube.spalten.items():
+                luecke = -f.tell() % AUSRICHTUNG
+                f.write(b"\0" * luecke)
+                meta["spalten"][name] = {"dtype": arr.dtype.str, "offset": f.tell()}
+                np.ascontiguousarray(arr).tofile(f)
+            meta["bytes"] = f.tell()
+        for dim, labels in cube.index.items():
+            meta["index"][dim] = labels.tolist()
+
+        with open(tmp_json, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, default=str)
+        os.replace(tmp_bin, f"{basis}.bin")
+        os.replace(tmp_json, f"{basis}.json")
+    except BaseException:
+        # Kein halber und kein alter Cube: Leser fallen auf das Excel zurück
+        for tmp in (tmp_bin, tmp_json):
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        entferne_cube(basis)
+        raise
+    return cube
+
+
+def oeffne_cube(basis=CUBE_BASIS, quelle=None):
+    """
+    Öffnet den Cube aus Schritt 3 ohne Kopie (np.memmap, nur lesend).
+
+    quelle: Excel-Datei, zu der der Cube gehören muss. Ist sie seit dem
+    Schreiben des Cubes ersetzt worden (Größe/mtime), gilt der Cube als
+    veraltet.
+
+    Raises:
+        FileNotFoundError: Cube fehlt
+        ValueError: Index und Datei passen nicht zusammen, oder der Cube
+            passt nicht (mehr) zur quelle
+    """
+    with open(f"{basis}.json", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("version") != VERSION:
+        raise ValueError(f"Cube-Version {meta.get('version')} statt {VERSION}")
+    if quelle is not None and os.path.exists(quelle) and meta.get("quelle") != _merkmal(quelle):
+        raise ValueError(f"Cube passt nicht zu {quelle} (älterer Lauf?)")
+
+    pfad_bin = f"{basis}.bin"
+    if os.path.getsize(pfad_bin) != meta["bytes"]:
+        raise ValueError(f"{pfad_bin} passt nicht zum Index (unvollständig geschrieben?)")
+
+    n = meta["zeilen"]
+    spalten = {}
+    for name, info in meta["spalten"].items():
+        dtype = np.dtype(info["dtype"])
+        if n == 0:
+            spalten[name] = np.empty(0, dtype=dtype)
+        else:
+            spalten[name] = np.memmap(
+                pfad_bin, dtype=dtype, mode="r", offset=info["offset"], shape=(n,)
+            )
+    index = {dim: np.array(labels, dtype=object) for dim, labels in meta["index"].items()}
+    return ErgebnisCube(spalten, index)
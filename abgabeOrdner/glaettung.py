@@ -0,0 +1,173 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from panel import baue_panels
+from sporadisch import nullanteil
+
+# Regeln für Störgrößen (wie detect_and_smooth in 1-Datenvertständnis.py)
+DROPOUT_MAX_WERT = 0.1  # Wert fällt (fast) auf 0 ...
+DROPOUT_MIN_SCHNITT = 100  # ... obwohl der gleitende Schnitt deutlich > 0 ist
+MAX_PROZENT_EINBRUCH = -0.70  # mehr als 70 % unter dem gleitenden Schnitt
+
+
+def packe_serien(codes, n_serien):
+    """
+    Zeilen -> 2D-Raster Serie x Position (Reihenfolge innerhalb der Serie
+    bleibt die der Eingangszeilen).
+
+    Returns:
+        reihenfolge (Zeilenindizes sortiert nach Serie), serie, position,
+        laengen (Zeilen pro Serie)
+    """
+    gueltig = np.flatnonzero(codes >= 0)
+    reihenfolge = gueltig[np.argsort(codes[gueltig], kind="stable")]
+    serie = codes[reihenfolge]
+    laengen = np.bincount(serie, minlength=n_serien)
+    anfang = np.concatenate(([0], np.cumsum(laengen)[:-1]))
+    position = np.arange(len(reihenfolge)) - anfang[serie]
+    return reihenfolge, serie, position, laengen
+
+
+def rollierender_mittelwert(werte, laengen, window=3, min_periods=1):
+    """
+    Zentrierter gleitender Mittelwert über die Zeilen jeder Serie, für alle
+    Serien gleichzeitig (werte: 2D Serie x Position, aufgefüllt mit NaN).
+
+    Fenster und min_periods wie rolling(window, center=True, min_periods)
+    .mean(), NaN zählt nicht mit. Gleiche Werte wie groupby().rolling() bis
+    auf Rundung in der letzten Stelle.
+    """
+    n_serien, n_pos = werte.shape
+    offset = (window - 1) // 2
+    # NaN-Rand, damit jedes Fenster window Spalten hat
+    gepolstert = np.pad(
+        np.asarray(werte, dtype=float),
+        ((0, 0), (window - 1 - offset, offset)),
+        constant_values=np.nan,
+    )
+    fenster = sliding_window_view(gepolstert, window, axis=1)
+    anzahl = np.count_nonzero(~np.isnan(fenster), axis=2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mittel = np.nansum(fenster, axis=2) / anzahl
+    mittel[anzahl < max(min_periods, 1)] = np.nan
+    mittel[np.arange(n_pos)[None, :] >= np.asarray(laengen)[:, None]] = np.nan
+    return mittel
+
+
+def glaette_gruppen(df, gruppen_spalten, metric_col="wavor_bstlmg", window=3):
+    """
+    Batch-Version von df.groupby(gruppen_spalten).apply(detect_and_smooth):
+    gleitender Schnitt, Dropout- und Prozent-Regel für alle Serien auf einmal
+    auf einem 2D-Raster Serie x Monat.
+
+    Liefert dieselben Spalten moving_avg, pct_diff, is_outlier und
+    '<metric_col>_geglättet' in derselben Zeilenfolge (Gruppen sortiert,
+    innerhalb der Gruppe wie im Eingang, Gruppen mit fehlendem Schlüssel
+    fallen weg), Index 0..n-1.
+    """
+    codes = (
+        df.groupby(gruppen_spalten, sort=True, observed=True)
+        .ngroup()
+        .fillna(-1)
+        .to_numpy(dtype=np.int64)
+    )
+    n_serien = int(codes.max()) + 1 if len(codes) else 0
+    reihenfolge, serie, position, laengen = packe_serien(codes, n_serien)
+
+    result = df.iloc[reihenfolge].reset_index(drop=True)
+    werte_zeilen = result[metric_col].to_numpy(dtype=float, na_value=np.nan)
+
+    raster = np.full((n_serien, int(laengen.max()) if n_serien else 0), np.nan)
+    raster[serie, position] = werte_zeilen
+    moving_avg = rollierender_mittelwert(raster, laengen, window)[serie, position]
+
+    pct_diff, is_outlier, geglaettet = _stoergroessen(werte_zeilen, moving_avg)
+
+    result["moving_avg"] = moving_avg
+    result["pct_diff"] = pct_diff
+    result["is_outlier"] = is_outlier
+    result[f"{metric_col}_geglättet"] = geglaettet
+    return result
+
+
+def glaette_panel(panel, metric_col="wavor_bstlmg", window=3, sporadisch_ab=None):
+    """
+    Dieselben Regeln auf einem dichten Panel (siehe panel.py): pro Serie vom
+    ersten bis zum letzten belegten Monat, fehlende Monate zählen als 0 statt
+    übersprungen zu werden. Jede Serie ist ein zusammenhängender Ausschnitt.
+
+    sporadisch_ab: Nullanteil, ab dem eine Serie als sporadisch gilt (z.B.
+    sporadisch.SPORADISCH_AB). Nullmonate sind dort normaler Bedarf und
+    keine Störgröße, solche Serien werden nicht geglättet. None = alle
+    Serien nach den Regeln.
+
+    Returns:
+        pd.DataFrame: Schlüsselspalten, 'Monat' (JJJJMM), metric_col,
+        moving_avg, pct_diff, is_outlier, '<metric_col>_geglättet'
+    """
+    belegt = panel.belegt
+    n_serien, n_monate = belegt.shape
+    hat_daten = belegt.any(axis=1)
+    erster = np.argmax(belegt, axis=1)
+    letzter = n_monate - 1 - np.argmax(belegt[:, ::-1], axis=1)
+    laengen = np.where(hat_daten, letzter - erster + 1, 0)
+
+    # Ausschnitte linksbündig in ein Raster legen
+    position = np.arange(int(laengen.max()) if n_serien else 0)
+    maske = position[None, :] < laengen[:, None]
+    spalte = np.minimum(erster[:, None] + position[None, :], max(n_monate - 1, 0))
+    raster = np.where(
+        maske, np.take_along_axis(panel.werte, spalte, axis=1).astype(float), np.nan
+    )
+    moving = rollierender_mittelwert(raster, laengen, window)
+
+    zeilen, pos = np.nonzero(maske)
+    werte = raster[zeilen, pos]
+    moving_avg = moving[zeilen, pos]
+    sporadisch = None
+    if sporadisch_ab is not None:
+        sporadisch = (nullanteil(raster, laengen) >= sporadisch_ab)[zeilen]
+    pct_diff, is_outlier, geglaettet = _stoergroessen(werte, moving_avg, sporadisch)
+
+    result = pd.DataFrame(panel.namen(zeilen))
+    result["Monat"] = panel.monate[erster[zeilen] + pos]
+    result[metric_col] = werte
+    result["moving_avg"] = moving_avg
+    result["pct_diff"] = pct_diff
+    result["is_outlier"] = is_outlier
+    result[f"{metric_col}_geglättet"] = geglaettet
+    return result
+
+
+def glaette_tabelle(
+    df, spalte, metric_col="wavor_bstlmg", monat_spalte="Monat", window=3, sporadisch_ab=None
+):
+    """
+    glaette_panel direkt aus einer Tabelle im langen Format (eine Serie pro
+    Wert von spalte). Jede Serie wird unabhängig geglättet, die Funktion
+    läuft also auch pro Werk in einem Worker (sharding.nach_werk).
+
+    Returns:
+        pd.DataFrame wie glaette_panel, Serien in der Reihenfolge ihres
+        ersten Auftretens in df
+    """
+    (panel,), _ = baue_panels([df], [spalte], [metric_col], monat_spalte=monat_spalte)
+    return glaette_panel(panel, metric_col, window, sporadisch_ab)
+
+
+def _stoergroessen(werte, moving_avg, sporadisch=None):
+    """
+    Prozent-Abweichung, Ausreißer-Maske und geglättete Werte
+    (sporadisch: optionale Maske pro Zeile, dort keine Ausreißer).
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct_diff = (werte - moving_avg) / moving_avg
+    pct_diff[np.isinf(pct_diff) | np.isnan(pct_diff)] = 0.0
+
+    is_dropout = (werte <= DROPOUT_MAX_WERT) & (moving_avg > DROPOUT_MIN_SCHNITT)
+    is_stat_low = pct_diff < MAX_PROZENT_EINBRUCH
+    is_outlier = is_dropout | is_stat_low
+    if sporadisch is not None:
+        is_outlier &= ~sporadisch
+    return pct_diff, is_outlier, np.where(is_outlier, moving_avg, werte)
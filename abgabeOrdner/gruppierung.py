@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+# Standard-Aggregation der Bestell-/Prognosespalten: Mengen summieren,
+# Prognosemonate der ersten Zeile übernehmen
+AGG_MENGEN = {
+    "wavor_bstlmg": "sum",
+    "progmo": "first",
+    "prog_mg1": "sum",
+    "progmo2": "first",
+    "prog_mg2": "sum",
+}
+
+
+def aggregiere_gruppen(data, keys, agg=None, block_nach=None):
+    """
+    Gruppierte Aggregation in einem einzigen groupby-Durchlauf.
+
+    Ersetzt Schleifen der Form "für jeden Wert von X: filtern, .copy(),
+    groupby, am Ende concat", die bei K Werten O(N*K) kosten.
+
+    Args:
+        data: Eingangsdaten
+        keys: Gruppierungsspalten
+        agg: Aggregations-Spec wie bei DataFrame.agg (Standard: AGG_MENGEN)
+        block_nach: optional die frühere Schleifenspalte. Das Ergebnis wird
+            dann wie beim alten concat sortiert: Blöcke in der Reihenfolge
+            des ersten Auftretens dieser Spalte, innerhalb eines Blocks
+            nach den Gruppenschlüsseln.
+
+    Returns:
+        pd.DataFrame: keys + aggregierte Spalten, Index 0..n-1
+    """
+    agg = AGG_MENGEN if agg is None else agg
+
+    result = data.groupby(keys, sort=True, observed=True).agg(agg).reset_index()
+
+    if block_nach is not None and not result.empty:
+        # Rang = Position des ersten Auftretens in den Eingangsdaten
+        _, reihenfolge = pd.factorize(data[block_nach])
+        rang = pd.Index(reihenfolge).get_indexer(result[block_nach])
+        result = result.iloc[np.argsort(rang, kind="stable")].reset_index(drop=True)
+
+    return result
@@ -0,0 +1,395 @@
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.linalg import splu
+
+from abgleich import faktoren
+from monatscode import code_zu_ordinal, monats_codes
+from panel import baue_panels
+
+# --- KONFIGURATION ---
+# Unterste Ebene: eine Serie pro Kunde x Gruppe x Artikel
+BOTTOM = ("Kunde", "Gruppe", "Artikel")
+# Aggregierte Ebenen (Artikel -> Gruppe -> Kunde -> Gesamt), jeweils x Monat
+EBENEN = {
+    "Gesamt": (),
+    "Kunde": ("Kunde",),
+    "Gruppe": ("Gruppe",),
+    "Gruppe_Kunde": ("Kunde", "Gruppe"),
+}
+METHODEN = ("bottom-up", "top-down", "mint-ols", "mint-wls")
+# Fehlende Schlüssel (z.B. Artikel ohne Gruppe) bleiben als eigene Serie erhalten
+FEHLEND = "UNBEKANNT"
+# MinT: Varianzfaktor für Knoten mit harter Vorgabe (praktisch 0, aber > 0,
+# damit abhängige Vorgaben, z.B. Gesamt = Summe der Kunden, lösbar bleiben)
+HART = 1e-9
+
+
+class Hierarchie:
+    """
+    Summenmatrix der Hierarchie als scipy.sparse-Matrix.
+
+    summen (m x n, CSR): Zeile = aggregierter Knoten, Spalte = Bottom-Serie,
+    1, wenn die Serie in den Knoten eingeht. Die volle Summenmatrix
+    S = [summen; I] wird nur bei Bedarf gebaut (summenmatrix()), die
+    Verfahren rechnen direkt mit summen.
+
+    knoten: Ebene + Schlüssel-Labels je Zeile, ebenen: Ebene -> slice der
+    Zeilen, zuordnung: Ebene -> Knoten (innerhalb der Ebene) je Bottom-Serie.
+    """
+
+    __slots__ = ("summen", "knoten", "ebenen", "zuordnung", "_schluessel")
+
+    def __init__(self, summen, knoten, ebenen, zuordnung, schluessel):
+        self.summen = summen
+        self.knoten = knoten
+        self.ebenen = ebenen
+        self.zuordnung = zuordnung
+        # Ebene -> (Spaltenpositionen im Panel, sortierte Code-Kombinationen)
+        self._schluessel = schluessel
+
+    @property
+    def n_bottom(self):
+        return self.summen.shape[1]
+
+    @property
+    def groesse(self):
+        """Anzahl Bottom-Serien je Knoten."""
+        return np.asarray(self.summen.sum(axis=1)).ravel()
+
+    def summenmatrix(self):
+        """S = [summen; I] ((m + n) x n, CSR)."""
+        return sparse.vstack(
+            [self.summen, sparse.identity(self.n_bottom, format="csr")], format="csr"
+        )
+
+
+def baue_hierarchie(panel, ebenen=None):
+    """
+    Summenmatrix zu den Serien eines Panels (Schlüsselspalten wie BOTTOM).
+
+    Knoten entstehen direkt aus den Schlüssel-Codes der Serien (kein
+    Textvergleich), pro Ebene nach Code sortiert.
+    """
+    ebenen = EBENEN if ebenen is None else ebenen
+    spalten = panel.schluessel_spalten
+    codes = panel.serien_codes.astype(np.int64)
+    groessen = [max(len(raum), 1) for raum in panel.raeume]
+    n = len(panel)
+
+    zeilen, teile, bereiche, zuordnung, schluessel, offset = [], [], {}, {}, {}, 0
+    for ebene, dims in ebenen.items():
+        fehlend = [d for d in dims if d not in spalten]
+        if fehlend:
+            raise KeyError(f"Ebene '{ebene}': Spalten {fehlend} fehlen in den Serien")
+        idx = [spalten.index(d) for d in dims]
+        if idx:
+            kombi = np.ravel_multi_index(codes[:, idx].T, [groessen[i] for i in idx])
+            knoten_id, uniques = pd.factorize(kombi, sort=True)
+        else:
+            knoten_id, uniques = np.zeros(n, dtype=np.int64), np.zeros(1, dtype=np.int64)
+
+        teil = pd.DataFrame({"Ebene": ebene}, index=range(len(uniques)))
+        knoten_codes = np.unravel_index(uniques, [groessen[i] for i in idx]) if idx else ()
+        for d in BOTTOM:
+            teil[d] = None
+        for d, i, c in zip(dims, idx, knoten_codes):
+            teil[d] = panel.raeume[i].labels(c)
+        teile.append(teil)
+
+        zeilen.append(offset + knoten_id)
+        bereiche[ebene] = slice(offset, offset + len(uniques))
+        zuordnung[ebene] = knoten_id
+        schluessel[ebene] = (idx, uniques)
+        offset += len(uniques)
+
+    zeile = np.concatenate(zeilen) if zeilen else np.zeros(0, dtype=np.int64)
+    summen = sparse.csr_matrix(
+        (np.ones(len(zeile)), (zeile, np.tile(np.arange(n), len(zeilen)))),
+        shape=(offset, n),
+    )
+    knoten = pd.concat(teile, ignore_index=True) if teile else pd.DataFrame()
+    return Hierarchie(summen, knoten, bereiche, zuordnung, schluessel)
+
+
+# ---------------------------------------------------------
+# Verfahren (Serie x Monat-Arrays)
+# ---------------------------------------------------------
+
+
+def bottom_up(hierarchie, y_bottom, y_knoten=None):
+    """Bottom-Serien bleiben, die Ebenen sind ihre Summen."""
+    return np.array(y_bottom, dtype=float)
+
+
+def top_down(hierarchie, y_bottom, y_knoten, ebene="Kunde"):
+    """
+    Proportionales Top-down: jeder Knoten der Ebene wird im Verhältnis der
+    Bottom-Prognosen auf seine Serien verteilt (Faktor-Regeln wie
+    abgleich.faktoren). Knoten ohne Ziel (NaN) behalten ihre Serien.
+    """
+    teil = hierarchie.ebenen[ebene]
+    summe = hierarchie.summen[teil] @ y_bottom
+    ziel = y_knoten[teil]
+    faktor = np.where(np.isnan(ziel), 1.0, faktoren(summe, np.nan_to_num(ziel)))
+    return y_bottom * faktor[hierarchie.zuordnung[ebene]]
+
+
+def _gewichte(hierarchie, gewichtung, gewichte):
+    """Diagonale von W, getrennt für Knoten und Bottom-Serien."""
+    m = hierarchie.summen.shape[0]
+    if gewichte is not None:
+        gewichte = np.asarray(gewichte, dtype=float)
+        return gewichte[:m], gewichte[m:]
+    if gewichtung == "ols":
+        return np.ones(m), np.ones(hierarchie.n_bottom)
+    if gewichtung == "wls":
+        # Strukturelle Skalierung: Varianz wächst mit der Anzahl Serien im Knoten
+        return hierarchie.groesse, np.ones(hierarchie.n_bottom)
+    raise ValueError(f"Unbekannte Gewichtung '{gewichtung}' (erlaubt: ols, wls)")
+
+
+def mint(
+    hierarchie,
+    y_bottom,
+    y_knoten,
+    gewichtung="wls",
+    gewichte=None,
+    belegt=None,
+    hart=None,
+    nicht_negativ=False,
+):
+    """
+    MinT mit diagonalem W (OLS: W = I, WLS: strukturelle Skalierung, oder
+    eigene gewichte in S-Reihenfolge: erst Knoten, dann Bottom-Serien).
+
+    Ohne hart ist ein Ziel nur eine weitere Prognose des Knotens, das
+    Ergebnis liegt zwischen Ziel und Summe der Bottom-Serien. hart: Maske
+    über die Knoten, deren Ziel mit Varianz ~0 (HART) eingeht und damit
+    getroffen wird (Plan als Nebenbedingung).
+
+    Statt (S'W⁻¹S)⁻¹ (n x n und über die Gesamt-Zeile dicht) wird die
+    gleichwertige Form über die Summenbedingungen gelöst:
+
+        r = y_knoten - summen @ y_bottom
+        (W_k + summen W_b summen') λ = r      (m x m, dünn, LU)
+        ỹ_bottom = y_bottom + W_b summen' λ
+
+    m ist die Zahl der Knoten (Kunden, Gruppen, ...), nicht der Serien, bei
+    100k+ Bottom-Serien bleibt alles dünn besetzt.
+
+    y_knoten: NaN = kein Ziel für den Knoten in diesem Monat, er geht dann
+    nicht in die Lösung ein. belegt: optional Maske Serie x Monat,
+    unbelegte Zellen (keine Prognosezeile) bleiben unverändert.
+
+    nicht_negativ: Zellen, die negativ würden, auf 0 festsetzen und den
+    Monat ohne sie neu lösen, bis keine mehr negativ ist. Die übrigen
+    Zellen tragen dann die Differenz, harte Ziele bleiben getroffen
+    (solange eine Zelle des Knotens frei ist).
+    """
+    w_knoten, w_bottom = _gewichte(hierarchie, gewichtung, gewichte)
+    if hart is not None:
+        w_knoten = np.where(hart, w_knoten * HART, w_knoten)
+    y_bottom = np.asarray(y_bottom, dtype=float)
+    ergebnis = y_bottom.copy()
+    summen = hierarchie.summen
+
+    for t in range(y_bottom.shape[1]):
+        zeilen = np.flatnonzero(~np.isnan(y_knoten[:, t]))
+        if len(zeilen) == 0:
+            continue
+        teil = summen[zeilen]
+        frei = np.ones(len(w_bottom), dtype=bool) if belegt is None else belegt[:, t].copy()
+        y = y_bottom[:, t].copy()
+        while True:
+            w_b = w_bottom * frei
+            system = sparse.diags(w_knoten[zeilen]) + teil @ sparse.diags(w_b) @ teil.T
+            rest = y_knoten[zeilen, t] - teil @ y
+            lam = splu(sparse.csc_matrix(system)).solve(rest)
+            loesung = y + w_b * (teil.T @ lam)
+            negativ = frei & (loesung < 0) if nicht_negativ else None
+            if negativ is None or not negativ.any():
+                break
+            # Negative Zellen auf 0 festhalten, Rest ohne sie neu verteilen
+            y[negativ] = 0.0
+            frei &= ~negativ
+        ergebnis[:, t] = loesung
+    return ergebnis
+
+
+def gleiche_ab(
+    hierarchie,
+    y_bottom,
+    y_knoten,
+    methode,
+    belegt=None,
+    ebene="Kunde",
+    nicht_negativ=True,
+    hart=None,
+):
+    """
+    Ein Verfahren aus METHODEN anwenden.
+
+    Nur top-down und MinT mit hart treffen die Ziele; bottom-up ignoriert
+    sie, MinT ohne hart gleicht sie nur gewichtet mit der Prognose aus.
+
+    ebene: Ausgangsebene für top-down
+    hart: Knotenmaske für MinT (siehe mint)
+    nicht_negativ: keine negativen Werte; MinT löst dafür ohne die
+    betroffenen Zellen neu (siehe mint), harte Ziele bleiben getroffen
+
+    Returns:
+        np.ndarray: abgeglichene Bottom-Serien x Monat
+    """
+    if methode == "bottom-up":
+        ergebnis = bottom_up(hierarchie, y_bottom)
+    elif methode == "top-down":
+        ergebnis = top_down(hierarchie, y_bottom, y_knoten, ebene)
+    elif methode in ("mint-ols", "mint-wls"):
+        ergebnis = mint(
+            hierarchie,
+            y_bottom,
+            y_knoten,
+            methode[5:],
+            belegt=belegt,
+            hart=hart,
+            nicht_negativ=nicht_negativ,
+        )
+    else:
+        raise ValueError(f"Unbekannte Methode '{methode}' (erlaubt: {', '.join(METHODEN)})")
+    return np.maximum(ergebnis, 0.0) if nicht_negativ else ergebnis
+
+
+# ---------------------------------------------------------
+# Anbindung an Prognose und Plan (lange Tabellen)
+# ---------------------------------------------------------
+
+
+def _quote(vorher, nachher):
+    """nachher / vorher, 0 bei vorher == 0 (auch wenn nachher 0 ist)."""
+    vorher = np.asarray(vorher, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(vorher == 0, 0.0, np.asarray(nachher, dtype=float) / vorher)
+
+
+def ziele(hierarchie, panel, plaene, col_ziel="Ziel_Summe"):
+    """
+    Pläne {ebene: DataFrame mit den Schlüsseln der Ebene, 'Monat', col_ziel}
+    -> Knoten x Monat auf der Monatsachse des Panels (NaN = kein Ziel).
+    Schlüssel und Monate, die es in der Prognose nicht gibt, fallen weg.
+    """
+    n_monate = panel.werte.shape[1]
+    y_knoten = np.full((hierarchie.summen.shape[0], n_monate), np.nan)
+    spalten = panel.schluessel_spalten
+    for ebene, plan in plaene.items():
+        teil = hierarchie.ebenen[ebene]
+        idx, uniques = hierarchie._schluessel[ebene]
+        pos = code_zu_ordinal(monats_codes(plan["Monat"])) - panel.ord_min
+        ok = (pos >= 0) & (pos < n_monate)
+        if idx:
+            codes = [panel.raeume[i].suche(plan[spalten[i]]) for i in idx]
+            for c in codes:
+                ok &= c >= 0
+            groessen = [max(len(panel.raeume[i]), 1) for i in idx]
+            kombi = np.ravel_multi_index([np.maximum(c, 0) for c in codes], groessen)
+            knoten = np.minimum(np.searchsorted(uniques, kombi), len(uniques) - 1)
+            ok &= uniques[knoten] == kombi
+        else:
+            knoten = np.zeros(len(plan), dtype=np.int64)
+
+        n_zellen = len(uniques) * n_monate
+        zelle = knoten[ok] * n_monate + pos[ok]
+        werte = plan[col_ziel].to_numpy(dtype=float, na_value=np.nan)[ok]
+        summe = np.bincount(zelle, weights=np.nan_to_num(werte), minlength=n_zellen)
+        belegt = np.bincount(zelle, minlength=n_zellen) > 0
+        y_knoten[teil] = np.where(belegt, summe, np.nan).reshape(-1, n_monate)
+    return y_knoten
+
+
+def abgleich_hierarchisch(
+    df_forecast,
+    plaene,
+    methode="mint-wls",
+    ebenen=None,
+    col_menge="Menge",
+    col_ziel="Ziel_Summe",
+    top_down_ebene="Kunde",
+    harte_ebenen=(),
+):
+    """
+    Gleicht die Artikelprognose über die ganze Hierarchie ab.
+
+    Bottom-Serien sind Kunde x Gruppe x Artikel (Summe der Prognosezeilen
+    je Monat), Ziele kommen aus den Plänen {ebene: DataFrame}, z.B.
+    {"Kunde": df_plan}. Ebenen ohne Plan werden nur mitgeführt.
+
+    harte_ebenen: Ebenen, deren Ziele MinT als Nebenbedingung trifft (statt
+    sie nur als weitere Prognose zu gewichten). bottom-up ignoriert die
+    Ziele immer. MinT liefert keine negativen Werte (siehe mint) und
+    verändert nur Zellen mit Prognose != 0: das Ergebnis wird als Faktor
+    auf die Prognosezeilen angewendet, eine Zelle mit 0 bliebe 0.
+    Gibt es nur harte Ziele einer Ebene (Schritt 3: Kunde), sind mint-ols
+    und mint-wls praktisch gleich: die Knotengewichte skalieren dann nur
+    HART, die Bottom-Gewichte sind bei beiden 1.
+
+    Returns:
+        np.ndarray: Faktor pro Prognosezeile (abgeglichen / Prognose der
+        Zelle, NaN = Zeile ohne gültigen Monat),
+        pd.DataFrame: [Ebene, <Schlüssel>, 'Monat', 'Bottom_Up_Summe',
+        'Ziel_Summe', 'Abgeglichen', 'Faktor'] für alle Knoten mit Ziel
+    """
+    start = time.perf_counter()
+    ebenen = EBENEN if ebenen is None else ebenen
+    unbekannt = set(plaene) - set(ebenen)
+    if unbekannt:
+        raise ValueError(f"Plan für unbekannte Ebene(n) {sorted(unbekannt)}")
+
+    bottom = pd.DataFrame(
+        {s: df_forecast[s].astype(object).fillna(FEHLEND) for s in BOTTOM}
+    )
+    bottom["Monat"] = df_forecast["Monat"].to_numpy()
+    bottom[col_menge] = df_forecast[col_menge].to_numpy()
+    (panel,), ((serie, pos),) = baue_panels(
+        [bottom], list(BOTTOM), [col_menge], normalisieren=True, dtype=np.float64
+    )
+    hierarchie = baue_hierarchie(panel, ebenen)
+    y_knoten = ziele(hierarchie, panel, plaene, col_ziel)
+
+    y_bottom = panel.werte
+    hart = np.zeros(hierarchie.summen.shape[0], dtype=bool)
+    for ebene in harte_ebenen:
+        hart[hierarchie.ebenen[ebene]] = True
+    abgeglichen = gleiche_ab(
+        hierarchie,
+        y_bottom,
+        y_knoten,
+        methode,
+        belegt=panel.belegt & (y_bottom != 0),
+        ebene=top_down_ebene,
+        hart=hart,
+    )
+
+    faktor_zelle = _quote(y_bottom, abgeglichen)
+    faktor_zeile = np.full(len(serie), np.nan)
+    ok = serie >= 0
+    faktor_zeile[ok] = faktor_zelle[serie[ok], pos[ok]]
+
+    # Übersicht für alle Knoten x Monat mit Ziel
+    knoten, pos_k = np.nonzero(~np.isnan(y_knoten))
+    summe_vorher = hierarchie.summen @ y_bottom
+    summe_nachher = hierarchie.summen @ abgeglichen
+    uebersicht = hierarchie.knoten.iloc[knoten].reset_index(drop=True)
+    uebersicht["Monat"] = panel.monate[pos_k]
+    uebersicht["Bottom_Up_Summe"] = summe_vorher[knoten, pos_k]
+    uebersicht["Ziel_Summe"] = y_knoten[knoten, pos_k]
+    uebersicht["Abgeglichen"] = summe_nachher[knoten, pos_k]
+    uebersicht["Faktor"] = _quote(uebersicht["Bottom_Up_Summe"], uebersicht["Abgeglichen"])
+
+    print(
+        f"   🧮 Hierarchischer Abgleich ({methode}): {hierarchie.n_bottom} Serien, "
+        f"{hierarchie.summen.shape[0]} Knoten, {panel.werte.shape[1]} Monate "
+        f"({time.perf_counter() - start:.2f}s)"
+    )
+    return faktor_zeile, uebersicht
@@ -0,0 +1,287 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from monatscode import code_zu_ordinal, monats_codes, ordinal_zu_code
+from rohdaten_cache import CACHE_DIR, datei_hash
+from sharding import nach_werk
+from sternschema import lade_oder_baue_sternschema
+
+# --- KONFIGURATION ---
+CUBE_DIR = os.path.join(CACHE_DIR, "cube")
+
+# Hierarchie-Dimension -> Spalte in den Rohdaten
+SPALTEN = {
+    "Artikel": "matnr",
+    "Teilegruppe": "modulgruppen",
+    "Kunde": "werk",
+}
+
+# Messgröße -> Monatsspalte, nach der sie verbucht wird
+MESSGROESSEN = {
+    "wavor_bstlmg": "bedmo",
+    "bedmo_mg": "bedmo",
+    "prog_mg1": "progmo",
+    "prog_mg2": "progmo2",
+}
+
+# Grouping Sets: Ebene -> Dimensionen (jeweils x Monat)
+# Artikel -> Teilegruppe -> Kunde -> Gesamt
+GRUPPIERUNGEN = {
+    "Artikel": ("Artikel", "Teilegruppe", "Kunde"),
+    "Teilegruppe_Kunde": ("Teilegruppe", "Kunde"),
+    "Kunde": ("Kunde",),
+    "Teilegruppe": ("Teilegruppe",),
+    "Gesamt": (),
+}
+
+
+def _als_text(uniques):
+    """Schlüsselwerte als Text (Parquet braucht einen Typ pro Spalte)."""
+    return np.array([str(u) for u in uniques], dtype=object)
+
+
+def baue_cube(data, spalten=None, messgroessen=None, gruppierungen=None):
+    """
+    Berechnet alle Hierarchieebenen x Monat für Ist- und Prognosemengen.
+
+    Die Rohdaten werden genau einmal gelesen: alle Messgrößen landen in einer
+    Basistabelle (feinste Kombination aller Dimensionen x Monat), alle
+    Ebenen aus GRUPPIERUNGEN werden danach aus dieser deutlich kleineren
+    Tabelle hochsummiert (Grouping Sets / Rollup).
+
+    Returns:
+        pd.DataFrame: Spalten ['Ebene', <Dimensionen>, 'Monat', <Messgrößen>].
+        Hochsummierte Dimensionen sind None, fehlende Schlüssel in den
+        Rohdaten bleiben NaN (eigene Gruppe). Monat als JJJJMM (int).
+        Eine Messgröße ist NaN, wenn es für die Zelle keine Zeile mit
+        gültigem Monat gibt.
+    """
+    spalten = SPALTEN if spalten is None else spalten
+    messgroessen = MESSGROESSEN if messgroessen is None else messgroessen
+    gruppierungen = GRUPPIERUNGEN if gruppierungen is None else gruppierungen
+
+    fehlend = [col for col in spalten.values() if col not in data.columns]
+    if fehlend:
+        raise KeyError(f"Rohdaten ohne Hierarchiespalten: {fehlend}")
+    messgroessen = {
+        mess: monat
+        for mess, monat in messgroessen.items()
+        if mess in data.columns and monat in data.columns
+    }
+    dims = list(spalten)
+    mess_namen = list(messgroessen)
+
+    # 1. Schlüssel -> int-Codes, fehlende Werte bekommen den letzten Code
+    codes, labels, groessen = [], [], []
+    for dim in dims:
+        c, uniques = pd.factorize(data[spalten[dim]])
+        c = np.where(c < 0, len(uniques), c)
+        codes.append(c)
+        labels.append(np.append(_als_text(uniques), np.nan))
+        groessen.append(len(uniques) + 1)
+    kombi = np.ravel_multi_index(codes, groessen) if dims else np.zeros(len(data), int)
+    basis_id, basis_kombi = pd.factorize(kombi)
+
+    # 2. Ein Durchlauf über die Rohdaten: (Kombination, Monat, Messgröße) -> Summe
+    teile = []
+    for i, (mess, monat_col) in enumerate(messgroessen.items()):
+        ordinal = code_zu_ordinal(monats_codes(data[monat_col]))
+        ok = ordinal >= 0
+        teile.append(
+            pd.DataFrame(
+                {
+                    "basis": basis_id[ok],
+                    "ordinal": ordinal[ok],
+                    "mess": np.int8(i),
+                    "wert": data[mess].to_numpy(dtype=float, na_value=np.nan)[ok],
+                }
+            )
+        )
+    lang = pd.concat(teile, ignore_index=True)
+    basis = (
+        lang.groupby(["basis", "ordinal", "mess"], sort=False)["wert"]
+        .sum()
+        .unstack("mess")
+        .reindex(columns=range(len(mess_namen)))
+    )
+    basis.columns = mess_namen
+    basis = basis.reset_index()
+
+    # Basis-Kombination -> Dimensions-Codes
+    dim_codes = np.unravel_index(basis_kombi[basis["basis"].to_numpy()], groessen)
+    for dim, c in zip(dims, dim_codes):
+        basis[dim] = c
+
+    # 3. Rollups aus der Basistabelle
+    ebenen = []
+    for ebene, ebene_dims in gruppierungen.items():
+        keys = list(ebene_dims) + ["ordinal"]
+        agg = (
+            basis.groupby(keys, sort=True)[mess_namen]
+            .sum(min_count=1)
+            .reset_index()
+        )
+        teil = pd.DataFrame({"Ebene": ebene}, index=agg.index)
+        for dim, dim_labels in zip(dims, labels):
+            teil[dim] = dim_labels[agg[dim].to_numpy()] if dim in ebene_dims else None
+        teil["Monat"] = ordinal_zu_code(agg["ordinal"].to_numpy())
+        for mess in mess_namen:
+            teil[mess] = agg[mess].to_numpy()
+        ebenen.append(teil)
+
+    cube = pd.concat(ebenen, ignore_index=True)
+    for dim in dims:
+        cube[dim] = cube[dim].astype(object)
+    return cube
+
+
+def baue_cube_nach_werk(data, spalten=None, messgroessen=None, gruppierungen=None, workers=1):
+    """
+    baue_cube, bei workers > 1 nach Kunde (Werk) aufgeteilt im Prozesspool
+    (siehe sharding.py). Ebenen mit Kunde rechnet jeder Shard vollständig,
+    Ebenen ohne Kunde (Teilegruppe, Gesamt) werden aus den Teilsummen der
+    Shards hochsummiert. Zeilen und Reihenfolge wie baue_cube; die Summen
+    der Ebenen ohne Kunde können in der letzten Stelle abweichen (andere
+    Summationsreihenfolge).
+    """
+    spalten = SPALTEN if spalten is None else spalten
+    messgroessen = MESSGROESSEN if messgroessen is None else messgroessen
+    gruppierungen = GRUPPIERUNGEN if gruppierungen is None else gruppierungen
+    if workers <= 1 or "Kunde" not in spalten:
+        return baue_cube(data, spalten, messgroessen, gruppierungen)
+
+    # An die Worker gehen nur Hierarchie-, Monats- und Mengenspalten
+    benoetigt = list(spalten.values()) + [
+        s for paar in messgroessen.items() for s in paar if s in data.columns
+    ]
+    teile = nach_werk(
+        baue_cube,
+        [data[list(dict.fromkeys(benoetigt))]],
+        spalten["Kunde"],
+        workers,
+        sortierung=[],
+        spalten=spalten,
+        messgroessen=messgroessen,
+        gruppierungen=gruppierungen,
+    )
+    dims = list(spalten)
+    mess_namen = [m for m in messgroessen if m in teile.columns]
+
+    # Schlüssel -> Code wie in baue_cube (erstes Auftreten, fehlend zuletzt)
+    codes = {}
+    for dim in dims:
+        uniques = pd.unique(_als_text(data[spalten[dim]].dropna().unique()))
+        codes[dim] = pd.Index(np.append(uniques, np.nan), dtype=object)
+
+    ebenen = []
+    for ebene, ebene_dims in gruppierungen.items():
+        teil = teile[teile["Ebene"] == ebene]
+        if "Kunde" not in ebene_dims:
+            keys = list(ebene_dims) + ["Monat"]
+            agg = (
+                teil.groupby(keys, sort=False, dropna=False)[mess_namen]
+                .sum(min_count=1)
+                .reset_index()
+            )
+            teil = pd.DataFrame({"Ebene": ebene}, index=agg.index)
+            for dim in dims:
+                teil[dim] = agg[dim].to_numpy() if dim in ebene_dims else None
+            teil["Monat"] = agg["Monat"].to_numpy()
+            for mess in mess_namen:
+                teil[mess] = agg[mess].to_numpy()
+        sortier = [teil["Monat"].to_numpy()] + [
+            codes[dim].get_indexer(teil[dim]) for dim in reversed(ebene_dims)
+        ]
+        ebenen.append(teil.iloc[np.lexsort(sortier)])
+
+    cube = pd.concat(ebenen, ignore_index=True)
+    for dim in dims:
+        cube[dim] = cube[dim].astype(object)
+    return cube
+
+
+def cube_ebene(cube, ebene, gruppierungen=None, ohne_fehlende=True):
+    """
+    Liefert eine Ebene des Cubes: Dimensionen der Ebene + Monat + Messgrößen.
+
+    ohne_fehlende: Zeilen mit fehlendem Schlüssel weglassen (wie groupby)
+    """
+    gruppierungen = GRUPPIERUNGEN if gruppierungen is None else gruppierungen
+    dims = list(gruppierungen[ebene])
+    # Spaltenfolge im Cube: Ebene, <Dimensionen>, Monat, <Messgrößen>
+    spalten = list(cube.columns)
+    alle_dims = spalten[spalten.index("Ebene") + 1 : spalten.index("Monat")]
+    teil = cube[cube["Ebene"] == ebene]
+    if ohne_fehlende and dims:
+        teil = teil.dropna(subset=dims)
+    weg = ["Ebene"] + [d for d in alle_dims if d not in dims]
+    return teil.drop(columns=weg).reset_index(drop=True)
+
+
+def _cube_schluessel(filepath, spalten, messgroessen, gruppierungen):
+    params = json.dumps(
+        {"spalten": spalten, "mess": messgroessen, "gruppen": gruppierungen},
+        sort_keys=True,
+    )
+    param_hash = hashlib.sha256(params.encode("utf-8")).hexdigest()[:8]
+    return f"{datei_hash(filepath)[:32]}_{param_hash}"
+
+
+def lade_oder_baue_cube(
+    filepath="dieEchtenDaten.xlsb",
+    data=None,
+    spalten=None,
+    messgroessen=None,
+    gruppierungen=None,
+    cube_dir=CUBE_DIR,
+    workers=1,
+):
+    """
+    Lädt den Cube zur Rohdatei aus ./output/cache/cube/<inhalts-hash>.parquet
+    oder baut ihn (aus data bzw. der Faktentabelle des Sternschemas) und
+    speichert ihn.
+    Analyse-, Ausreißer- und Plot-Skripte fragen danach nur noch den Cube ab.
+    workers > 1: Aufbau nach Werk aufgeteilt (siehe baue_cube_nach_werk).
+    """
+    spalten = SPALTEN if spalten is None else spalten
+    messgroessen = MESSGROESSEN if messgroessen is None else messgroessen
+    gruppierungen = GRUPPIERUNGEN if gruppierungen is None else gruppierungen
+
+    start = time.perf_counter()
+    schluessel = _cube_schluessel(filepath, spalten, messgroessen, gruppierungen)
+    pfad = os.path.join(cube_dir, f"{schluessel}.parquet")
+    if os.path.exists(pfad):
+        try:
+            cube = pd.read_parquet(pfad)
+            print(f"   ⚡ Cube geladen ({time.perf_counter() - start:.2f}s)")
+            return cube
+        except Exception as e:
+            print(f"   ⚠️ Cube unlesbar, baue neu: {e}")
+            os.remove(pfad)
+
+    if data is None:
+        # Nur Hierarchie-, Monats- und Mengenspalten aus dem Sternschema holen
+        stern = lade_oder_baue_sternschema(filepath)
+        benoetigt = list(spalten.values()) + [
+            s for paar in messgroessen.items() for s in paar if s in stern
+        ]
+        data = stern.spalten(list(dict.fromkeys(benoetigt)))
+    cube = baue_cube_nach_werk(data, spalten, messgroessen, gruppierungen, workers)
+
+    try:
+        os.makedirs(cube_dir, exist_ok=True)
+        tmp_pfad = f"{pfad}.{os.getpid()}.tmp"
+        cube.to_parquet(tmp_pfad, index=False)
+        os.replace(tmp_pfad, pfad)
+        print(
+            f"   💾 Cube geschrieben: {len(cube)} Zellen, {len(gruppierungen)} Ebenen "
+            f"({time.perf_counter() - start:.2f}s)"
+        )
+    except ImportError:
+        print("   ⚠️ pyarrow ist NICHT installiert -> Cube wird nicht gespeichert")
+    return cube
@@ -0,0 +1,295 @@
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+
+from monatscode import code_zu_ordinal, monats_codes, ordinal_zu_code
+from panel import baue_panels, links_buendig
+from sporadisch import METHODEN, nullanteil, sporadische_prognose, waehle_methode
+
+# --- KONFIGURATION ---
+SAISON_LAENGE = 12
+# Parameterraster: jede Serie bekommt die Kombination mit der kleinsten
+# Ein-Schritt-Fehlerquadratsumme (alle Kombinationen laufen gleichzeitig)
+ALPHAS = (0.1, 0.3, 0.5, 0.8)  # Niveau
+BETAS = (0.0, 0.05, 0.2)  # Trend (0 = kein Trend)
+GAMMAS = (0.05, 0.2, 0.4)  # Saison
+# Gedämpfter Trend: über 24 Monate läuft ein linearer Trend sonst davon
+DAEMPFUNG = 0.98
+# Serien pro Block (Speicher: Block x Kombinationen x 12 Saisonwerte)
+BLOCK_SERIEN = 10000
+HORIZONT = 24
+
+
+class HoltWintersZustand:
+    """
+    Ergebnis der Anpassung pro Serie: Niveau, Trend, Saison (nach
+    Kalendermonat 0..11), gewählte Parameter und multiplikativ ja/nein.
+    Alle Arrays haben eine Zeile pro Serie des Panels.
+    """
+
+    __slots__ = ("niveau", "trend", "saison", "alpha", "beta", "gamma", "multiplikativ", "sse")
+
+    def __init__(self, niveau, trend, saison, alpha, beta, gamma, multiplikativ, sse):
+        self.niveau = niveau
+        self.trend = trend
+        self.saison = saison
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.multiplikativ = multiplikativ
+        self.sse = sse
+
+    def prognose(self, schritte, kalender):
+        """
+        Punktprognose h Schritte nach Historienende.
+
+        Args:
+            schritte: h pro Zielmonat (1 = erster Monat nach der Historie)
+            kalender: Kalendermonat 0..11 pro Zielmonat
+
+        Returns:
+            np.ndarray Serie x Zielmonat (negative Werte -> 0)
+        """
+        schritte = np.asarray(schritte)
+        # Summe phi^1..phi^h
+        phi_summe = np.cumsum(DAEMPFUNG ** np.arange(1, schritte.max(initial=0) + 1))
+        faktor = np.concatenate(([0.0], phi_summe))[schritte]
+        basis = self.niveau[:, None] + self.trend[:, None] * faktor[None, :]
+        s = self.saison[:, np.asarray(kalender)]
+        werte = np.where(self.multiplikativ[:, None], basis * s, basis + s)
+        return np.maximum(werte, 0.0)
+
+
+def _links_buendig(panel):
+    """Linksbündiges Raster (siehe panel.links_buendig) + Kalendermonat 0..11 der ersten Position."""
+    raster, laengen, erster = links_buendig(panel)
+    return raster, laengen, (panel.ord_min + erster) % SAISON_LAENGE
+
+
+def _initialisiere(raster, laengen, kalender_start, mul):
+    """
+    Startwerte wie im Lehrbuch: Niveau = Mittel der ersten Saison, Trend =
+    Differenz der ersten beiden Saisonmittel / m, Saison = Abweichung
+    (bzw. Verhältnis) in der ersten Saison. Serien mit weniger als zwei
+    Saisons: Niveau = erster Wert, kein Trend, keine Saison.
+    """
+    m = SAISON_LAENGE
+    n = len(laengen)
+    saisonal = laengen >= 2 * m
+
+    niveau = raster[:, 0].copy() if raster.shape[1] else np.zeros(n)
+    trend = np.zeros(n)
+    saison = np.where(mul[:, None], 1.0, 0.0) * np.ones((n, m))
+    if saisonal.any() and raster.shape[1] >= 2 * m:
+        erste = raster[saisonal, :m]
+        zweite = raster[saisonal, m : 2 * m]
+        l0 = erste.mean(axis=1)
+        niveau[saisonal] = l0
+        trend[saisonal] = (zweite.mean(axis=1) - l0) / m
+        with np.errstate(divide="ignore", invalid="ignore"):
+            s0 = np.where(mul[saisonal, None], erste / l0[:, None], erste - l0[:, None])
+        # Position t liegt im Kalendermonat (start + t) % m
+        kal = (kalender_start[saisonal, None] + np.arange(m)[None, :]) % m
+        zeilen = np.flatnonzero(saisonal)
+        saison[zeilen[:, None], kal] = s0
+    return niveau, trend, saison, saisonal
+
+
+def _raster_kombinationen():
+    kombis = np.array(list(itertools.product(ALPHAS, BETAS, GAMMAS)), dtype=float)
+    return kombis[:, 0], kombis[:, 1], kombis[:, 2]
+
+
+def _passe_block_an(raster, laengen, kalender_start, saison_art):
+    """Rekursion für einen Block Serien x alle Parameterkombinationen."""
+    m = SAISON_LAENGE
+    n, n_pos = raster.shape
+    alpha, beta, gamma = _raster_kombinationen()
+    k = len(alpha)
+
+    # Multiplikativ nur bei durchgehend positiver Historie
+    if saison_art == "mul":
+        positiv = np.where(np.isnan(raster), 1.0, raster) > 0
+        mul = positiv.all(axis=1)
+    else:
+        mul = np.zeros(n, dtype=bool)
+    l0, b0, s0, saisonal = _initialisiere(raster, laengen, kalender_start, mul)
+
+    # Zustand: Serie x Kombination (Saison zusätzlich x Kalendermonat)
+    niveau = np.repeat(l0[:, None], k, axis=1)
+    trend = np.repeat(b0[:, None], k, axis=1)
+    saison = np.repeat(s0[:, None, :], k, axis=1)
+    sse = np.zeros((n, k))
+    g = gamma[None, :] * saisonal[:, None]
+    mul2 = mul[:, None]
+    fit_ab = np.where(saisonal, m, 1)
+    zeilen = np.arange(n)
+
+    for t in range(n_pos):
+        aktiv = t < laengen
+        if not aktiv.any():
+            break
+        y = np.where(aktiv, raster[:, t], 0.0)[:, None]
+        kal = (kalender_start + t) % m
+        s = saison[zeilen, :, kal]
+
+        basis = niveau + DAEMPFUNG * trend
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            schaetzung = np.where(mul2, basis * s, basis + s)
+            fehler = y - schaetzung
+            zaehlt = (aktiv & (t >= fit_ab))[:, None]
+            sse += np.where(zaehlt, fehler * fehler, 0.0)
+
+            bereinigt = np.where(mul2, y / np.where(s == 0, 1.0, s), y - s)
+            niveau_neu = alpha * bereinigt + (1 - alpha) * basis
+            trend_neu = beta * (niveau_neu - niveau) + (1 - beta) * DAEMPFUNG * trend
+            rest = np.where(mul2, y / np.where(niveau_neu == 0, 1.0, niveau_neu), y - niveau_neu)
+            saison_neu = g * rest + (1 - g) * s
+
+        a = aktiv[:, None]
+        niveau = np.where(a, niveau_neu, niveau)
+        trend = np.where(a, trend_neu, trend)
+        saison[zeilen, :, kal] = np.where(a, saison_neu, s)
+
+    # Beste Kombination pro Serie
+    sse = np.where(np.isfinite(sse), sse, np.inf)
+    beste = np.argmin(sse, axis=1)
+    return HoltWintersZustand(
+        niveau[zeilen, beste],
+        trend[zeilen, beste],
+        saison[zeilen, beste, :],
+        alpha[beste],
+        beta[beste],
+        np.where(saisonal, gamma[beste], 0.0),
+        mul,
+        sse[zeilen, beste],
+    )
+
+
+def passe_holt_winters_an(panel, saison="add"):
+    """
+    Exponentielle Glättung (Niveau, gedämpfter Trend, Saison) für alle
+    Serien des Panels auf einmal: eine NumPy-Rekursion über die Monate,
+    vektorisiert über Serien und Parameterraster (keine Schleife pro Serie).
+
+    Jede Serie läuft vom ersten belegten Monat bis zum Panel-Ende; fehlende
+    Monate zählen als 0 (wie glaette_panel).
+
+    Args:
+        saison: "add" oder "mul" (multiplikativ nur für Serien ohne
+            Nullen/negative Werte, die übrigen bleiben additiv)
+
+    Returns:
+        HoltWintersZustand (eine Zeile pro Serie)
+    """
+    if saison not in ("add", "mul"):
+        raise ValueError(f"Unbekannte Saison-Art '{saison}' (erlaubt: add, mul)")
+    raster, laengen, kalender_start = _links_buendig(panel)
+
+    teile = []
+    for von in range(0, max(len(laengen), 1), BLOCK_SERIEN):
+        bis = min(von + BLOCK_SERIEN, len(laengen))
+        laenge_max = int(laengen[von:bis].max(initial=0))
+        teile.append(
+            _passe_block_an(
+                raster[von:bis, :laenge_max],
+                laengen[von:bis],
+                kalender_start[von:bis],
+                saison,
+            )
+        )
+    return HoltWintersZustand(
+        *(np.concatenate([getattr(z, f) for z in teile]) for f in HoltWintersZustand.__slots__)
+    )
+
+
+def prognose_aus_historie(
+    df,
+    ziel_monate=None,
+    saison="add",
+    methode="auto",
+    bis=None,
+    artikel="matnr",
+    kunde="werk",
+    gruppe="modulgruppen",
+    monat="bedmo",
+    menge="bedmo_mg",
+):
+    """
+    Eigene statistische Prognose aus der Bedarfshistorie (statt prog_mg1/2).
+
+    Args:
+        df: Rohdaten (mindestens artikel, kunde, gruppe, monat, menge)
+        ziel_monate: JJJJMM-Codes der Prognosemonate; None = HORIZONT
+            Monate nach dem Historienende. Monate bis zum Historienende
+            werden übersprungen.
+        bis: letzter Historienmonat (JJJJMM), spätere Zeilen bleiben außen vor
+        saison: "add" oder "mul" (siehe passe_holt_winters_an)
+        methode: "auto" (nach Nullanteil je Serie: Holt-Winters, SBA oder
+            TSB, siehe sporadisch.py), "holt-winters" oder eine Methode
+            aus sporadisch.METHODEN für alle Serien
+
+    Returns:
+        pd.DataFrame: Artikel, Kunde, Gruppe, Monat, Menge (nur Menge > 0),
+        dasselbe Schema wie build_forecast für run_reconciliation
+    """
+    start = time.perf_counter()
+    historie = df
+    if bis is not None:
+        historie = df[monats_codes(df[monat]) <= int(bis)]
+
+    (panel,), ((serie, _),) = baue_panels(
+        [historie], [artikel, kunde], [menge], monat_spalte=monat, dtype=np.float64
+    )
+
+    ende = panel.ord_min + panel.werte.shape[1] - 1
+    if ziel_monate is None:
+        ziel_ord = ende + 1 + np.arange(HORIZONT)
+    else:
+        ziel_ord = code_zu_ordinal(monats_codes(pd.Series(ziel_monate)))
+        ziel_ord = ziel_ord[ziel_ord > ende]
+
+    # Methode je Serie: sporadische Serien (viele Nullmonate) über Croston/SBA/TSB
+    raster, laengen, _ = links_buendig(panel)
+    if methode == "auto":
+        methoden = waehle_methode(nullanteil(raster, laengen))
+    elif methode == "holt-winters" or methode in METHODEN:
+        methoden = np.full(len(panel), methode, dtype=object)
+    else:
+        raise ValueError(f"Unbekannte Methode '{methode}'")
+    sporadisch = methoden != "holt-winters"
+
+    werte = np.zeros((len(panel), len(ziel_ord)))
+    if not sporadisch.all():
+        zustand = passe_holt_winters_an(panel, saison)
+        werte = zustand.prognose(ziel_ord - ende, ziel_ord % SAISON_LAENGE)
+    werte[sporadisch] = sporadische_prognose(
+        raster[sporadisch], laengen[sporadisch], methoden[sporadisch]
+    )[:, None]
+
+    # Gruppe aus der ersten Historienzeile jeder Serie, die eine Gruppe hat
+    gruppen = historie[gruppe]
+    gueltig = np.flatnonzero((serie >= 0) & gruppen.notna().to_numpy())
+    serien, erste_zeile = np.unique(serie[gueltig], return_index=True)
+    gruppe_je_serie = np.full(len(panel), None, dtype=object)
+    gruppe_je_serie[serien] = gruppen.to_numpy(dtype=object)[gueltig[erste_zeile]]
+
+    zeilen, pos = np.nonzero(werte > 0)
+    namen = panel.namen(zeilen)
+    result = pd.DataFrame(
+        {
+            "Artikel": namen[artikel],
+            "Kunde": namen[kunde],
+            "Gruppe": gruppe_je_serie[zeilen],
+            "Monat": ordinal_zu_code(ziel_ord[pos]),
+            "Menge": werte[zeilen, pos],
+        }
+    )
+    zaehler = pd.Series(methoden).value_counts().to_dict()
+    print(
+        f"   📈 Statistische Prognose ({saison}): {len(panel)} Serien {zaehler}, "
+        f"{len(ziel_ord)} Monate, {len(result)} Zeilen ({time.perf_counter() - start:.2f}s)"
+    )
+    return result
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+# Monatsschlüssel überall gleich: Code JJJJMM (int32, 0 = ungültig)
+# und Ordinal = Jahr * 12 + (Monat - 1) (int32, -1 = ungültig).
+UNGUELTIG_CODE = 0
+UNGUELTIG_ORDINAL = -1
+
+
+def monats_codes(werte):
+    """
+    Normalisiert gemischte Monatsangaben vektorisiert auf JJJJMM (int32).
+
+    Akzeptiert float (202610.0), int, Text ("202610", "202610.0", "2026-10"),
+    Timestamp/datetime und nullable Int-Spalten. Alles, was sich nicht als
+    gültiger Monat lesen lässt, wird 0.
+    """
+    s = werte if isinstance(werte, pd.Series) else pd.Series(werte)
+
+    if pd.api.types.is_datetime64_any_dtype(s):
+        datum = s.dt
+        zahlen = (datum.year * 100 + datum.month).to_numpy(dtype=float, na_value=np.nan)
+    elif pd.api.types.is_numeric_dtype(s):
+        zahlen = s.to_numpy(dtype=float, na_value=np.nan, copy=True)
+    else:
+        zahlen = pd.to_numeric(s, errors="coerce").to_numpy(
+            dtype=float, na_value=np.nan, copy=True
+        )
+        if not isinstance(s.dtype, pd.CategoricalDtype):
+            # Rest (Timestamps, "2026-10", ...) über den Datums-Parser
+            rest = np.isnan(zahlen) & s.notna().to_numpy()
+            if rest.any():
+                datum = pd.to_datetime(s[rest], errors="coerce")
+                zahlen[rest] = (datum.dt.year * 100 + datum.dt.month).to_numpy(
+                    dtype=float, na_value=np.nan
+                )
+
+    # z.B. 202610.0 -> 202610 (wie int(val)); Ganzzahl-Arithmetik ist deutlich
+    # schneller als // und % auf float mit NaN
+    endlich = np.isfinite(zahlen) & (np.abs(zahlen) < 1e9)
+    ganz = np.where(endlich, zahlen, 0).astype(np.int64)
+    monat = ganz % 100
+    gueltig = endlich & (monat >= 1) & (monat <= 12) & (ganz >= 100001) & (ganz <= 999912)
+    return np.where(gueltig, ganz, UNGUELTIG_CODE).astype(np.int32)
+
+
+def code_zu_ordinal(codes):
+    """JJJJMM -> Jahr * 12 + (Monat - 1); ungültige Codes -> -1."""
+    codes = np.asarray(codes, dtype=np.int32)
+    ordinal = (codes // 100) * 12 + (codes % 100) - 1
+    return np.where(codes > 0, ordinal, UNGUELTIG_ORDINAL).astype(np.int32)
+
+
+def ordinal_zu_code(ordinal):
+    """Jahr * 12 + (Monat - 1) -> JJJJMM; -1 -> 0."""
+    ordinal = np.asarray(ordinal, dtype=np.int32)
+    codes = (ordinal // 12) * 100 + ordinal % 12 + 1
+    return np.where(ordinal >= 0, codes, UNGUELTIG_CODE).astype(np.int32)
+
+
+def normalisiere_monate(werte):
+    """
+    Ein Durchlauf für beide Schlüssel.
+
+    Returns:
+        (ordinal int32, code int32)
+    """
+    codes = monats_codes(werte)
+    return code_zu_ordinal(codes), codes
+
+
+def code_zu_datum(codes):
+    """JJJJMM -> datetime64[ns] (Monatserster), ungültige Codes -> NaT."""
+    ordinal = code_zu_ordinal(codes)
+    # datetime64[M] zählt Monate ab 1970-01
+    monate = (ordinal - 1970 * 12).astype("datetime64[M]")
+    datum = monate.astype("datetime64[ns]")
+    datum[ordinal < 0] = np.datetime64("NaT")
+    return datum
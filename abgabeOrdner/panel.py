@@ -0,0 +1,252 @@
+import numpy as np
+import pandas as pd
+
+from monatscode import code_zu_datum, code_zu_ordinal, monats_codes, ordinal_zu_code
+from schluessel import Schluesselraum
+
+
+class Serie:
+    """Leichte Sicht auf eine Zeile des Panels (keine Kopie der Daten)."""
+
+    __slots__ = ("panel", "zeile")
+
+    def __init__(self, panel, zeile):
+        self.panel = panel
+        self.zeile = zeile
+
+    @property
+    def name(self):
+        return self.panel.name(self.zeile)
+
+    @property
+    def werte(self):
+        return self.panel.werte[self.zeile]
+
+    @property
+    def belegt(self):
+        return self.panel.belegt[self.zeile]
+
+    def bereich(self):
+        """(erste, letzte) belegte Monatsposition oder None."""
+        pos = np.flatnonzero(self.belegt)
+        if len(pos) == 0:
+            return None
+        return int(pos[0]), int(pos[-1])
+
+    def ausschnitt(self):
+        """Werte vom ersten bis zum letzten belegten Monat (Lücken = 0) und Monatscodes."""
+        bereich = self.bereich()
+        if bereich is None:
+            return self.werte[:0], self.panel.monate[:0]
+        von, bis = bereich
+        return self.werte[von : bis + 1], self.panel.monate[von : bis + 1]
+
+    def __repr__(self):
+        return f"Serie({self.name!r}, {self.panel.werte.shape[1]} Monate)"
+
+
+class Panel:
+    """
+    Dichtes Panel aller Nachfrageserien: 2D-Array Serie x Monat (float32,
+    fehlende Monate = 0) plus Belegungsmaske, ein Schlüsselraum pro
+    Hierarchiespalte und eine durchgehende Monatsachse ab ord_min.
+
+    Zeilen werden über Serie-Sichten gelesen (panel["DE22"],
+    panel[("4711", "DE22")], for serie in panel), nicht über DataFrame-Filter.
+    """
+
+    __slots__ = (
+        "werte",
+        "belegt",
+        "schluessel_spalten",
+        "raeume",
+        "serien_codes",
+        "ord_min",
+        "_serien_index",
+    )
+
+    def __init__(self, werte, belegt, schluessel_spalten, raeume, serien_codes, ord_min):
+        self.werte = werte
+        self.belegt = belegt
+        self.schluessel_spalten = list(schluessel_spalten)
+        self.raeume = raeume
+        self.serien_codes = serien_codes
+        self.ord_min = ord_min
+        self._serien_index = None
+
+    def __len__(self):
+        return self.werte.shape[0]
+
+    def __iter__(self):
+        for zeile in range(len(self)):
+            yield Serie(self, zeile)
+
+    def __getitem__(self, name):
+        return Serie(self, self.zeile(name))
+
+    @property
+    def monate(self):
+        """Monatsachse als JJJJMM-Codes."""
+        return ordinal_zu_code(self.ord_min + np.arange(self.werte.shape[1]))
+
+    @property
+    def datum(self):
+        return code_zu_datum(self.monate)
+
+    def name(self, zeile):
+        namen = tuple(
+            raum.namen[code] for raum, code in zip(self.raeume, self.serien_codes[zeile])
+        )
+        return namen[0] if len(namen) == 1 else namen
+
+    def namen(self, zeilen=None):
+        """Schlüssel-Labels pro Serie: dict {spalte: np.ndarray}."""
+        zeilen = np.arange(len(self)) if zeilen is None else np.asarray(zeilen)
+        return {
+            spalte: raum.labels(self.serien_codes[zeilen, k])
+            for k, (spalte, raum) in enumerate(zip(self.schluessel_spalten, self.raeume))
+        }
+
+    def zeile(self, name):
+        if self._serien_index is None:
+            self._serien_index = {
+                tuple(codes): i for i, codes in enumerate(self.serien_codes.tolist())
+            }
+        name = name if isinstance(name, tuple) else (name,)
+        codes = tuple(raum._index[n] for raum, n in zip(self.raeume, name))
+        return self._serien_index[codes]
+
+    def zu_lang(self, wert_spalte="Zahl", nur_belegt=True):
+        """Zurück ins lange Format: Schlüssel, 'Monat' (JJJJMM), wert_spalte."""
+        maske = self.belegt if nur_belegt else np.ones(self.werte.shape, dtype=bool)
+        zeilen, pos = np.nonzero(maske)
+        df = pd.DataFrame(self.namen(zeilen))
+        df["Monat"] = ordinal_zu_code(self.ord_min + pos)
+        df[wert_spalte] = self.werte[zeilen, pos]
+        return df
+
+
+def links_buendig(panel):
+    """
+    Jede Serie vom ersten belegten Monat bis zum Panel-Ende (fehlende
+    Monate = 0) linksbündig in ein Raster, z.B. für Prognose-Rekursionen.
+
+    Returns:
+        raster (float64, NaN nach dem Ende), laengen, erster (Monatsposition
+        des ersten Werts je Serie)
+    """
+    belegt = panel.belegt
+    n_serien, n_monate = belegt.shape
+    hat_daten = belegt.any(axis=1)
+    erster = np.argmax(belegt, axis=1) if n_monate else np.zeros(n_serien, dtype=np.int64)
+    laengen = np.where(hat_daten, n_monate - erster, 0)
+
+    position = np.arange(n_monate)
+    maske = position[None, :] < laengen[:, None]
+    spalte = np.minimum(erster[:, None] + position[None, :], max(n_monate - 1, 0))
+    raster = np.where(
+        maske, np.take_along_axis(panel.werte, spalte, axis=1).astype(float), np.nan
+    )
+    return raster, laengen, erster
+
+
+def baue_panels(
+    dfs,
+    schluessel_spalten,
+    wert_spalten,
+    monat_spalte="Monat",
+    normalisieren=False,
+    dtype=np.float32,
+    ordinale=None,
+):
+    """
+    Baut ein oder mehrere Panels mit gemeinsamen Serien und gemeinsamer
+    Monatsachse (Vereinigung aller Tabellen), z.B. Ist und Plan.
+
+    Args:
+        dfs: Liste von DataFrames im langen Format
+        schluessel_spalten: Hierarchiespalten der Serie ([] = eine Gesamtserie)
+        wert_spalten: eine Wertespalte pro DataFrame
+        normalisieren: Schlüssel wie clean_keys vereinheitlichen
+        ordinale: optional bereits berechnete Monats-Ordinale pro DataFrame
+
+    Returns:
+        list[Panel], list[(serie, position)] pro DataFrame und Zeile
+        (-1, wenn die Zeile keinen gültigen Schlüssel oder Monat hat)
+    """
+    ordinale = ordinale or [None] * len(dfs)
+    ordinale = [
+        code_zu_ordinal(monats_codes(df[monat_spalte])) if o is None else o
+        for df, o in zip(dfs, ordinale)
+    ]
+    raeume = [Schluesselraum(normalisieren) for _ in schluessel_spalten]
+    codes = [
+        [raum.codes(df[spalte]) for raum, spalte in zip(raeume, schluessel_spalten)]
+        for df in dfs
+    ]
+
+    # Serie = Kombination der Schlüssel-Codes (-1 = ungültige Zeile)
+    groessen = [max(len(raum), 1) for raum in raeume]
+    kombis = []
+    for c, o in zip(codes, ordinale):
+        if not c:
+            kombi = np.zeros(len(o), dtype=np.int64)
+        elif len(c) == 1:
+            kombi = c[0].astype(np.int64)
+        else:
+            kombi = np.ravel_multi_index([np.maximum(k, 0) for k in c], groessen)
+        ungueltig = o < 0
+        for k in c:
+            ungueltig |= k < 0
+        kombi[ungueltig] = -1
+        kombis.append(kombi)
+
+    if len(schluessel_spalten) <= 1:
+        # Höchstens eine Hierarchiespalte: Serie = Schlüssel-Code, kein factorize
+        serien_ids = kombis
+        serien_kombi = np.arange(groessen[0] if schluessel_spalten else 1)
+    else:
+        # Reihenfolge des ersten Auftretens über alle Tabellen
+        alle = np.concatenate(kombis)
+        serien_id = np.full(len(alle), -1, dtype=np.int64)
+        gueltig = alle >= 0
+        serien_id[gueltig], serien_kombi = pd.factorize(alle[gueltig])
+        grenzen = np.cumsum([len(k) for k in kombis])[:-1]
+        serien_ids = np.split(serien_id, grenzen)
+    if schluessel_spalten:
+        serien_codes = np.column_stack(
+            np.unravel_index(np.asarray(serien_kombi, dtype=np.int64), groessen)
+        ).astype(np.int32)
+    else:
+        serien_codes = np.zeros((len(serien_kombi), 0), dtype=np.int32)
+
+    gueltige_ord = [o[o >= 0] for o in ordinale if (o >= 0).any()]
+    ord_min = int(min(o.min() for o in gueltige_ord)) if gueltige_ord else 0
+    ord_max = int(max(o.max() for o in gueltige_ord)) if gueltige_ord else -1
+    n_serien, n_monate = len(serien_kombi), ord_max - ord_min + 1
+
+    panels, orte = [], []
+    for df, o, serie, wert_spalte in zip(dfs, ordinale, serien_ids, wert_spalten):
+        ok = serie >= 0
+        pos = o - ord_min
+        pos[~ok] = -1
+        zelle = serie[ok] * n_monate + pos[ok]
+
+        # Summe pro Zelle (mehrere Zeilen je Serie/Monat), fehlend/NaN -> 0
+        werte = df[wert_spalte].to_numpy(dtype=float, na_value=np.nan)[ok]
+        summe = np.bincount(
+            zelle, weights=np.nan_to_num(werte), minlength=n_serien * n_monate
+        )
+        belegt = np.bincount(zelle, minlength=n_serien * n_monate) > 0
+        panels.append(
+            Panel(
+                summe.reshape(n_serien, n_monate).astype(dtype),
+                belegt.reshape(n_serien, n_monate),
+                schluessel_spalten,
+                raeume,
+                serien_codes,
+                ord_min,
+            )
+        )
+        orte.append((serie, pos))
+    return panels, orte
@@ -0,0 +1,475 @@
+import argparse
+import ast
+import hashlib
+import json
+import os
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import tracing
+from ergebnis_cube import CUBE_BASIS
+from hierarchie_abgleich import METHODEN
+from rohdaten_cache import datei_hash
+from sharding import worker_anzahl
+from skripte import SKRIPT_DIR, lade_skript
+from tracing import TRACE_DIR
+
+# --- KONFIGURATION ---
+OUTPUT_DIR = "./output/pipeline"
+# Checkpoint: Fingerabdruck der Eingaben pro erfolgreich gelaufener Stufe
+ZUSTAND = "zustand.json"
+VERSION = 1
+# Stufen, die gleichzeitig laufen dürfen (z.B. 4 und 5 nach 3)
+PARALLEL = 2
+# Schritt 3/4 lesen den Plan als agg_baumarktprogramm.xlsx im Arbeitsordner.
+# True: stattdessen den Export aus Schritt 2 (./output/...) verwenden, dann
+# hängt Schritt 3 von Schritt 2 ab.
+PLAN_AUS_SCHRITT_2 = False
+PLAN_SCHRITT_2 = "./output/agg_baumarktprogramm.xlsx"
+
+
+class Stufe:
+    """
+    Ein Schritt-Skript mit seinen Eingaben und Ausgaben (Dateien oder
+    Ordner, relativ zum Arbeitsordner). Das Skript und die Module aus
+    SKRIPT_DIR, die es importiert, zählen als Eingabe, eine Codeänderung
+    startet die Stufe also auch neu.
+
+    konstanten: Modulkonstanten, die vor main() gesetzt werden
+    (z.B. {"INPUT_FILE_PLAN": ...})
+    argumente: Schlüsselwort-Argumente für main() (z.B. {"abgleich": ...})
+    """
+
+    __slots__ = (
+        "name", "skript", "eingaben", "ausgaben", "mit_workers", "konstanten", "argumente"
+    )
+
+    def __init__(
+        self, name, skript, eingaben, ausgaben, mit_workers=True, konstanten=None, argumente=None
+    ):
+        self.name = name
+        self.skript = skript
+        self.eingaben = [os.path.normpath(p) for p in eingaben]
+        self.ausgaben = [os.path.normpath(p) for p in ausgaben]
+        self.mit_workers = mit_workers
+        self.konstanten = konstanten or {}
+        self.argumente = argumente or {}
+
+
+def stufen(plan_aus_schritt_2=PLAN_AUS_SCHRITT_2, optionen=None):
+    """
+    Die Schritte 1-5 mit den Dateinamen aus ihrer KONFIGURATION.
+    Abhängigkeiten ergeben sich daraus, welche Stufe welche Datei schreibt.
+
+    optionen: Argumente für Schritt 3 (prognose, sporadisch, abgleich,
+    rundung, chunksize; fehlende = Standard des Skripts), chunksize gilt
+    auch für Schritt 2
+    """
+    optionen = optionen or {}
+    optionen_2 = {k: v for k, v in optionen.items() if k == "chunksize"}
+    schritt2 = lade_skript("2-Abweichungsanalyse.py")
+    schritt3 = lade_skript("3-Prognoseglättung.py")
+    schritt4 = lade_skript("4-Konsistenzprüfung.py")
+    schritt5 = lade_skript("5-Visualisierung.py")
+
+    rohdaten = schritt3.INPUT_FILE_ROHDATEN
+    plan = PLAN_SCHRITT_2 if plan_aus_schritt_2 else schritt3.INPUT_FILE_PLAN
+    cube = [f"{CUBE_BASIS}.bin", f"{CUBE_BASIS}.json"]
+    ergebnis_excel = os.path.join(schritt3.OUTPUT_DIR, schritt3.OUTPUT_FILE_EXCEL)
+    konsistenz = os.path.join(schritt3.OUTPUT_DIR, schritt3.OUTPUT_FILE_KONSISTENZ)
+    plan_konstanten = {"INPUT_FILE_PLAN": plan} if plan_aus_schritt_2 else {}
+
+    return [
+        Stufe("1", "1-Datenvertständnis.py", [rohdaten], ["./output/plots/1"]),
+        Stufe(
+            "2",
+            "2-Abweichungsanalyse.py",
+            [schritt2.INPUT_FILE_ROHDATEN, "FAHRZEUGPROGRAMM.xlsx"],
+            ["./output/agg_rohdaten.xlsx", PLAN_SCHRITT_2, "./output/plots/2"],
+            argumente=optionen_2,
+        ),
+        Stufe(
+            "3",
+            "3-Prognoseglättung.py",
+            [rohdaten, plan],
+            [ergebnis_excel, konsistenz, *cube],
+            konstanten=plan_konstanten,
+            argumente=optionen,
+        ),
+        # Wertet nur den Report aus Schritt 3 aus (schreibt selbst nichts)
+        Stufe(
+            "4",
+            "4-Konsistenzprüfung.py",
+            [konsistenz],
+            [],
+            mit_workers=False,
+            konstanten={
+                "FILE_REPORT_SCHRITT_3": konsistenz,
+                **({"FILE_PLAN": plan} if plan_aus_schritt_2 else {}),
+            },
+        ),
+        Stufe("5", "5-Visualisierung.py", cube, [schritt5.OUTPUT_DIR_PLOTS]),
+    ]
+
+
+def abhaengigkeiten(alle):
+    """Stufe -> Stufen, die eine ihrer Eingaben schreiben."""
+    erzeuger = {}
+    for stufe in alle:
+        for pfad in stufe.ausgaben:
+            erzeuger.setdefault(pfad, stufe.name)
+    return {
+        stufe.name: sorted(
+            {erzeuger[p] for p in stufe.eingaben if p in erzeuger and erzeuger[p] != stufe.name}
+        )
+        for stufe in alle
+    }
+
+
+# ---------------------------------------------------------
+# Zustand (Checkpoint) und Fingerabdrücke
+# ---------------------------------------------------------
+
+
+def lade_zustand(pfad):
+    try:
+        with open(pfad, encoding="utf-8") as f:
+            zustand = json.load(f)
+        if zustand.get("version") == VERSION:
+            return zustand
+    except (OSError, ValueError):
+        pass
+    return {"version": VERSION, "stufen": {}, "hashes": {}}
+
+
+def schreibe_zustand(zustand, pfad):
+    os.makedirs(os.path.dirname(pfad) or ".", exist_ok=True)
+    tmp = f"{pfad}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(zustand, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, pfad)  # atomar: nach einem Absturz bleibt der letzte Checkpoint lesbar
+
+
+def fingerabdruck(pfad, hashes):
+    """
+    SHA-256 des Inhalts. Bei unveränderter Größe und mtime wird der Hash
+    aus dem Zustand übernommen, große Rohdaten werden also nur nach einer
+    Änderung neu gelesen. Ordner: Hash über Namen und Größen der Dateien.
+    """
+    if os.path.isdir(pfad):
+        eintraege = sorted(
+            (os.path.relpath(os.path.join(wurzel, d), pfad), os.path.getsize(os.path.join(wurzel, d)))
+            for wurzel, _, dateien in os.walk(pfad)
+            for d in dateien
+        )
+        return "ordner:" + hashlib.sha256(repr(eintraege).encode("utf-8")).hexdigest()
+    try:
+        info = os.stat(pfad)
+    except OSError:
+        return "fehlt"
+    merkmal = [info.st_size, info.st_mtime_ns]
+    alt = hashes.get(pfad)
+    if alt and alt[:2] == merkmal:
+        return alt[2]
+    h = datei_hash(pfad)
+    hashes[pfad] = merkmal + [h]
+    return h
+
+
+def module(skript):
+    """
+    Das Skript und alle Module aus SKRIPT_DIR, die es (auch indirekt)
+    importiert; Bibliotheken bleiben außen vor.
+
+    Returns:
+        list: sortierte Pfade
+    """
+    gefunden = set()
+    offen = [os.path.join(SKRIPT_DIR, skript)]
+    while offen:
+        pfad = offen.pop()
+        if pfad in gefunden or not os.path.exists(pfad):
+            continue
+        gefunden.add(pfad)
+        with open(pfad, encoding="utf-8") as f:
+            baum = ast.parse(f.read(), filename=pfad)
+        for knoten in ast.walk(baum):
+            if isinstance(knoten, ast.Import):
+                namen = [a.name for a in knoten.names]
+            elif isinstance(knoten, ast.ImportFrom) and knoten.module and not knoten.level:
+                namen = [knoten.module]
+            else:
+                continue
+            offen.extend(os.path.join(SKRIPT_DIR, f"{n.split('.')[0]}.py") for n in namen)
+    return sorted(gefunden)
+
+
+def fingerabdruecke(stufe, hashes):
+    pfade = [*module(stufe.skript), *stufe.eingaben]
+    abdruck = {p: fingerabdruck(p, hashes) for p in pfade}
+    abdruck["konstanten"] = json.dumps(stufe.konstanten, sort_keys=True)
+    abdruck["argumente"] = json.dumps(stufe.argumente, sort_keys=True)
+    return abdruck
+
+
+def ist_aktuell(stufe, abdruck, zustand):
+    """Gleiche Eingaben wie beim letzten Erfolg und alle Ausgaben vorhanden."""
+    eintrag = zustand["stufen"].get(stufe.name)
+    if eintrag is None or eintrag.get("eingaben") != abdruck:
+        return False
+    return all(os.path.exists(p) for p in stufe.ausgaben)
+
+
+# ---------------------------------------------------------
+# Ausführung
+# ---------------------------------------------------------
+
+
+def _fuehre_aus(stufe, workers, trace_dir):
+    """
+    Läuft im Worker-Prozess: Skript laden, Konstanten setzen, main().
+
+    Returns:
+        (Sekunden, Fehlertext oder None)
+    """
+    start = time.perf_counter()
+    modul = lade_skript(stufe.skript)
+    for name, wert in stufe.konstanten.items():
+        setattr(modul, name, wert)
+    if trace_dir:
+        tracing.aktiviere(trace_dir, name=f"stufe{stufe.name}")
+    try:
+        if stufe.mit_workers:
+            modul.main(workers, **stufe.argumente)
+        else:
+            modul.main(**stufe.argumente)
+    except BaseException:
+        return time.perf_counter() - start, traceback.format_exc()
+    finally:
+        if trace_dir:
+            tracing.beende()
+    return time.perf_counter() - start, None
+
+
+def _fehlende_ausgaben(stufe, start):
+    """
+    Die Skripte melden Fehler per print und kehren zurück. Erfolg heißt
+    deshalb: jede Ausgabedatei existiert und wurde in diesem Lauf
+    geschrieben (Ordner: existiert, Plots werden nur bei Änderung neu
+    gezeichnet).
+    """
+    fehlend = []
+    for pfad in stufe.ausgaben:
+        if os.path.isdir(pfad):
+            continue
+        if not os.path.exists(pfad) or os.path.getmtime(pfad) < start - 1:
+            fehlend.append(pfad)
+    return fehlend
+
+
+def fuehre_pipeline_aus(
+    ziele=None,
+    erzwingen=(),
+    parallel=PARALLEL,
+    workers=1,
+    trace_dir=TRACE_DIR,
+    plan_aus_schritt_2=PLAN_AUS_SCHRITT_2,
+    trocken=False,
+    optionen=None,
+):
+    """
+    Führt die Stufen in Abhängigkeitsreihenfolge aus.
+
+    - Eine Stufe läuft nur, wenn sich ihr Skript oder eine Eingabe seit
+      dem letzten Erfolg geändert hat (oder eine Ausgabe fehlt).
+    - Nach jeder erfolgreichen Stufe wird der Zustand gespeichert; nach
+      einem Absturz setzt der nächste Lauf bei der ersten nicht
+      aktuellen Stufe fort.
+    - Unabhängige Stufen laufen in bis zu parallel Prozessen gleichzeitig.
+    - Scheitert eine Stufe, werden die abhängigen übersprungen, die
+      anderen laufen weiter.
+
+    Args:
+        ziele: Stufen, die am Ende aktuell sein sollen (None = alle),
+            ihre Vorgänger werden bei Bedarf mit ausgeführt
+        erzwingen: Stufen, die auf jeden Fall laufen
+        optionen: Argumente für Schritt 3 (siehe stufen()); andere
+            Optionen als beim letzten Lauf starten die Stufe neu
+
+    Returns:
+        dict Stufe -> Status ("aktuell", "ok", "fehler", "übersprungen")
+    """
+    alle = {s.name: s for s in stufen(plan_aus_schritt_2, optionen)}
+    vorgaenger = abhaengigkeiten(alle.values())
+
+    # Ziele plus alle Vorgänger
+    noetig = set()
+    offen = list(ziele or alle)
+    while offen:
+        name = offen.pop()
+        if name not in noetig:
+            noetig.add(name)
+            offen.extend(vorgaenger[name])
+    reihenfolge = [n for n in alle if n in noetig]
+    erzwingen = set(erzwingen)
+
+    zustand_pfad = os.path.join(OUTPUT_DIR, ZUSTAND)
+    zustand = lade_zustand(zustand_pfad)
+    erzeugt = {p for s in alle.values() for p in s.ausgaben}
+    status = {}
+    geplant = set()  # Trockenlauf: Stufen, die laufen würden
+
+    kette = " | ".join(
+        f"{n}" + (f" <- {','.join(vorgaenger[n])}" if vorgaenger[n] else "") for n in reihenfolge
+    )
+    print(f"🚦 Pipeline: {kette} (bis zu {parallel} parallel)")
+
+    laufend = {}
+    with ProcessPoolExecutor(max_workers=max(1, parallel)) as pool:
+        while len(status) < len(reihenfolge):
+            for name in reihenfolge:
+                if name in status or any(l.name == name for l, _ in laufend.values()):
+                    continue
+                vor = vorgaenger[name]
+                if any(status.get(v) in ("fehler", "übersprungen") for v in vor):
+                    status[name] = "übersprungen"
+                    print(f"   ⏭️  Stufe {name}: übersprungen (Vorgänger fehlgeschlagen)")
+                    continue
+                if any(v not in status for v in vor):
+                    continue
+
+                stufe = alle[name]
+                fehlt = [p for p in stufe.eingaben if p not in erzeugt and not os.path.exists(p)]
+                if fehlt:
+                    status[name] = "fehler"
+                    print(f"   ❌ Stufe {name}: Eingabe fehlt: {', '.join(fehlt)}")
+                    continue
+                # Eine Stufe läuft nur, wenn sich ihre Eingaben geändert haben.
+                # Schreibt ein Vorgänger inhaltlich dasselbe, bleibt sie aktuell.
+                abdruck = fingerabdruecke(stufe, zustand["hashes"])
+                neu = name in erzwingen or (trocken and any(v in geplant for v in vor))
+                if not neu and ist_aktuell(stufe, abdruck, zustand):
+                    status[name] = "aktuell"
+                    print(f"   ✅ Stufe {name}: aktuell")
+                    continue
+                if trocken:
+                    status[name] = "geplant"
+                    geplant.add(name)
+                    print(f"   📝 Stufe {name}: würde laufen ({stufe.skript})")
+                    continue
+                print(f"   ▶️  Stufe {name}: starte {stufe.skript}")
+                future = pool.submit(_fuehre_aus, stufe, workers, trace_dir)
+                laufend[future] = (stufe, time.time())
+
+            if not laufend:
+                if len(status) < len(reihenfolge):
+                    raise RuntimeError("Pipeline hängt: Zyklus in den Abhängigkeiten?")
+                break
+
+            fertig, _ = wait(laufend, return_when=FIRST_COMPLETED)
+            for future in fertig:
+                stufe, start = laufend.pop(future)
+                try:
+                    sekunden, fehler = future.result()
+                except Exception as e:  # Worker-Prozess abgestürzt
+                    sekunden, fehler = time.time() - start, repr(e)
+                fehlend = [] if fehler else _fehlende_ausgaben(stufe, start)
+                if fehler or fehlend:
+                    status[stufe.name] = "fehler"
+                    grund = fehler.strip().splitlines()[-1] if fehler else f"Ausgaben fehlen: {fehlend}"
+                    print(f"   ❌ Stufe {stufe.name} fehlgeschlagen nach {sekunden:.1f}s: {grund}")
+                    continue
+                status[stufe.name] = "ok"
+                # Checkpoint: Eingaben so, wie die Stufe sie gelesen hat
+                zustand["stufen"][stufe.name] = {
+                    "eingaben": fingerabdruecke(stufe, zustand["hashes"]),
+                    "fertig": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "sekunden": round(sekunden, 2),
+                }
+                schreibe_zustand(zustand, zustand_pfad)
+                print(f"   ✅ Stufe {stufe.name} fertig ({sekunden:.1f}s)")
+
+    if not trocken:
+        schreibe_zustand(zustand, zustand_pfad)
+    return status
+
+
+def main(
+    ziele=None,
+    erzwingen=(),
+    parallel=PARALLEL,
+    workers=1,
+    trace_dir=TRACE_DIR,
+    plan_aus_schritt_2=PLAN_AUS_SCHRITT_2,
+    trocken=False,
+    optionen=None,
+):
+    start = time.perf_counter()
+    status = fuehre_pipeline_aus(
+        ziele, erzwingen, parallel, workers, trace_dir, plan_aus_schritt_2, trocken, optionen
+    )
+    zaehler = {s: sum(1 for v in status.values() if v == s) for s in dict.fromkeys(status.values())}
+    print(
+        f"\n🏁 Pipeline beendet ({time.perf_counter() - start:.1f}s): "
+        + ", ".join(f"{n} {s}" for s, n in zaehler.items())
+    )
+    return 1 if "fehler" in status.values() else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Schritte 1-5 mit Abhängigkeiten, Änderungserkennung und Checkpoint"
+    )
+    parser.add_argument("ziele", nargs="*", help="nur diese Stufen 1-5 (+ Vorgänger)")
+    parser.add_argument(
+        "--erzwingen", nargs="+", default=[], metavar="STUFE", help="Stufen auf jeden Fall neu rechnen"
+    )
+    parser.add_argument(
+        "--parallel", type=int, default=PARALLEL, help="unabhängige Stufen gleichzeitig (0 = alle Kerne)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Prozesse innerhalb einer Stufe (0 = alle Kerne)"
+    )
+    parser.add_argument("--trace", default=TRACE_DIR, help="Ordner für Chrome-Traces pro Stufe")
+    parser.add_argument(
+        "--plan-aus-schritt-2",
+        action="store_true",
+        default=PLAN_AUS_SCHRITT_2,
+        help="Schritt 3/4 lesen den Plan-Export aus Schritt 2",
+    )
+    parser.add_argument("--trocken", action="store_true", help="nur anzeigen, was laufen würde")
+    # Optionen von Schritt 3 (ohne Angabe: Standard aus dessen KONFIGURATION)
+    parser.add_argument("--prognose", choices=["erp", "holt-winters"], help="Schritt 3: Prognosequelle")
+    parser.add_argument(
+        "--sporadisch",
+        action="store_true",
+        default=None,
+        help="Schritt 3: sporadische Serien durch Croston/SBA/TSB ersetzen",
+    )
+    parser.add_argument("--abgleich", choices=["faktor", *METHODEN], help="Schritt 3: Abgleich-Methode")
+    parser.add_argument("--rundung", choices=["summentreu", "einzeln"], help="Schritt 3: Rundung")
+    parser.add_argument(
+        "--chunksize", type=int, help="Schritt 2/3: Rohdaten im Stream lesen (0 = ohne Stream)"
+    )
+    args = parser.parse_args()
+    optionen = {
+        k: getattr(args, k)
+        for k in ("prognose", "sporadisch", "abgleich", "rundung", "chunksize")
+        if getattr(args, k) is not None
+    }
+    unbekannt = set(args.ziele + args.erzwingen) - {"1", "2", "3", "4", "5"}
+    if unbekannt:
+        parser.error(f"unbekannte Stufen: {', '.join(sorted(unbekannt))}")
+    raise SystemExit(
+        main(
+            args.ziele or None,
+            args.erzwingen,
+            worker_anzahl(args.parallel),
+            worker_anzahl(args.workers),
+            args.trace,
+            args.plan_aus_schritt_2,
+            args.trocken,
+            optionen,
+        )
+    )
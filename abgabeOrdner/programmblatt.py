@@ -0,0 +1,145 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Monatsbeschriftungen in der Kopfzeile des Programms (JAN ... DEZ)
+MONATSNAMEN = {
+    "JAN": 1,
+    "FEB": 2,
+    "MAR": 3,
+    "MÄR": 3,
+    "MRZ": 3,
+    "APR": 4,
+    "MAI": 5,
+    "MAY": 5,
+    "JUN": 6,
+    "JUL": 7,
+    "AUG": 8,
+    "SEP": 9,
+    "OKT": 10,
+    "OCT": 10,
+    "NOV": 11,
+    "DEZ": 12,
+    "DEC": 12,
+}
+
+# Zeilen mit diesen Texten in der ersten Spalte sind Überschriften, keine Werke
+KOPF_TEXTE = ("werk", "baumarkt")
+
+_JAHR_RE = re.compile(r"^(\d{4})(\.\d+)?$")
+
+
+def _jahr_pro_spalte(columns):
+    """
+    Jahr aus dem Spaltenkopf. pandas hängt bei doppelten Köpfen ".1", ".2"
+    an ("2025", "2025.1", ...), verbundene Zellen kommen als "Unnamed: n"
+    und erben das Jahr der Spalte links davon.
+    """
+    jahre = []
+    aktuell = None
+    for col in columns:
+        treffer = _JAHR_RE.match(str(col).strip())
+        if treffer:
+            aktuell = int(treffer.group(1))
+        elif not str(col).startswith("Unnamed"):
+            aktuell = None
+        jahre.append(aktuell)
+    return jahre
+
+
+def _monat(wert):
+    if not isinstance(wert, str):
+        return None
+    return MONATSNAMEN.get(wert.strip().upper()[:3])
+
+
+def erkenne_monatsspalten(data, max_kopfzeilen=5):
+    """
+    Findet die Monatsspalten eines Programmblatts anhand der Kopfzeilen.
+
+    Returns:
+        list[(spalten_index, jahr, monat)], Index der Beschriftungszeile (oder None)
+    """
+    jahre = _jahr_pro_spalte(data.columns)
+
+    # Beschriftungszeile = erste Zeile mit mindestens 12 Monatsnamen
+    for zeile in range(min(max_kopfzeilen, len(data))):
+        monate = [_monat(v) for v in data.iloc[zeile]]
+        if sum(m is not None for m in monate) >= 12:
+            spalten = [
+                (i, jahr, monat)
+                for i, (jahr, monat) in enumerate(zip(jahre, monate))
+                if jahr is not None and monat is not None
+            ]
+            return spalten, zeile
+
+    # Ohne Beschriftung: die letzten 12 Spalten jedes Jahresblocks
+    # (eine vorangestellte Ergebnis-Spalte wird damit übersprungen)
+    bloecke = {}
+    for i, jahr in enumerate(jahre):
+        if jahr is not None:
+            bloecke.setdefault(jahr, []).append(i)
+    spalten = []
+    for jahr, indices in bloecke.items():
+        for monat, i in enumerate(indices[-12:], start=1):
+            spalten.append((i, jahr, monat))
+    return spalten, None
+
+
+def _zu_zahl(spalte):
+    """Spaltenweise Zahlkonvertierung inkl. deutscher Schreibweise ("1 234,5")."""
+    werte = pd.to_numeric(spalte, errors="coerce")
+    offen = werte.isna() & spalte.notna()
+    if offen.any():
+        text = spalte[offen].astype(str).str.replace(",", ".").str.replace(" ", "")
+        werte[offen] = pd.to_numeric(text, errors="coerce")
+    return werte.fillna(0.0).astype(float)
+
+
+def parse_programmblatt(data, key_name="Werk"):
+    """
+    Wandelt ein Programmblatt (BAUMARKTPROGRAMM / FAHRZEUGPROGRAMM) in das
+    lange Format um: Spalten [key_name, 'Monat', 'Zahl'], Monat als JJJJMM (int).
+
+    Die Jahresblöcke werden aus dem Kopf erkannt, nicht über feste
+    Spaltenindizes. Jedes erkannte Jahr liefert 12 Monate, fehlende oder
+    nicht lesbare Werte werden als 0 behandelt.
+    """
+    leer = pd.DataFrame(columns=[key_name, "Monat", "Zahl"])
+    if data is None or data.empty:
+        return leer
+
+    spalten, kopfzeile = erkenne_monatsspalten(data)
+    if not spalten:
+        return leer
+
+    # Gültige Werk-Zeilen (keine Überschriften, keine Leerzeilen)
+    namen = data.iloc[:, 0]
+    namen_str = namen.astype(str).str.strip()
+    gueltig = namen.notna() & (namen_str != "") & ~namen_str.str.lower().isin(KOPF_TEXTE)
+    if kopfzeile is not None:
+        gueltig.iloc[kopfzeile] = False
+    namen_str = namen_str[gueltig].to_numpy()
+    if len(namen_str) == 0:
+        return leer
+
+    # Volle Jahre x 12 Monate, nicht belegte Monate bleiben 0
+    jahre = sorted({jahr for _, jahr, _ in spalten})
+    werte = np.zeros((len(namen_str), len(jahre) * 12))
+    block = data.loc[gueltig]
+    for i, jahr, monat in spalten:
+        werte[:, jahre.index(jahr) * 12 + monat - 1] = _zu_zahl(block.iloc[:, i]).to_numpy()
+
+    monate = np.array([jahr * 100 + m for jahr in jahre for m in range(1, 13)])
+    result = pd.DataFrame(
+        {
+            key_name: np.repeat(namen_str, len(monate)),
+            "Monat": np.tile(monate, len(namen_str)),
+            "Zahl": werte.ravel(),
+        }
+    )
+
+    # Falls mehrere Zeilen für gleichen Werk/Monat existieren, zusammenfassen (Summe)
+    result = result.groupby([key_name, "Monat"], as_index=False).agg({"Zahl": "sum"})
+    return result.sort_values([key_name, "Monat"]).reset_index(drop=True)
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+
+from rohdaten_schema import ROHDATEN_SCHEMA, speicher_mb, speicherbericht, wende_schema_an
+
+# --- KONFIGURATION ---
+CACHE_DIR = "./output/cache"
+CACHE_MAX_MB = 2048  # Obergrenze für alle Cache-Dateien zusammen
+
+
+def datei_hash(filepath, blockgroesse=1024 * 1024):
+    """
+    Berechnet den SHA-256 Inhalts-Hash einer Datei (blockweise gelesen).
+    Umbenennen oder Kopieren der Datei ändert den Schlüssel nicht,
+    eine inhaltlich neue Extraktion dagegen schon.
+    """
+    h = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(blockgroesse), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def cache_schluessel(filepath, sheet_name, engine, schema=None):
+    """
+    Name des Cache-Eintrags (ohne .parquet): Inhalt der Datei plus
+    Leseparameter inkl. dtype-Schema, wie ihn load_rohdaten_cached sucht.
+    """
+    params = json.dumps(
+        {"sheet": sheet_name, "engine": engine, "schema": schema}, sort_keys=True
+    )
+    param_hash = hashlib.sha256(params.encode("utf-8")).hexdigest()[:8]
+    return f"{datei_hash(filepath)[:32]}_{param_hash}"
+
+
+def _parquet_verfuegbar():
+    try:
+        import pyarrow  # noqa: F401
+
+        return True
+    except ImportError:
+        return False
+
+
+def _typisiere_fuer_cache(df):
+    """
+    Parquet braucht pro Spalte einen einheitlichen Typ. Excel liefert aber
+    gemischte Spalten (z.B. Werk mal als Zahl, mal als Text) -> diese
+    werden als Text gespeichert, fehlende Werte bleiben erhalten.
+    """
+    df = df.copy()
+    df.columns = [str(c) for c in df.columns]
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        art = pd.api.types.infer_dtype(df[col], skipna=True)
+        if art in ("string", "empty", "floating", "integer", "boolean"):
+            continue
+        df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def _kompakt(df, schema):
+    """Schema anwenden und Speicher vorher/nachher ausgeben."""
+    if schema is None:
+        return df
+    vorher = speicher_mb(df)
+    df = wende_schema_an(df, schema)
+    speicherbericht(vorher, speicher_mb(df))
+    return df
+
+
+def raeume_cache_auf(cache_dir=CACHE_DIR, max_mb=CACHE_MAX_MB):
+    """
+    LRU-Verdrängung: Solange der Cache größer als max_mb ist, wird der
+    am längsten nicht mehr benutzte Eintrag gelöscht (Zugriffszeit = mtime,
+    wird bei jedem Cache-Treffer aktualisiert).
+    """
+    if not os.path.isdir(cache_dir):
+        return []
+
+    eintraege = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith(".parquet"):
+            continue
+        pfad = os.path.join(cache_dir, name)
+        stat = os.stat(pfad)
+        eintraege.append((stat.st_mtime, stat.st_size, pfad))
+
+    gesamt = sum(e[1] for e in eintraege)
+    grenze = max_mb * 1024 * 1024
+    geloescht = []
+    for _, groesse, pfad in sorted(eintraege):
+        if gesamt <= grenze:
+            break
+        os.remove(pfad)
+        gesamt -= groesse
+        geloescht.append(pfad)
+        print(f"   🧹 Cache-Eintrag verdrängt: {os.path.basename(pfad)}")
+    return geloescht
+
+
+def load_rohdaten_cached(
+    filepath="dieEchtenDaten.xlsb",
+    engine="pyxlsb",
+    sheet_name=0,
+    cache_dir=CACHE_DIR,
+    max_mb=CACHE_MAX_MB,
+    schema=ROHDATEN_SCHEMA,
+):
+    """
+    Lädt die Rohdaten über einen inhaltsadressierten Parquet-Cache.
+
+    Beim ersten Aufruf wird die Excel-Datei einmal geparst und als Parquet
+    unter ./output/cache/<inhalts-hash>.parquet abgelegt. Jeder weitere
+    Aufruf mit derselben Datei liest nur noch den Cache.
+
+    Mit schema (Standard: ROHDATEN_SCHEMA, siehe rohdaten_schema.py) liegen
+    Kennungen als category, Monate als Int32 und Mengen als float32 vor,
+    auch im Cache. Ein Cache-Treffer baut dann keine Python-Strings mehr auf.
+    schema=None lädt die Spalten wie von Excel geliefert.
+
+    Returns:
+        pd.DataFrame: Rohdaten (FileNotFoundError, wenn die Datei fehlt)
+    """
+    if not _parquet_verfuegbar():
+        print("   ⚠️ pyarrow ist NICHT installiert -> lade ohne Cache")
+        print("   → Installiere mit: pip install pyarrow")
+        df = pd.read_excel(filepath, engine=engine, sheet_name=sheet_name)
+        return _kompakt(df, schema)
+
+    start = time.perf_counter()
+    schluessel = cache_schluessel(filepath, sheet_name, engine, schema)
+    cache_pfad = os.path.join(cache_dir, f"{schluessel}.parquet")
+
+    if os.path.exists(cache_pfad):
+        try:
+            df = pd.read_parquet(cache_pfad)
+            if schema is not None:
+                # Parquet verliert category bei Zahlen-Kennungen (z.B. matnr)
+                df = wende_schema_an(df, schema)
+            os.utime(cache_pfad, None)  # LRU: als zuletzt benutzt markieren
+            print(
+                f"   ⚡ Cache-Treffer für '{filepath}' "
+                f"({time.perf_counter() - start:.2f}s, {speicher_mb(df).sum():,.1f} MB)"
+            )
+            return df
+        except Exception as e:
+            print(f"   ⚠️ Cache-Eintrag unlesbar, lade neu: {e}")
+            os.remove(cache_pfad)
+
+    df = pd.read_excel(filepath, engine=engine, sheet_name=sheet_name)
+    df = _kompakt(_typisiere_fuer_cache(df), schema)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_pfad = f"{cache_pfad}.{os.getpid()}.tmp"
+    df.to_parquet(tmp_pfad, index=False)
+    os.replace(tmp_pfad, cache_pfad)  # atomar, parallele Läufe sehen nie halbe Dateien
+    print(
+        f"   💾 Cache geschrieben: {os.path.basename(cache_pfad)} "
+        f"({time.perf_counter() - start:.2f}s)"
+    )
+
+    raeume_cache_auf(cache_dir, max_mb)
+    # Aus dem Cache zurücklesen, damit erster und jeder weitere Lauf dieselben Typen sehen
+    if not os.path.exists(cache_pfad):
+        return df
+    df = pd.read_parquet(cache_pfad)
+    return df if schema is None else wende_schema_an(df, schema)
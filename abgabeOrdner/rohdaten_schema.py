@@ -0,0 +1,171 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+# --- KONFIGURATION ---
+# Kategorie nur, wenn es deutlich weniger Werte als Zeilen gibt
+KATEGORIE_MAX_ANTEIL = 0.5
+
+# Speicherarten der Rohdatenspalten (Spaltennamen wie in main.py / neue_namen):
+#   "kategorie": Kennungen und wiederholte Texte -> category
+#   "periode":   Monats-/Wochencodes JJJJMM bzw. JJJJWW -> Int32 (NaN bleibt <NA>)
+#   "menge":     Mengen, Gewichte, Maße, Faktoren -> float32
+ROHDATEN_SCHEMA = {
+    # Kennungen
+    "matnr": "kategorie",
+    "kundnr": "kategorie",
+    "vkbel": "kategorie",
+    "kundabl": "kategorie",
+    "werk": "kategorie",
+    "modulgruppen": "kategorie",
+    "Baumarkt": "kategorie",
+    "Baumarktartikel": "kategorie",
+    "cc_bez": "kategorie",
+    "lft_land": "kategorie",
+    "lft_ort": "kategorie",
+    "ltm_zin_lt_kategorie": "kategorie",
+    "ltm_zout_lt_kategorie": "kategorie",
+    # Einheiten
+    "wavor_bme": "kategorie",
+    "bstlmgeh": "kategorie",
+    "geweh": "kategorie",
+    "lt_1_me": "kategorie",
+    "lt_1_feh": "kategorie",
+    "lt_1_veh": "kategorie",
+    # Perioden
+    "bedkw": "periode",
+    "bedmo": "periode",
+    "verskw": "periode",
+    "versmo": "periode",
+    "progmo": "periode",
+    "progmo2": "periode",
+    # Mengen
+    "wavor_bstlmg": "menge",
+    "wavor_anteilpromonat": "menge",
+    "wavor_bstlmengemonat": "menge",
+    "wavor_bstlmgjahr": "menge",
+    "vbap_bstlmg": "menge",
+    "bedmo_mg": "menge",
+    "prog_mg1": "menge",
+    "prog_mg2": "menge",
+    "prog_vol1": "menge",
+    "prog_vol2": "menge",
+    "vol_gesamt_lab_mg": "menge",
+    # Gewichte und Ladungsträger
+    "gew_bto": "menge",
+    "gew_bto_kg": "menge",
+    "zin_lt_1_menge": "menge",
+    "lt_1_bruttogew_in_kg": "menge",
+    "lt_1_laenge": "menge",
+    "lt_1_breite": "menge",
+    "lt_1_hoehe": "menge",
+    "lt_1_flaeche": "menge",
+    "lt_1_volumen": "menge",
+    "lt_1_menge_in_lt": "menge",
+    # Kennzahlen
+    "diff_faktorjahr_wpp1": "menge",
+    "diff_faktorjahr_wpp2": "menge",
+    "ct_kapa": "menge",
+    "ct_auslastung": "menge",
+    "ct_volds": "menge",
+    "verbauquote": "menge",
+}
+
+
+def _als_kategorie(spalte):
+    if isinstance(spalte.dtype, pd.CategoricalDtype):
+        return spalte
+    if spalte.nunique(dropna=True) > KATEGORIE_MAX_ANTEIL * max(len(spalte), 1):
+        return spalte
+    return spalte.astype("category")
+
+
+def _als_periode(spalte):
+    """Ganzzahlige Codes -> Int32, sonst float32."""
+    if spalte.dtype in ("Int32", np.float32):
+        return spalte
+    zahlen = pd.to_numeric(spalte, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    endlich = np.isfinite(zahlen)
+    gueltig = zahlen[endlich]
+    if (gueltig == np.round(gueltig)).all() and (np.abs(gueltig) < 2**31).all():
+        werte = np.where(endlich, zahlen, 0).astype(np.int32)
+        return pd.Series(pd.arrays.IntegerArray(werte, ~endlich), index=spalte.index)
+    return pd.Series(zahlen.astype(np.float32), index=spalte.index)
+
+
+def _als_menge(spalte):
+    if spalte.dtype == np.float32:
+        return spalte
+    return pd.to_numeric(spalte, errors="coerce").astype(np.float32)
+
+
+_UMWANDLUNG = {
+    "kategorie": _als_kategorie,
+    "periode": _als_periode,
+    "menge": _als_menge,
+}
+
+
+def wende_schema_an(df, schema=None):
+    """
+    Wandelt die Rohdaten in kompakte dtypes um (siehe ROHDATEN_SCHEMA).
+    Spalten ohne Eintrag im Schema bleiben unverändert, fehlende
+    Schema-Spalten werden übersprungen.
+
+    Returns:
+        pd.DataFrame: neuer DataFrame (Eingang bleibt unverändert)
+    """
+    schema = ROHDATEN_SCHEMA if schema is None else schema
+    df = df.copy(deep=False)
+    for col, art in schema.items():
+        if col in df.columns:
+            df[col] = _UMWANDLUNG[art](df[col])
+    return df
+
+
+def speicher_mb(df):
+    """Speicherbedarf pro Spalte in MB (inkl. Python-Strings)."""
+    return df.memory_usage(deep=True, index=False) / 1024**2
+
+
+def speicherbericht(vorher, nachher, top=5):
+    """
+    Druckt den Speicherbedarf vor/nach der Umwandlung und die Spalten mit
+    der größten Ersparnis.
+
+    Args:
+        vorher, nachher: Ergebnisse von speicher_mb()
+    """
+    gesamt_vorher, gesamt_nachher = vorher.sum(), nachher.sum()
+    anteil = gesamt_nachher / gesamt_vorher if gesamt_vorher > 0 else 1.0
+    print(
+        f"   🗜️  Speicher Rohdaten: {gesamt_vorher:,.1f} MB -> {gesamt_nachher:,.1f} MB "
+        f"({anteil:.0%})"
+    )
+    ersparnis = (vorher - nachher.reindex(vorher.index, fill_value=0)).nlargest(top)
+    for col, mb in ersparnis[ersparnis > 0].items():
+        print(f"      - {col:<24} {vorher[col]:10,.1f} MB -> {nachher[col]:10,.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Speicherbedarf der Rohdaten mit und ohne Schema vergleichen"
+    )
+    parser.add_argument("datei", nargs="?", default="dieEchtenDaten.xlsb")
+    args = parser.parse_args()
+
+    engine = "pyxlsb" if args.datei.lower().endswith(".xlsb") else None
+    df = pd.read_excel(args.datei, engine=engine)
+    vorher = speicher_mb(df)
+
+    start = time.perf_counter()
+    kompakt = wende_schema_an(df)
+    print(f"   Umwandlung: {time.perf_counter() - start:.2f}s")
+    speicherbericht(vorher, speicher_mb(kompakt), top=len(ROHDATEN_SCHEMA))
+    print(kompakt.dtypes.value_counts().to_string())
+
+
+if __name__ == "__main__":
+    main()
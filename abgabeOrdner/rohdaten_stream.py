@@ -0,0 +1,147 @@
+import os
+from operator import itemgetter
+
+import pandas as pd
+
+# --- KONFIGURATION ---
+CHUNKSIZE = 100_000  # Zeilen pro Chunk
+
+
+def _zeilen_xlsb(filepath, sheet=1):
+    """Liefert die Zeilen einer xlsb-Datei als Tupel (pyxlsb-Iterator)."""
+    try:
+        from pyxlsb import open_workbook
+    except ImportError:
+        raise ImportError("pyxlsb ist NICHT installiert → pip install pyxlsb")
+
+    with open_workbook(filepath) as wb:
+        with wb.get_sheet(sheet) as ws:
+            for row in ws.rows(sparse=False):
+                yield tuple(c.v for c in row)
+
+
+def _zeilen_openpyxl(filepath, sheet=None):
+    """Liefert die Zeilen einer xlsx-Datei als Tupel (openpyxl read-only)."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportError("openpyxl ist NICHT installiert → pip install openpyxl")
+
+    wb = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if sheet else wb.worksheets[0]
+        for row in ws.iter_rows(values_only=True):
+            yield row
+    finally:
+        wb.close()
+
+
+def _typisiere_chunk(daten, columns, dtypes):
+    """Baut aus den gesammelten Spaltenlisten einen typisierten DataFrame."""
+    df = pd.DataFrame(dict(zip(columns, daten)), columns=columns)
+    for col in columns:
+        ziel = dtypes.get(col)
+        if ziel is None:
+            # Ohne Vorgabe: Zahlen erkennen, Text bleibt Text
+            try:
+                df[col] = pd.to_numeric(df[col])
+            except (ValueError, TypeError):
+                pass
+        elif ziel.startswith("float") or ziel.startswith("int"):
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(ziel)
+        else:
+            df[col] = df[col].astype(ziel)
+    return df
+
+
+def iter_rohdaten_chunks(
+    filepath="dieEchtenDaten.xlsb", columns=None, chunksize=CHUNKSIZE, dtypes=None
+):
+    """
+    Liest die Rohdaten zeilenweise (pyxlsb / openpyxl) und liefert
+    DataFrames mit höchstens `chunksize` Zeilen. Es werden nur die Spalten
+    in `columns` behalten und typisiert, der Speicherbedarf hängt damit
+    von der Chunkgröße ab und nicht von der Dateigröße.
+
+    Args:
+        columns: Liste der benötigten Spalten (None = alle)
+        dtypes: optionales Mapping Spalte -> dtype (z.B. {"prog_mg1": "float32"})
+
+    Yields:
+        pd.DataFrame: ein typisierter Chunk
+    """
+    dtypes = dtypes or {}
+    if os.path.splitext(filepath)[1].lower() == ".xlsb":
+        zeilen = _zeilen_xlsb(filepath)
+    else:
+        zeilen = _zeilen_openpyxl(filepath)
+
+    try:
+        kopf = [str(c) if c is not None else "" for c in next(zeilen)]
+    except StopIteration:
+        return
+
+    if columns is None:
+        columns = [c for c in kopf if c]
+    fehlend = [c for c in columns if c not in kopf]
+    if fehlend:
+        raise KeyError(f"Spalten fehlen in '{filepath}': {fehlend}")
+
+    indices = [kopf.index(c) for c in columns]
+    breite = max(indices) + 1
+    if len(indices) == 1:
+        waehle = lambda zeile: (zeile[indices[0]],)  # noqa: E731
+    else:
+        waehle = itemgetter(*indices)
+
+    puffer = []
+    for zeile in zeilen:
+        if len(zeile) < breite:
+            # openpyxl kürzt leere Zeilenenden
+            zeile = tuple(zeile) + (None,) * (breite - len(zeile))
+        puffer.append(waehle(zeile))
+        if len(puffer) >= chunksize:
+            yield _typisiere_chunk(list(zip(*puffer)), columns, dtypes)
+            puffer = []
+
+    if puffer:
+        yield _typisiere_chunk(list(zip(*puffer)), columns, dtypes)
+
+
+# Wie sich Teilergebnisse einzelner Chunks zum Gesamtergebnis kombinieren
+_KOMBINATION = {
+    "sum": "sum",
+    "count": "sum",
+    "size": "sum",
+    "max": "max",
+    "min": "min",
+    "first": "first",
+    "last": "last",
+}
+
+
+def aggregiere_chunkweise(chunks, keys, agg_definition):
+    """
+    groupby(keys).agg(agg_definition) über einen Chunk-Iterator.
+    Jeder Chunk wird vorab aggregiert und sofort mit dem bisherigen
+    Zwischenergebnis verdichtet, im Speicher liegt also nie mehr als
+    ein Chunk plus das (kleine) Aggregat.
+
+    Unterstützt nur zerlegbare Aggregationen (sum, count, max, min, first, last).
+    """
+    nicht_zerlegbar = [f for f in agg_definition.values() if f not in _KOMBINATION]
+    if nicht_zerlegbar:
+        raise ValueError(f"Aggregation nicht chunkweise möglich: {nicht_zerlegbar}")
+
+    kombination = {col: _KOMBINATION[f] for col, f in agg_definition.items()}
+    ergebnis = None
+    for chunk in chunks:
+        teil = chunk.groupby(keys, observed=True).agg(agg_definition)
+        if ergebnis is None:
+            ergebnis = teil
+        else:
+            ergebnis = pd.concat([ergebnis, teil]).groupby(level=keys).agg(kombination)
+
+    if ergebnis is None:
+        return pd.DataFrame(columns=list(keys) + list(agg_definition))
+    return ergebnis.reset_index()
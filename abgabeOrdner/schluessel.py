@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+
+
+def _normiere_texte(uniques):
+    """Text ohne ".0" am Ende (Excel-Floats), ohne Whitespace, Großbuchstaben."""
+    s = pd.Index(uniques).astype(str)
+    return s.str.replace(r"\.0$", "", regex=True).str.strip().str.upper()
+
+
+def normalisiere_schluessel(werte):
+    """
+    Normalisiert eine Kunden-/Werk-Spalte. Es werden nur die eindeutigen
+    Werte bearbeitet (factorize), bei Millionen Zeilen mit wenigen Werken
+    also nur eine Handvoll Strings.
+
+    Returns:
+        np.ndarray (object) mit den normalisierten Schlüsseln, NaN bleibt NaN
+    """
+    codes, uniques = pd.factorize(werte)
+    normiert = np.asarray(_normiere_texte(uniques), dtype=object)
+    ergebnis = np.full(len(codes), np.nan, dtype=object)
+    gueltig = codes >= 0
+    ergebnis[gueltig] = normiert[codes[gueltig]]
+    return ergebnis
+
+
+class Schluesselraum:
+    """
+    Gemeinsames Wörterbuch normalisierter Schlüssel -> dichte int32-Codes.
+
+    Alle Tabellen, die miteinander verknüpft werden (Prognose, Plan, ...),
+    bekommen ihre Codes aus demselben Raum. Joins werden dann zu
+    Array-Indizierung auf (code, monats_ordinal).
+
+    normalisieren=False übernimmt die Schlüssel unverändert (z.B. für Plots,
+    die die Originalnamen zeigen).
+    """
+
+    __slots__ = ("namen", "_index", "normalisieren")
+
+    def __init__(self, normalisieren=True):
+        self.namen = []
+        self._index = {}
+        self.normalisieren = normalisieren
+
+    def __len__(self):
+        return len(self.namen)
+
+    def _code(self, name):
+        code = self._index.get(name)
+        if code is None:
+            code = len(self.namen)
+            self._index[name] = code
+            self.namen.append(name)
+        return code
+
+    def codes(self, werte):
+        """Schlüsselspalte -> int32-Codes (-1 für fehlende Werte)."""
+        roh, uniques = pd.factorize(werte)
+        if self.normalisieren:
+            uniques = _normiere_texte(uniques)
+        lookup = np.array([self._code(n) for n in uniques], dtype=np.int32)
+        if len(lookup) == 0:
+            return np.full(len(roh), -1, dtype=np.int32)
+        return np.where(roh >= 0, lookup[np.maximum(roh, 0)], -1).astype(np.int32)
+
+    def suche(self, werte):
+        """Wie codes(), aber ohne neue Einträge: unbekannte Schlüssel -> -1."""
+        roh, uniques = pd.factorize(werte)
+        if self.normalisieren:
+            uniques = _normiere_texte(uniques)
+        lookup = np.array([self._index.get(n, -1) for n in uniques], dtype=np.int32)
+        if len(lookup) == 0:
+            return np.full(len(roh), -1, dtype=np.int32)
+        return np.where(roh >= 0, lookup[np.maximum(roh, 0)], -1).astype(np.int32)
+
+    def labels(self, codes):
+        """int32-Codes -> normalisierte Schlüssel."""
+        return np.asarray(self.namen, dtype=object)[codes]
+
+
+class Zellenraster:
+    """
+    Dichtes Raster Schlüssel x Monat. Jede (code, ordinal)-Kombination hat
+    eine feste Zellennummer, Summen und Lookups laufen über np.bincount
+    bzw. Indizierung statt über pd.merge.
+    """
+
+    __slots__ = ("n_schluessel", "ord_min", "n_monate")
+
+    def __init__(self, n_schluessel, *ordinal_arrays):
+        gueltige = [o[o >= 0] for o in ordinal_arrays]
+        gueltige = [o for o in gueltige if len(o)]
+        self.n_schluessel = n_schluessel
+        if gueltige:
+            self.ord_min = int(min(o.min() for o in gueltige))
+            self.n_monate = int(max(o.max() for o in gueltige)) - self.ord_min + 1
+        else:
+            self.ord_min = 0
+            self.n_monate = 0
+
+    @property
+    def n_zellen(self):
+        return self.n_schluessel * self.n_monate
+
+    def index(self, codes, ordinal):
+        """Zellennummer pro Zeile, -1 für ungültige Schlüssel oder Monate."""
+        gueltig = (codes >= 0) & (ordinal >= 0)
+        zelle = codes.astype(np.int64) * self.n_monate + (ordinal - self.ord_min)
+        return np.where(gueltig, zelle, -1)
+
+    def summe(self, zelle, werte):
+        """Summe der Werte pro Zelle (float64) und Belegungsmaske."""
+        gueltig = zelle >= 0
+        summen = np.bincount(
+            zelle[gueltig],
+            weights=np.asarray(werte, dtype=float)[gueltig],
+            minlength=self.n_zellen,
+        )
+        belegt = np.bincount(zelle[gueltig], minlength=self.n_zellen) > 0
+        return summen, belegt
+
+    def zerlege(self, zellen):
+        """Zellennummern -> (codes, ordinal)."""
+        zellen = np.asarray(zellen, dtype=np.int64)
+        return (
+            (zellen // self.n_monate).astype(np.int32),
+            (zellen % self.n_monate + self.ord_min).astype(np.int32),
+        )
@@ -0,0 +1,263 @@
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from skripte import lade_skript, skript_dateien
+
+# --- KONFIGURATION ---
+WORKERS = 1  # 1 = ohne Prozesspool
+SHARDS_PRO_WORKER = 4  # mehr Shards als Worker gleichen ungleich große Werke aus
+AUSRICHTUNG = 64
+MAX_SHARDS = 2**15 - 1  # Shard-Nummern als int16
+
+# sortierung=ZEILE: Ergebnis ist zeilengleich zur ersten Tabelle
+ZEILE = "__zeile"
+
+# Im Worker: Tabellen aus dem Shared Memory (wird vom Initializer gesetzt)
+_WORKER_TABELLEN = None
+
+
+# ---------------------------------------------------------
+# Tabellen <-> Shared Memory
+# ---------------------------------------------------------
+
+
+def _spalte_zu_array(spalte):
+    """Spalte -> (numpy-Array, Bauplan zum Wiederherstellen)."""
+    dtype = spalte.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return spalte.cat.codes.to_numpy(), ("kategorie", dtype)
+    if isinstance(dtype, np.dtype) and dtype.kind in "biufmM":
+        return spalte.to_numpy(), ("zahl", None)
+    if pd.api.types.is_numeric_dtype(dtype):
+        # Nullable Int/Float: als float64 mit NaN, danach zurück in den dtype
+        return spalte.to_numpy(dtype=float, na_value=np.nan), ("nullable", dtype)
+    codes, uniques = pd.factorize(spalte)
+    return codes, ("text", (np.asarray(uniques, dtype=object), dtype))
+
+
+def _array_zu_spalte(werte, bauplan):
+    art, info = bauplan
+    if art == "zahl":
+        return werte
+    if art == "kategorie":
+        return pd.Categorical.from_codes(werte, dtype=info)
+    if art == "nullable":
+        return pd.array(werte, dtype=info)
+    uniques, dtype = info
+    texte = np.append(uniques, np.nan)[werte]
+    return pd.array(texte, dtype=dtype) if isinstance(dtype, pd.StringDtype) else texte
+
+
+def _oeffne_shm(name):
+    """Bestehenden Block öffnen; gelöscht wird er nur vom Hauptprozess."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: Worker teilen sich den Resource-Tracker des
+        # Hauptprozesses, die doppelte Registrierung ist harmlos
+        return shared_memory.SharedMemory(name=name)
+
+
+class _GeteilteTabelle:
+    """
+    Eine Tabelle in einem Shared-Memory-Block: alle Spalten hintereinander,
+    Zeilen nach Shard sortiert. Worker erzeugen daraus Sichten pro Shard,
+    ohne dass die Daten gepickelt oder kopiert werden.
+    """
+
+    def __init__(self, df, positionen):
+        arrays, self.spalten = [], []
+        offset = 0
+        spalten = [(ZEILE, pd.Series(positionen))] + list(df.items())
+        for col, spalte in spalten:
+            werte, bauplan = _spalte_zu_array(spalte)
+            offset += -offset % AUSRICHTUNG
+            self.spalten.append((col, offset, werte.dtype.str, bauplan))
+            arrays.append((offset, werte))
+            offset += werte.nbytes
+        self.n_zeilen = len(df)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for (offset, werte) in arrays:
+            ziel = np.ndarray(werte.shape, dtype=werte.dtype, buffer=self.shm.buf, offset=offset)
+            ziel[:] = werte
+
+    def plan(self):
+        """Picklebare Beschreibung für den Worker (ohne die Daten)."""
+        return self.shm.name, self.n_zeilen, self.spalten
+
+    def schliessen(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _sicht(shm, n_zeilen, spalten, von, bis):
+    """Zeilen von:bis als DataFrame, Index = Zeilenposition in der Eingangstabelle."""
+    daten = {}
+    for col, offset, dtype, bauplan in spalten:
+        werte = np.ndarray((n_zeilen,), dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+        daten[col] = _array_zu_spalte(werte[von:bis], bauplan)
+    index = pd.Index(daten.pop(ZEILE))
+    return pd.DataFrame(daten, index=index, copy=False)
+
+
+def _init_worker(plaene, skripte=()):
+    global _WORKER_TABELLEN
+    # Funktionen aus Schritt-Skripten (skript_...) wie im Hauptprozess laden
+    for datei in skripte:
+        lade_skript(datei)
+    _WORKER_TABELLEN = [(_oeffne_shm(name), n, spalten) for name, n, spalten in plaene]
+
+
+def _fuehre_shard_aus(funktion, grenzen, shard, kwargs):
+    teile = []
+    for (shm, n, spalten), g in zip(_WORKER_TABELLEN, grenzen):
+        teil = _sicht(shm, n, spalten, g[shard], g[shard + 1])
+        teile.append(teil)
+    return funktion(*teile, **kwargs)
+
+
+# ---------------------------------------------------------
+# Verteilung und Zusammenführung
+# ---------------------------------------------------------
+
+
+def verteile_schluessel(gewichte, n_shards):
+    """
+    Längste-Werke-zuerst (LPT): jedes Werk geht an den bisher leichtesten
+    Shard. Gleiche Eingabe -> gleiche Zuordnung.
+
+    Returns:
+        np.ndarray: Shard pro Schlüssel
+    """
+    shard_von = np.zeros(len(gewichte), dtype=np.int64)
+    heap = [(0, shard) for shard in range(n_shards)]
+    for k in np.argsort(-np.asarray(gewichte), kind="stable"):
+        last, shard = heapq.heappop(heap)
+        shard_von[k] = shard
+        heapq.heappush(heap, (last + int(gewichte[k]), shard))
+    return shard_von
+
+
+def _fuehre_zusammen(ergebnisse, sortierung, schluessel, uniques, index):
+    erstes = ergebnisse[0]
+    if isinstance(erstes, tuple):
+        sortierung = sortierung if sortierung is not None else [None] * len(erstes)
+        return tuple(
+            _fuehre_zusammen([e[i] for e in ergebnisse], sortierung[i], schluessel, uniques, index)
+            for i in range(len(erstes))
+        )
+    if not isinstance(erstes, (pd.DataFrame, pd.Series)):
+        return ergebnisse
+
+    if sortierung == ZEILE:
+        # Index der Teilergebnisse = Zeilenposition -> Originalreihenfolge und -index
+        teil = pd.concat(ergebnisse).sort_index(kind="stable")
+        return teil.set_axis(index[teil.index.to_numpy()])
+
+    df = pd.concat(ergebnisse, ignore_index=True)
+    if not isinstance(df, pd.DataFrame):
+        return df
+    if sortierung is None:
+        if schluessel not in df.columns:
+            return df
+        # Schlüssel in der Reihenfolge ihres ersten Auftretens (wie ein
+        # Aufruf ohne Pool), innerhalb des Schlüssels wie vom Shard geliefert
+        code = uniques.get_indexer(pd.Index(np.asarray(df[schluessel], dtype=object)))
+        return df.iloc[np.argsort(code, kind="stable")].reset_index(drop=True)
+    sortierung = [sortierung] if isinstance(sortierung, str) else list(sortierung)
+    sortierung = [s for s in sortierung if s in df.columns]
+    if sortierung:
+        df = df.sort_values(sortierung, kind="stable").reset_index(drop=True)
+    return df
+
+
+def nach_werk(funktion, tabellen, schluessel, workers=WORKERS, sortierung=None, **kwargs):
+    """
+    Führt funktion(*tabellen, **kwargs) aufgeteilt nach Werk/Kunde in einem
+    Prozesspool aus und führt die Ergebnisse deterministisch zusammen.
+
+    Jede Tabelle wird nach `schluessel` partitioniert (gleiche Werke landen
+    im selben Shard, auch über mehrere Tabellen hinweg, z.B. Prognose und
+    Plan). Die Eingaben liegen als Shared Memory vor, die Worker lesen ihre
+    Zeilen ohne Kopie. funktion muss pro Werk unabhängig rechnen und auf
+    Modulebene definiert sein (auch in einem Schritt-Skript, siehe
+    skripte.skript_dateien).
+
+    Die Teiltabellen im Worker haben als Index die Zeilenposition in der
+    Eingangstabelle. Zusammenführung pro DataFrame/Series-Ergebnis (bei
+    Tupeln pro Element, sortierung dann als Liste):
+    - sortierung=ZEILE: Ergebnis ist zeilengleich zur ersten Tabelle (Index
+      durchgereicht) -> Eingangsreihenfolge und Originalindex
+    - sortierung=None: Werke in der Reihenfolge ihres ersten Auftretens
+      (erste Tabelle zuerst), innerhalb eines Werks wie vom Shard geliefert
+      -> gleiche Zeilenfolge wie ohne Pool, wenn funktion ihre Gruppen so
+      ausgibt (groupby(sort=False), baue_panels); Ergebnisse ohne die
+      Schlüsselspalte werden nur aneinandergehängt
+    - sonst stabil nach den angegebenen Spalten (Index 0..n-1)
+    Andere Ergebnisse (z.B. None) kommen als Liste pro Shard zurück.
+
+    workers <= 1 (oder nur ein Werk) ruft funktion direkt auf.
+    """
+    workers = min(workers, MAX_SHARDS // SHARDS_PRO_WORKER)
+    if workers <= 1:
+        return funktion(*tabellen, **kwargs)
+    if isinstance(schluessel, str):
+        schluessel_je_tabelle = [schluessel] * len(tabellen)
+    else:
+        schluessel_je_tabelle = list(schluessel)
+    # Schlüssel pro Tabelle kodieren, dann auf gemeinsame Codes abbilden
+    codes_je_tabelle, uniques = [], pd.Index([], dtype=object)
+    for tabelle, spalte in zip(tabellen, schluessel_je_tabelle):
+        codes, eigene = pd.factorize(tabelle[spalte], use_na_sentinel=False)
+        eigene = pd.Index(np.asarray(eigene, dtype=object))
+        uniques = uniques.append(eigene[~eigene.isin(uniques)])
+        codes_je_tabelle.append(uniques.get_indexer(eigene)[codes])
+    if len(uniques) <= 1:
+        return funktion(*tabellen, **kwargs)
+    n_shards = min(len(uniques), workers * SHARDS_PRO_WORKER)
+
+    # Gewicht eines Werks = Zeilen in der ersten (größten) Tabelle
+    gewichte = np.bincount(codes_je_tabelle[0], minlength=len(uniques)) + 1
+    # int16: stabile Sortierung als Radix-Sort statt Mergesort
+    shard_von = verteile_schluessel(gewichte, n_shards).astype(np.int16)
+
+    geteilt, grenzen = [], []
+    try:
+        for tabelle, c in zip(tabellen, codes_je_tabelle):
+            shard = shard_von[c]
+            reihenfolge = np.argsort(shard, kind="stable")
+            geteilt.append(_GeteilteTabelle(tabelle.iloc[reihenfolge], reihenfolge))
+            grenzen.append(np.searchsorted(shard[reihenfolge], np.arange(n_shards + 1)))
+
+        plaene = [t.plan() for t in geteilt]
+        with ProcessPoolExecutor(
+            max_workers=min(workers, n_shards),
+            initializer=_init_worker,
+            initargs=(plaene, skript_dateien([funktion])),
+        ) as pool:
+            futures = [
+                pool.submit(_fuehre_shard_aus, funktion, grenzen, shard, kwargs)
+                for shard in range(n_shards)
+            ]
+            ergebnisse = [f.result() for f in futures]
+    finally:
+        for t in geteilt:
+            t.schliessen()
+
+    return _fuehre_zusammen(
+        ergebnisse, sortierung, schluessel_je_tabelle[0], uniques, tabellen[0].index
+    )
+
+
+def worker_anzahl(wert):
+    """--workers: 0 = alle Kerne (die der Prozess nutzen darf)."""
+    if int(wert) == 0:
+        if hasattr(os, "sched_getaffinity"):
+            return len(os.sched_getaffinity(0))
+        return os.cpu_count() or 1
+    return max(int(wert), 1)
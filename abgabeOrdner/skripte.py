@@ -0,0 +1,46 @@
+import importlib.util
+import os
+import sys
+
+# Ordner der Schritt-Skripte (1-Datenvertständnis.py, ...)
+SKRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def lade_skript(datei):
+    """
+    Importiert ein Schritt-Skript, dessen Dateiname kein gültiger
+    Modulname ist (z.B. "3-Prognoseglättung.py"). Der __main__-Block läuft
+    dabei nicht; jedes Skript wird pro Prozess nur einmal geladen.
+
+    Returns:
+        Modul
+    """
+    name = "skript_" + os.path.splitext(datei)[0].replace("-", "_").replace(".", "_")
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(SKRIPT_DIR, datei))
+    modul = importlib.util.module_from_spec(spec)
+    sys.modules[name] = modul
+    try:
+        spec.loader.exec_module(modul)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return modul
+
+
+def skript_dateien(funktionen):
+    """
+    Dateien der Schritt-Skripte (über lade_skript geladen, Modul skript_...),
+    aus denen die Funktionen stammen. Unter spawn/forkserver kann ein Worker
+    sie nicht per Modulname importieren; er lädt sie vorab mit lade_skript.
+
+    Returns:
+        list[str]: Dateinamen, sortiert
+    """
+    dateien = set()
+    for funktion in funktionen:
+        modul = sys.modules.get(funktion.__module__)
+        if funktion.__module__.startswith("skript_") and modul is not None:
+            dateien.add(os.path.basename(modul.__file__))
+    return sorted(dateien)
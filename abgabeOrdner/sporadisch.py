@@ -0,0 +1,176 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from monatscode import code_zu_ordinal, monats_codes
+from panel import Panel, baue_panels, links_buendig
+
+# --- KONFIGURATION ---
+ALPHA = 0.1  # Glättung von Bedarfshöhe und -abstand (Croston/SBA/TSB)
+BETA_TSB = 0.1  # Glättung der Bedarfswahrscheinlichkeit (TSB)
+# Auswahl nach dem Nullanteil der Historie einer Serie
+SPORADISCH_AB = 0.3  # ab hier sporadisch: SBA statt Holt-Winters
+TSB_AB = 0.7  # sehr dünn besetzt: TSB (Wahrscheinlichkeit kann gegen 0 gehen)
+METHODEN = ("croston", "sba", "tsb")
+
+
+def nullanteil(raster, laengen):
+    """Anteil der Monate ohne Bedarf (<= 0) je Serie (linksbündiges Raster)."""
+    laengen = np.asarray(laengen)
+    position = np.arange(raster.shape[1])
+    maske = position[None, :] < laengen[:, None]
+    nullen = (maske & ~(np.nan_to_num(raster) > 0)).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(laengen > 0, nullen / laengen, 1.0)
+
+
+def waehle_methode(anteil):
+    """
+    Prognosemethode je Serie aus dem Nullanteil:
+    < SPORADISCH_AB 'holt-winters', < TSB_AB 'sba', sonst 'tsb'.
+    """
+    anteil = np.asarray(anteil)
+    methode = np.full(len(anteil), "tsb", dtype=object)
+    methode[anteil < TSB_AB] = "sba"
+    methode[anteil < SPORADISCH_AB] = "holt-winters"
+    return methode
+
+
+def sporadische_prognose(raster, laengen, methode="sba"):
+    """
+    Croston, SBA und TSB für alle Serien gleichzeitig (eine Schleife über
+    die Monate, vektorisiert über die Serien).
+
+    - Croston: Bedarfshöhe z und Bedarfsabstand p werden nur in Monaten
+      mit Bedarf geglättet, Prognose z / p
+    - SBA: Croston mit Bias-Korrektur (1 - ALPHA / 2) * z / p
+    - TSB: Bedarfswahrscheinlichkeit jeden Monat geglättet, Prognose pi * z
+
+    Args:
+        raster: Serie x Monat, linksbündig (NaN nach dem Ende)
+        methode: eine Methode für alle oder ein Array mit einer pro Serie
+
+    Returns:
+        np.ndarray: Prognose pro Monat je Serie (flach über den Horizont),
+        0 für Serien ohne Bedarf
+    """
+    n, n_pos = raster.shape
+    laengen = np.asarray(laengen)
+    methode = np.broadcast_to(np.asarray(methode, dtype=object), (n,))
+    unbekannt = set(methode) - set(METHODEN)
+    if unbekannt:
+        raise ValueError(f"Unbekannte Methode(n) {sorted(unbekannt)} (erlaubt: {', '.join(METHODEN)})")
+
+    z = np.full(n, np.nan)  # Bedarfshöhe
+    p = np.full(n, np.nan)  # Abstand zwischen Bedarfen
+    q = np.zeros(n)  # Monate seit dem letzten Bedarf
+    pi = np.full(n, np.nan)  # Bedarfswahrscheinlichkeit (TSB)
+
+    for t in range(n_pos):
+        aktiv = t < laengen
+        if not aktiv.any():
+            break
+        y = np.where(aktiv, np.nan_to_num(raster[:, t]), 0.0)
+        bedarf = aktiv & (y > 0)
+        q += aktiv
+
+        erster = bedarf & np.isnan(z)
+        weiter = bedarf & ~erster
+        z[erster] = y[erster]
+        p[erster] = q[erster]
+        z[weiter] += ALPHA * (y[weiter] - z[weiter])
+        p[weiter] += ALPHA * (q[weiter] - p[weiter])
+        q[bedarf] = 0
+
+        start = aktiv & np.isnan(pi)
+        pi[start] = bedarf[start]
+        laufend = aktiv & ~start
+        pi[laufend] += BETA_TSB * (bedarf[laufend] - pi[laufend])
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        croston = z / p
+    werte = np.select(
+        [methode == "croston", methode == "sba"],
+        [croston, (1 - ALPHA / 2) * croston],
+        pi * z,
+    )
+    return np.nan_to_num(werte.astype(float))
+
+
+def ersetze_sporadische_serien(
+    df_forecast,
+    historie,
+    artikel="matnr",
+    kunde="werk",
+    monat="bedmo",
+    menge="bedmo_mg",
+    methode="auto",
+):
+    """
+    Ersetzt in der ERP-Prognose (Artikel/Kunde/Gruppe/Monat/Menge) die
+    Serien, deren Historie sporadisch ist, durch Croston/SBA/TSB. Die
+    Prognosemonate der ERP-Zeilen bleiben, die Menge kommt aus der
+    sporadischen Prognose. Dichte Serien bleiben unverändert.
+
+    Returns:
+        pd.DataFrame im selben Schema (Index 0..n-1)
+    """
+    start = time.perf_counter()
+    hist = pd.DataFrame(
+        {
+            "Artikel": historie[artikel],
+            "Kunde": historie[kunde],
+            "Monat": historie[monat],
+            "Menge": historie[menge],
+        }
+    )
+    hist_ord = code_zu_ordinal(monats_codes(hist["Monat"]))
+    (panel_h, _), (_, (serie_f, _)) = baue_panels(
+        [hist, df_forecast],
+        ["Artikel", "Kunde"],
+        ["Menge", "Menge"],
+        ordinale=[hist_ord, None],
+        dtype=np.float64,
+    )
+
+    # Nur die Historienmonate (Panel-Achse umfasst auch die Prognosemonate)
+    n_hist = int(hist_ord.max(initial=-1)) - panel_h.ord_min + 1 if (hist_ord >= 0).any() else 0
+    n_hist = max(n_hist, 0)
+    historie_panel = Panel(
+        panel_h.werte[:, :n_hist],
+        panel_h.belegt[:, :n_hist],
+        panel_h.schluessel_spalten,
+        panel_h.raeume,
+        panel_h.serien_codes,
+        panel_h.ord_min,
+    )
+    raster, laengen, _ = links_buendig(historie_panel)
+    anteil = nullanteil(raster, laengen)
+    methoden = waehle_methode(anteil) if methode == "auto" else np.full(len(anteil), methode, dtype=object)
+    # Ohne Historie bleibt die ERP-Prognose
+    sporadisch = (methoden != "holt-winters") & (laengen > 0)
+
+    prognose = np.zeros(len(anteil))
+    prognose[sporadisch] = sporadische_prognose(
+        raster[sporadisch], laengen[sporadisch], methoden[sporadisch]
+    )
+
+    ersetzen = np.zeros(len(df_forecast), dtype=bool)
+    ok = serie_f >= 0
+    ersetzen[ok] = sporadisch[serie_f[ok]]
+    bleibt = df_forecast[~ersetzen]
+
+    # Eine Zeile pro Serie und Prognosemonat, Menge aus der sporadischen Prognose
+    neu = df_forecast[ersetzen].assign(Menge=prognose[serie_f[ersetzen]])
+    neu = neu.drop_duplicates(subset=["Artikel", "Kunde", "Monat"])
+    neu = neu[neu["Menge"] > 0]
+
+    result = pd.concat([bleibt, neu], ignore_index=True)
+    zaehler = pd.Series(methoden[sporadisch]).value_counts().to_dict()
+    print(
+        f"   🧩 Sporadische Serien ersetzt: {int(sporadisch.sum())} von {len(anteil)} "
+        f"{zaehler} ({time.perf_counter() - start:.2f}s)"
+    )
+    return result
+
@@ -0,0 +1,279 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from rohdaten_cache import CACHE_DIR, datei_hash, load_rohdaten_cached
+
+# --- KONFIGURATION ---
+STERN_DIR = os.path.join(CACHE_DIR, "stern")
+
+# Dimension -> Spalten, die sich in jeder Rohzeile wiederholen.
+# Alles andere (Belege, Perioden, Mengen) bleibt in der Faktentabelle.
+STERN_DIMENSIONEN = {
+    "artikel": [
+        "matnr",
+        "Baumarktartikel",
+        "modulgruppen",
+        "wavor_bme",
+        "bstlmgeh",
+        "gew_bto",
+        "geweh",
+        "gew_bto_kg",
+        "ltm_zin_lt_kategorie",
+        "zin_lt_1_menge",
+        "ltm_zout_lt_kategorie",
+        "lt_1_bruttogew_in_kg",
+        "lt_1_laenge",
+        "lt_1_breite",
+        "lt_1_hoehe",
+        "lt_1_me",
+        "lt_1_flaeche",
+        "lt_1_feh",
+        "lt_1_volumen",
+        "lt_1_veh",
+        "lt_1_menge_in_lt",
+    ],
+    "kunde": ["werk", "Baumarkt", "kundnr"],
+    "lieferort": ["lft_land", "lft_ort", "cc_bez"],
+}
+
+
+def _id_spalte(dim):
+    return f"{dim}_id"
+
+
+class Sternschema:
+    """
+    Rohdaten als schmale Faktentabelle + deduplizierte Dimensionstabellen.
+
+    fakten: Belege, Perioden, Mengen und pro Dimension eine int32-Spalte
+    '<dim>_id'. dimensionen[<dim>]: eine Zeile pro vorkommender Kombination
+    der Dimensionsspalten, Zeilennummer = id. Attribut-Lookups sind damit
+    reine Indizierung (take) statt Merge.
+
+        stern = lade_oder_baue_sternschema()
+        stern.aggregiere(["lft_ort"], {"lt_1_volumen": "sum"})
+    """
+
+    __slots__ = ("fakten", "dimensionen", "reihenfolge")
+
+    def __init__(self, fakten, dimensionen, reihenfolge):
+        self.fakten = fakten
+        self.dimensionen = dimensionen
+        self.reihenfolge = list(reihenfolge)
+
+    def __len__(self):
+        return len(self.fakten)
+
+    def __contains__(self, spalte):
+        return spalte in self.fakten.columns or any(
+            spalte in tabelle.columns for tabelle in self.dimensionen.values()
+        )
+
+    def dimension_von(self, spalte):
+        """Name der Dimension, die die Spalte enthält (None = Faktentabelle)."""
+        for dim, tabelle in self.dimensionen.items():
+            if spalte in tabelle.columns:
+                return dim
+        if spalte in self.fakten.columns:
+            return None
+        raise KeyError(f"Spalte '{spalte}' gibt es weder in Fakten noch in Dimensionen")
+
+    def spalte(self, spalte):
+        """Spalte zeilengleich zur Faktentabelle (Dimension per id nachgeschlagen)."""
+        dim = self.dimension_von(spalte)
+        if dim is None:
+            return self.fakten[spalte]
+        ids = self.fakten[_id_spalte(dim)].to_numpy()
+        werte = self.dimensionen[dim][spalte].take(ids)
+        return werte.set_axis(self.fakten.index)
+
+    def spalten(self, spalten):
+        """DataFrame mit den angefragten Spalten, zeilengleich zur Faktentabelle."""
+        return pd.DataFrame({s: self.spalte(s) for s in spalten}, index=self.fakten.index)
+
+    def aggregiere(self, keys, agg):
+        """
+        groupby(keys).agg(agg) über die Faktentabelle; Schlüssel und Werte
+        dürfen Dimensionsattribute sein (z.B. Volumen pro Lieferort).
+        """
+        keys = [keys] if isinstance(keys, str) else list(keys)
+        benoetigt = keys + [s for s in agg if s not in keys]
+        return (
+            self.spalten(benoetigt)
+            .groupby(keys, sort=True, observed=True)
+            .agg(agg)
+            .reset_index()
+        )
+
+    def breit(self):
+        """Zurück zur ursprünglichen breiten Tabelle (gleiche Spaltenfolge)."""
+        return self.spalten(self.reihenfolge)
+
+
+def zerlege_sternschema(df, dimensionen=None):
+    """
+    Zerlegt die Rohdaten in Fakten- und Dimensionstabellen.
+
+    Eine Dimensionszeile ist eine Kombination der Dimensionsspalten, wie sie
+    in den Rohdaten vorkommt (fehlende Werte zählen als eigener Wert). Die
+    Zerlegung ist damit verlustfrei, auch wenn ein Attribut innerhalb einer
+    matnr schwankt. Fehlende Dimensionsspalten werden übersprungen.
+
+    Returns:
+        Sternschema
+    """
+    dimensionen = STERN_DIMENSIONEN if dimensionen is None else dimensionen
+    fakten_spalten = {}
+    tabellen = {}
+    verbraucht = set()
+
+    for dim, spalten in dimensionen.items():
+        spalten = [s for s in spalten if s in df.columns and s not in verbraucht]
+        if not spalten:
+            continue
+        verbraucht.update(spalten)
+
+        # Kombinations-id spaltenweise verfeinern: bleibt < Zeilenzahl,
+        # kein Überlauf bei vielen Spalten
+        ids = np.zeros(len(df), dtype=np.int64)
+        for spalte in spalten:
+            codes, uniques = pd.factorize(df[spalte], use_na_sentinel=False)
+            ids, _ = pd.factorize(ids * max(len(uniques), 1) + codes)
+        # factorize vergibt ids in Reihenfolge des ersten Auftretens
+        erste = pd.Series(ids).drop_duplicates().index.to_numpy()
+
+        tabelle = df[spalten].iloc[erste].reset_index(drop=True)
+        tabelle.index.name = _id_spalte(dim)
+        tabellen[dim] = tabelle
+        fakten_spalten[_id_spalte(dim)] = ids.astype(np.int32)
+
+    fakten = pd.DataFrame(fakten_spalten, index=df.index)
+    rest = [s for s in df.columns if s not in verbraucht]
+    fakten = pd.concat([fakten, df[rest]], axis=1)
+    return Sternschema(fakten, tabellen, df.columns)
+
+
+def _stern_schluessel(filepath, dimensionen):
+    params = json.dumps({"dimensionen": dimensionen}, sort_keys=True)
+    param_hash = hashlib.sha256(params.encode("utf-8")).hexdigest()[:8]
+    return f"{datei_hash(filepath)[:32]}_{param_hash}"
+
+
+def _lese_parquet(pfad, kategorien):
+    df = pd.read_parquet(pfad)
+    # Parquet verliert category bei Zahlen-Kennungen (z.B. matnr)
+    for col in kategorien:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    return df
+
+
+def _lese_stern(ordner):
+    with open(os.path.join(ordner, "stern.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    kategorien = meta["kategorien"]
+    fakten = _lese_parquet(os.path.join(ordner, "fakten.parquet"), kategorien)
+    tabellen = {}
+    for dim in meta["dimensionen"]:
+        tabelle = _lese_parquet(os.path.join(ordner, f"{dim}.parquet"), kategorien)
+        tabelle.index.name = _id_spalte(dim)
+        tabellen[dim] = tabelle
+    return Sternschema(fakten, tabellen, meta["reihenfolge"])
+
+
+def _schreibe_stern(stern, ordner):
+    tmp_ordner = f"{ordner}.{os.getpid()}.tmp"
+    os.makedirs(tmp_ordner, exist_ok=True)
+    stern.fakten.to_parquet(os.path.join(tmp_ordner, "fakten.parquet"), index=False)
+    for dim, tabelle in stern.dimensionen.items():
+        tabelle.to_parquet(os.path.join(tmp_ordner, f"{dim}.parquet"), index=False)
+    tabellen = [stern.fakten] + list(stern.dimensionen.values())
+    kategorien = [
+        col
+        for tabelle in tabellen
+        for col in tabelle.columns
+        if isinstance(tabelle[col].dtype, pd.CategoricalDtype)
+    ]
+    with open(os.path.join(tmp_ordner, "stern.json"), "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "dimensionen": list(stern.dimensionen),
+                "reihenfolge": stern.reihenfolge,
+                "kategorien": kategorien,
+            },
+            f,
+            ensure_ascii=False,
+        )
+    try:
+        os.replace(tmp_ordner, ordner)
+    except OSError:
+        # Ein paralleler Lauf war schneller
+        shutil.rmtree(tmp_ordner, ignore_errors=True)
+
+
+def lade_oder_baue_sternschema(
+    filepath="dieEchtenDaten.xlsb",
+    data=None,
+    dimensionen=None,
+    stern_dir=STERN_DIR,
+):
+    """
+    Lädt das Sternschema zur Rohdatei aus ./output/cache/stern/<inhalts-hash>/
+    oder zerlegt die Rohdaten (data bzw. gecachte Rohdaten) einmal und
+    speichert Fakten und Dimensionen als Parquet.
+    """
+    dimensionen = STERN_DIMENSIONEN if dimensionen is None else dimensionen
+
+    start = time.perf_counter()
+    ordner = os.path.join(stern_dir, _stern_schluessel(filepath, dimensionen))
+    if os.path.isdir(ordner):
+        try:
+            stern = _lese_stern(ordner)
+            print(f"   ⚡ Sternschema geladen ({time.perf_counter() - start:.2f}s)")
+            return stern
+        except Exception as e:
+            print(f"   ⚠️ Sternschema unlesbar, baue neu: {e}")
+            shutil.rmtree(ordner, ignore_errors=True)
+
+    if data is None:
+        data = load_rohdaten_cached(filepath, engine="pyxlsb")
+    stern = zerlege_sternschema(data, dimensionen)
+
+    try:
+        os.makedirs(stern_dir, exist_ok=True)
+        _schreibe_stern(stern, ordner)
+        groessen = ", ".join(f"{dim} {len(t)}" for dim, t in stern.dimensionen.items())
+        print(
+            f"   💾 Sternschema geschrieben: {len(stern)} Fakten, {groessen} "
+            f"({time.perf_counter() - start:.2f}s)"
+        )
+    except ImportError:
+        print("   ⚠️ pyarrow ist NICHT installiert -> Sternschema wird nicht gespeichert")
+    return stern
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rohdaten in Fakten und Dimensionen zerlegen")
+    parser.add_argument("datei", nargs="?", default="dieEchtenDaten.xlsb")
+    args = parser.parse_args()
+
+    stern = lade_oder_baue_sternschema(args.datei)
+    breit_mb = stern.breit().memory_usage(deep=True).sum() / 1024**2
+    fakten_mb = stern.fakten.memory_usage(deep=True).sum() / 1024**2
+    dim_mb = sum(t.memory_usage(deep=True).sum() for t in stern.dimensionen.values()) / 1024**2
+    print(f"   Breit: {breit_mb:,.1f} MB | Fakten: {fakten_mb:,.1f} MB | Dimensionen: {dim_mb:,.1f} MB")
+    for dim, tabelle in stern.dimensionen.items():
+        print(f"   - {dim:<10} {len(tabelle):>8} Zeilen, {tabelle.shape[1]} Spalten")
+    if "lft_ort" in stern.dimensionen.get("lieferort", {}):
+        print(stern.aggregiere(["lft_ort"], {"lt_1_volumen": "sum"}).head(10))
+
+
+if __name__ == "__main__":
+    main()
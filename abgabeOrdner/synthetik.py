@@ -0,0 +1,304 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from monatscode import code_zu_ordinal, ordinal_zu_code
+from rohdaten_schema import ROHDATEN_SCHEMA, speicher_mb, wende_schema_an
+
+# --- KONFIGURATION ---
+ZEILEN = 100_000
+WERKE = 20
+GRUPPEN = 30
+MONATE = 36  # Ist-Monate (bedmo); Prognosen reichen 12 bzw. 24 Monate weiter
+START_MONAT = 202301
+WERKE_PRO_ARTIKEL = 4  # Obergrenze, tatsächlich 1..WERKE_PRO_ARTIKEL
+# Störungen
+SPORADISCH_ANTEIL = 0.3  # Anteil der Serien mit sporadischem Bedarf
+AUSFALL_RATE = 0.01  # Monate, in denen eine dichte Serie ausfällt (Bedarf 0)
+OHNE_GRUPPE_ANTEIL = 0.02  # Artikel ohne modulgruppen (wie im echten Auszug)
+# Streuung (log) und Verzerrung der ERP-Prognose für Jahr 1 / Jahr 2
+PROGNOSE_STREUUNG = (0.15, 0.30)
+PROGNOSE_BIAS = (0.0, 0.05)
+# Plan je Werk/Monat = wahrer Bedarf x Zufall (wie der DEMO-PLAN in 3.1)
+PLAN_RAUSCHEN = (0.9, 1.25)
+
+
+def _kategorie(labels, codes):
+    """Kategorie-Spalte ohne Python-Strings pro Zeile (Codes -> Labels)."""
+    return pd.Categorical.from_codes(np.asarray(codes, dtype=np.int32), labels)
+
+
+def _werk_namen(n):
+    # Muster wie im echten Auszug (U51A, U51B, ...)
+    return [f"U{51 + i // 26}{chr(65 + i % 26)}" for i in range(n)]
+
+
+def _verlauf(rng, n_artikel, n_werke, n_gruppen, n_monate_gesamt):
+    """
+    Serien Artikel x Werk und ihr wahrer mittlerer Bedarf pro Monat:
+    Niveau (lognormal) x Saison der Gruppe x Trend; sporadische Serien
+    haben zusätzlich eine Bedarfswahrscheinlichkeit < 1.
+    """
+    werke_je_artikel = rng.integers(1, min(WERKE_PRO_ARTIKEL, n_werke) + 1, n_artikel)
+    artikel = np.repeat(np.arange(n_artikel), werke_je_artikel)
+    # Werke pro Artikel ohne Wiederholung: zufälliger Start + fortlaufend
+    versatz = np.arange(len(artikel)) - np.repeat(
+        np.cumsum(werke_je_artikel) - werke_je_artikel, werke_je_artikel
+    )
+    werk = (np.repeat(rng.integers(0, n_werke, n_artikel), werke_je_artikel) + versatz) % n_werke
+    gruppe_artikel = rng.integers(0, n_gruppen, n_artikel)
+    gruppe = gruppe_artikel[artikel]
+    n_serien = len(artikel)
+
+    niveau = rng.lognormal(3.5, 1.2, n_serien)
+    amplitude = rng.uniform(0.0, 0.6, n_gruppen)[gruppe]
+    phase = rng.uniform(0, 2 * np.pi, n_gruppen)[gruppe]
+    trend = rng.normal(0.0, 0.01, n_serien)
+
+    t = np.arange(n_monate_gesamt)
+    mu = niveau[:, None] * (
+        1 + amplitude[:, None] * np.sin(2 * np.pi * t[None, :] / 12 + phase[:, None])
+    )
+    mu *= np.exp(trend[:, None] * t[None, :])
+
+    sporadisch = rng.random(n_serien) < SPORADISCH_ANTEIL
+    p_bedarf = np.where(sporadisch, rng.uniform(0.1, 0.5, n_serien), 1.0)
+    return artikel, werk, gruppe_artikel, mu, p_bedarf
+
+
+def _zeilen_je_zelle(rng, gewicht, n_zeilen):
+    """
+    Verteilt n_zeilen Rohzeilen auf die Zellen mit Bedarf (größere Zellen
+    haben mehr Positionen). Jede Zelle mit Bedarf bekommt mindestens eine
+    Zeile, solange es genug Zeilen gibt.
+    """
+    n_zellen = len(gewicht)
+    if n_zellen == 0:
+        return np.zeros(0, dtype=np.int64)
+    p = np.sqrt(gewicht)
+    p = p / p.sum()
+    if n_zeilen < n_zellen:
+        zellen = rng.choice(n_zellen, size=n_zeilen, replace=False, p=p)
+        return np.bincount(zellen, minlength=n_zellen)
+    return 1 + rng.multinomial(n_zeilen - n_zellen, p)
+
+
+def erzeuge_rohdaten(
+    zeilen=ZEILEN,
+    artikel=None,
+    werke=WERKE,
+    gruppen=GRUPPEN,
+    monate=MONATE,
+    start_monat=START_MONAT,
+    spalten=None,
+    seed=0,
+):
+    """
+    Synthetischer ERP-Auszug im Schema von dieEchtenDaten (Spalten wie
+    ROHDATEN_SCHEMA, dtypes wie nach load_rohdaten_cached).
+
+    Eine Rohzeile ist eine Position Artikel x Werk x Bedarfsmonat; die
+    Monatsmenge einer Serie wird auf ihre Positionen verteilt. Der Bedarf
+    hat Gruppen-Saison, Trend, sporadische Serien (SPORADISCH_ANTEIL) und
+    Ausfälle (AUSFALL_RATE, Bedarf 0 mitten in einer dichten Serie). Jede
+    Zeile trägt dazu die ERP-Prognose für progmo = bedmo + 12 und
+    progmo2 = bedmo + 24 (wahrer Bedarf x Prognosefehler), damit Backtest
+    und Abgleich realistische Eingaben bekommen.
+
+    Args:
+        zeilen: Anzahl Rohzeilen (genau)
+        artikel: Anzahl Artikel (None: so viele, dass es etwa zwei Zeilen
+            pro Serie und Monat gibt)
+        spalten: nur diese Spalten erzeugen (spart Speicher bei 10^7 Zeilen)
+
+    Returns:
+        pd.DataFrame
+    """
+    rng = np.random.default_rng(seed)
+    if artikel is None:
+        mittel_werke = (1 + min(WERKE_PRO_ARTIKEL, werke)) / 2
+        artikel = max(20, int(zeilen / (2 * monate * mittel_werke)))
+    n_gesamt = monate + 24
+
+    serie_artikel, serie_werk, gruppe_artikel, mu, p_bedarf = _verlauf(
+        rng, artikel, werke, gruppen, n_gesamt
+    )
+    n_serien = len(serie_artikel)
+
+    # Ist: Poisson um den wahren Bedarf, sporadisch ausgedünnt, Ausfälle = 0
+    ist = rng.poisson(mu[:, :monate]).astype(np.float64)
+    ist *= rng.random((n_serien, monate)) < p_bedarf[:, None]
+    ausfall = (rng.random((n_serien, monate)) < AUSFALL_RATE) & (p_bedarf[:, None] == 1.0)
+    ist[ausfall] = 0.0
+
+    # Zeilen auf Zellen mit Bedarf verteilen
+    zellen = np.flatnonzero(ist.ravel() > 0)
+    anzahl = _zeilen_je_zelle(rng, ist.ravel()[zellen], zeilen)
+    zelle = np.repeat(zellen, anzahl)
+    serie, pos = np.divmod(zelle, monate)
+    anteil = 1.0 / np.repeat(anzahl, anzahl)
+
+    # ERP-Prognosen für die Monate 12 und 24 später, auf die Positionen verteilt
+    prognosen = []
+    for jahr, (streuung, bias) in enumerate(zip(PROGNOSE_STREUUNG, PROGNOSE_BIAS), start=1):
+        fehler = rng.lognormal(bias - streuung**2 / 2, streuung, n_serien * monate)
+        prog_zelle = mu[:, 12 * jahr : 12 * jahr + monate].ravel() * fehler
+        prognosen.append(prog_zelle[zelle] * anteil)
+
+    art = serie_artikel[serie]
+    werk = serie_werk[serie]
+    menge = ist.ravel()[zelle] * anteil
+    ord_start = int(code_zu_ordinal(np.array([start_monat]))[0])
+    ordinal = ord_start + pos
+    n = len(zelle)
+    bedarfswoche = ((pos % 12) * 52) // 12 + rng.integers(1, 5, n)
+
+    # Stammdaten pro Artikel / Werk (klein), per Index auf die Zeilen
+    werk_namen = _werk_namen(werke)
+    gruppe_namen = [f"MG{g:02d}" for g in range(gruppen)]
+    gruppe_code = np.where(rng.random(artikel) < OHNE_GRUPPE_ANTEIL, -1, gruppe_artikel)
+    gewicht_g = rng.lognormal(5.0, 1.0, artikel)
+    je_lt = rng.choice([10, 20, 50, 100, 200], artikel)
+    lt_typ = rng.integers(0, 3, artikel)
+    lt_masse = np.array([[600, 400, 280], [1200, 800, 975], [1200, 1000, 1500]])[lt_typ]
+    verbauquote = rng.uniform(0.5, 1.0, artikel)
+    lieferort = rng.integers(0, 3, werke)
+
+    erzeuger = {
+        "matnr": lambda: _kategorie([str(100000 + a) for a in range(artikel)], art),
+        "kundnr": lambda: _kategorie([str(700000 + w) for w in range(werke)], werk),
+        "vkbel": lambda: (4_000_000 + serie).astype(np.float64),
+        "kundabl": lambda: _kategorie([f"AS-{w}" for w in werk_namen], werk),
+        "werk": lambda: _kategorie(werk_namen, werk),
+        "modulgruppen": lambda: _kategorie(gruppe_namen, gruppe_code[art]),
+        "Baumarkt": lambda: _kategorie([f"Baumarkt {w}" for w in werk_namen], werk),
+        "Baumarktartikel": lambda: _kategorie([f"Artikel {a:06d}" for a in range(artikel)], art),
+        "cc_bez": lambda: _kategorie(["Nord", "Süd", "Ost"], lieferort[werk]),
+        "lft_land": lambda: _kategorie(["DE", "AT", "CH"], lieferort[werk]),
+        "lft_ort": lambda: _kategorie([f"Ort {w}" for w in werk_namen], werk),
+        "ltm_zin_lt_kategorie": lambda: _kategorie(["KLT", "GLT", "SLT"], lt_typ[art]),
+        "ltm_zout_lt_kategorie": lambda: _kategorie(["KLT", "GLT", "SLT"], lt_typ[art]),
+        "wavor_bme": lambda: _kategorie(["ST"], np.zeros(n)),
+        "bstlmgeh": lambda: _kategorie(["ST"], np.zeros(n)),
+        "geweh": lambda: _kategorie(["G"], np.zeros(n)),
+        "lt_1_me": lambda: _kategorie(["MM"], np.zeros(n)),
+        "lt_1_feh": lambda: _kategorie(["M2"], np.zeros(n)),
+        "lt_1_veh": lambda: _kategorie(["M3"], np.zeros(n)),
+        "bedkw": lambda: (ordinal // 12) * 100 + bedarfswoche,
+        "bedmo": lambda: ordinal_zu_code(ordinal),
+        "verskw": lambda: (ordinal // 12) * 100 + np.maximum(bedarfswoche - 1, 1),
+        "versmo": lambda: ordinal_zu_code(ordinal),
+        "progmo": lambda: ordinal_zu_code(ordinal + 12),
+        "progmo2": lambda: ordinal_zu_code(ordinal + 24),
+        "wavor_bstlmg": lambda: menge,
+        "wavor_anteilpromonat": lambda: anteil,
+        "wavor_bstlmengemonat": lambda: menge,
+        "wavor_bstlmgjahr": lambda: menge * 12,
+        "vbap_bstlmg": lambda: menge,
+        "bedmo_mg": lambda: np.round(menge * rng.uniform(0.9, 1.0, n), 3),
+        "prog_mg1": lambda: prognosen[0],
+        "prog_mg2": lambda: prognosen[1],
+        "prog_vol1": lambda: prognosen[0] * (lt_masse[art].prod(axis=1) / 1e9 / je_lt[art]),
+        "prog_vol2": lambda: prognosen[1] * (lt_masse[art].prod(axis=1) / 1e9 / je_lt[art]),
+        "vol_gesamt_lab_mg": lambda: menge * (lt_masse[art].prod(axis=1) / 1e9 / je_lt[art]),
+        "gew_bto": lambda: gewicht_g[art],
+        "gew_bto_kg": lambda: gewicht_g[art] / 1000,
+        "zin_lt_1_menge": lambda: je_lt[art].astype(float),
+        "lt_1_bruttogew_in_kg": lambda: gewicht_g[art] * je_lt[art] / 1000 + 2.0,
+        "lt_1_laenge": lambda: lt_masse[art, 0].astype(float),
+        "lt_1_breite": lambda: lt_masse[art, 1].astype(float),
+        "lt_1_hoehe": lambda: lt_masse[art, 2].astype(float),
+        "lt_1_flaeche": lambda: lt_masse[art, 0] * lt_masse[art, 1] / 1e6,
+        "lt_1_volumen": lambda: lt_masse[art].prod(axis=1) / 1e9,
+        "lt_1_menge_in_lt": lambda: menge / je_lt[art],
+        "diff_faktorjahr_wpp1": lambda: prognosen[0] / np.maximum(menge, 1e-9),
+        "diff_faktorjahr_wpp2": lambda: prognosen[1] / np.maximum(menge, 1e-9),
+        "ct_kapa": lambda: np.full(n, 1e6),
+        "ct_auslastung": lambda: rng.uniform(0.5, 1.0, werke)[werk],
+        "ct_volds": lambda: rng.uniform(1e4, 1e5, werke)[werk],
+        "verbauquote": lambda: verbauquote[art],
+    }
+    spalten = list(ROHDATEN_SCHEMA) if spalten is None else list(spalten)
+    unbekannt = [s for s in spalten if s not in erzeuger]
+    if unbekannt:
+        raise KeyError(f"Keine Erzeugung für Spalten {unbekannt}")
+
+    df = pd.DataFrame({s: erzeuger[s]() for s in spalten})
+    return wende_schema_an(df)
+
+
+def erzeuge_programmblatt(rohdaten, rauschen=PLAN_RAUSCHEN, seed=0):
+    """
+    Programmblatt im Layout von FAHRZEUGPROGRAMM/BAUMARKTPROGRAMM zu einem
+    synthetischen Auszug: pro Werk eine Zeile, pro Prognosejahr eine
+    Ergebnis-Spalte und JAN..DEZ (Menge in Tausend Stück, wie der Plan in
+    Schritt 3 erwartet). Basis ist die ERP-Prognose je Werk/Monat, mit
+    Zufallsfaktor wie im DEMO-PLAN von Schritt 3.1.
+
+    Returns:
+        pd.DataFrame (lesbar mit programmblatt.parse_programmblatt)
+    """
+    rng = np.random.default_rng(seed)
+    teile = [
+        pd.DataFrame(
+            {"Werk": rohdaten["werk"].astype(str), "Monat": rohdaten[monat], "Menge": rohdaten[menge]}
+        )
+        for monat, menge in (("progmo", "prog_mg1"), ("progmo2", "prog_mg2"))
+    ]
+    plan = pd.concat(teile).groupby(["Werk", "Monat"], observed=True)["Menge"].sum()
+    plan = plan * rng.uniform(*rauschen, len(plan)) / 1000
+    breit = plan.unstack("Monat", fill_value=0.0)
+
+    jahre = sorted({int(m) // 100 for m in breit.columns})
+    kopf = ["Unnamed: 0", "Unnamed: 1", "Gesamtergebnis"]
+    zeile0 = ["Werk", "Baureihe", np.nan]
+    bloecke = []
+    for jahr in jahre:
+        monate = [jahr * 100 + m for m in range(1, 13)]
+        block = breit.reindex(columns=monate, fill_value=0.0).to_numpy()
+        kopf += [str(jahr)] + [f"{jahr}.{m}" for m in range(1, 13)]
+        zeile0 += ["Ergebnis", "JAN", "FEB", "MAR", "APR", "MAI", "JUN",
+                   "JUL", "AUG", "SEP", "OKT", "NOV", "DEZ"]
+        bloecke.append(np.column_stack([block.sum(axis=1), block]))
+
+    werte = np.column_stack(bloecke) if bloecke else np.zeros((len(breit), 0))
+    daten = pd.DataFrame(werte.round(3), columns=kopf[3:])
+    daten.insert(0, "Gesamtergebnis", daten[[str(j) for j in jahre]].sum(axis=1))
+    daten.insert(0, "Unnamed: 1", "Ergebnis")
+    daten.insert(0, "Unnamed: 0", breit.index.to_numpy())
+    return pd.concat([pd.DataFrame([zeile0], columns=kopf), daten], ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetischen ERP-Auszug erzeugen")
+    parser.add_argument("--zeilen", type=int, default=ZEILEN)
+    parser.add_argument("--artikel", type=int, default=None)
+    parser.add_argument("--werke", type=int, default=WERKE)
+    parser.add_argument("--gruppen", type=int, default=GRUPPEN)
+    parser.add_argument("--monate", type=int, default=MONATE)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ausgabe", default="./output/synthetik")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    df = erzeuge_rohdaten(
+        args.zeilen, args.artikel, args.werke, args.gruppen, args.monate, seed=args.seed
+    )
+    print(
+        f"🧪 Synthetischer Auszug: {len(df):,} Zeilen, {df['matnr'].nunique()} Artikel, "
+        f"{df['werk'].nunique()} Werke, {speicher_mb(df).sum():,.1f} MB "
+        f"({time.perf_counter() - start:.2f}s)"
+    )
+    os.makedirs(args.ausgabe, exist_ok=True)
+    pfad = os.path.join(args.ausgabe, "rohdaten.parquet")
+    df.to_parquet(pfad, index=False)
+    programm = os.path.join(args.ausgabe, "programmblatt.xlsx")
+    erzeuge_programmblatt(df, seed=args.seed).to_excel(programm, index=False)
+    print(f"   💾 {pfad}, {programm}")
+
+
+if __name__ == "__main__":
+    main()
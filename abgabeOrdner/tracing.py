@@ -0,0 +1,304 @@
+import argparse
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+# --- KONFIGURATION ---
+# Ordner für die Trace-Dateien; leer = Tracing aus (kostet dann nur eine Abfrage)
+TRACE_DIR = os.environ.get("PROGNOSE_TRACE_DIR", "")
+# Python-Allokationen mitschneiden (Spitze pro Spanne). Kostet Laufzeit bei
+# vielen kleinen Objekten, numpy/pandas-Puffer werden trotzdem gezählt.
+TRACEMALLOC = os.environ.get("PROGNOSE_TRACEMALLOC", "1") != "0"
+
+
+class Spanne:
+    """
+    Ein gemessener Abschnitt. zeilen_ein / zeilen_aus können im with-Block
+    gesetzt werden, verfolgt() setzt sie aus Argumenten und Rückgabewert.
+
+        with spanne("Plan laden") as s:
+            df_plan = pd.read_excel(...)
+            s.zeilen_aus = len(df_plan)
+    """
+
+    __slots__ = (
+        "name",
+        "kategorie",
+        "attribute",
+        "zeilen_ein",
+        "zeilen_aus",
+        "_start",
+        "_cpu",
+        "_rss",
+        "_spitze",
+        "_traced",
+    )
+
+    def __init__(self, name, kategorie, attribute):
+        self.name = name
+        self.kategorie = kategorie
+        self.attribute = attribute
+        self.zeilen_ein = None
+        self.zeilen_aus = None
+        self._spitze = 0
+        self._traced = 0
+
+
+class _Protokoll:
+    """Gesammelte Ereignisse eines Laufs (Chrome-Trace-Format)."""
+
+    __slots__ = ("datei", "ereignisse", "offen", "t0", "tracemalloc", "_lock")
+
+    def __init__(self, datei, mit_tracemalloc):
+        self.datei = datei
+        self.ereignisse = []
+        self.offen = []
+        self.t0 = time.perf_counter()
+        self.tracemalloc = mit_tracemalloc
+        self._lock = threading.Lock()
+
+
+_PROTOKOLL = None
+
+
+def _rss_mb():
+    """Aktueller Arbeitsspeicher des Prozesses (Linux: /proc), sonst None."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024**2
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _max_rss_mb():
+    """Höchster Arbeitsspeicher seit Prozessstart (ru_maxrss), sonst None."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KiB, macOS: Byte
+    return maxrss / 1024**2 if sys.platform == "darwin" else maxrss / 1024
+
+
+def aktiviere(trace_dir=TRACE_DIR, name=None, mit_tracemalloc=TRACEMALLOC):
+    """
+    Schaltet das Tracing für diesen Prozess ein. Beim Beenden wird
+    <trace_dir>/trace_<name>_<Zeitstempel>.json geschrieben (ladbar in
+    chrome://tracing oder ui.perfetto.dev). Ohne trace_dir passiert nichts.
+
+    Returns:
+        Pfad der Trace-Datei oder None
+    """
+    global _PROTOKOLL
+    if not trace_dir:
+        return None
+    if _PROTOKOLL is not None:
+        return _PROTOKOLL.datei
+    name = name or os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0]
+    zeit = time.strftime("%Y%m%d-%H%M%S")
+    datei = os.path.join(trace_dir, f"trace_{name}_{zeit}_{os.getpid()}.json")
+    if mit_tracemalloc and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _PROTOKOLL = _Protokoll(datei, mit_tracemalloc)
+    atexit.register(schreibe_trace)
+    return datei
+
+
+def aktiv():
+    return _PROTOKOLL is not None
+
+
+def _zeilen(wert):
+    """Zeilenzahl eines Ergebnisses: DataFrame/Series/Array, Tupel -> Summe."""
+    if isinstance(wert, (pd.DataFrame, pd.Series)):
+        return len(wert)
+    if isinstance(wert, (tuple, list)):
+        teile = [_zeilen(w) for w in wert]
+        teile = [t for t in teile if t is not None]
+        return sum(teile) if teile else None
+    if hasattr(wert, "shape") and getattr(wert, "ndim", 0) >= 1:
+        return int(wert.shape[0])
+    return None
+
+
+@contextmanager
+def spanne(name, kategorie="stufe", **attribute):
+    """
+    Misst Wandzeit, CPU-Zeit, Arbeitsspeicher (RSS) und die
+    tracemalloc-Spitze eines Abschnitts. Verschachtelte Spannen sind
+    erlaubt; die Spitze der äußeren enthält die der inneren.
+    Ohne aktiviere() liefert der Block nur eine leere Spanne.
+    """
+    s = Spanne(name, kategorie, attribute)
+    protokoll = _PROTOKOLL
+    if protokoll is None:
+        yield s
+        return
+
+    if protokoll.tracemalloc and tracemalloc.is_tracing():
+        # Bisherige Spitze an die offene äußere Spanne weitergeben, dann
+        # zurücksetzen, damit diese Spanne nur ihre eigene Spitze sieht
+        if protokoll.offen:
+            aussen = protokoll.offen[-1]
+            aussen._spitze = max(aussen._spitze, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        s._traced = tracemalloc.get_traced_memory()[0]
+    protokoll.offen.append(s)
+    s._rss = _rss_mb()
+    s._cpu = time.process_time()
+    s._start = time.perf_counter()
+    try:
+        yield s
+    finally:
+        ende = time.perf_counter()
+        cpu = time.process_time() - s._cpu
+        protokoll.offen.pop()
+        args = {"cpu_s": round(cpu, 4)}
+        if protokoll.tracemalloc and tracemalloc.is_tracing():
+            spitze = max(s._spitze, tracemalloc.get_traced_memory()[1])
+            args["tracemalloc_spitze_mb"] = round(spitze / 1024**2, 2)
+            # Zuwachs über den Stand beim Start = was der Abschnitt selbst braucht
+            args["tracemalloc_zuwachs_mb"] = round((spitze - s._traced) / 1024**2, 2)
+            if protokoll.offen:
+                aussen = protokoll.offen[-1]
+                aussen._spitze = max(aussen._spitze, spitze)
+        rss = _rss_mb()
+        if rss is not None and s._rss is not None:
+            args["rss_mb"] = round(rss, 1)
+            args["rss_delta_mb"] = round(rss - s._rss, 1)
+        max_rss = _max_rss_mb()
+        if max_rss is not None:
+            args["max_rss_mb"] = round(max_rss, 1)
+        if s.zeilen_ein is not None:
+            args["zeilen_ein"] = int(s.zeilen_ein)
+        if s.zeilen_aus is not None:
+            args["zeilen_aus"] = int(s.zeilen_aus)
+        args.update({k: v if isinstance(v, (int, float, bool)) else str(v) for k, v in s.attribute.items()})
+
+        ereignis = {
+            "name": name,
+            "cat": kategorie,
+            "ph": "X",
+            "ts": round((s._start - protokoll.t0) * 1e6, 1),
+            "dur": round((ende - s._start) * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        with protokoll._lock:
+            protokoll.ereignisse.append(ereignis)
+
+
+def verfolgt(funktion=None, *, name=None, kategorie="stufe"):
+    """
+    Dekorator: jede Ausführung der Funktion wird zu einer Spanne. Zeilen
+    ein = Länge des ersten DataFrame-Arguments, Zeilen aus = Länge des
+    Rückgabewerts (bei Tupeln die Summe).
+
+        @verfolgt
+        def agg_Rohdaten(data): ...
+    """
+    if funktion is None:
+        return functools.partial(verfolgt, name=name, kategorie=kategorie)
+
+    if name is None:
+        datei = getattr(sys.modules.get(funktion.__module__), "__file__", None) or funktion.__module__
+        name = f"{os.path.splitext(os.path.basename(datei))[0]}.{funktion.__qualname__}"
+
+    @functools.wraps(funktion)
+    def wrapper(*args, **kwargs):
+        if _PROTOKOLL is None:
+            return funktion(*args, **kwargs)
+        with spanne(name, kategorie) as s:
+            eingang = next(
+                (a for a in (*args, *kwargs.values()) if isinstance(a, (pd.DataFrame, pd.Series))),
+                None,
+            )
+            if eingang is not None:
+                s.zeilen_ein = len(eingang)
+            ergebnis = funktion(*args, **kwargs)
+            s.zeilen_aus = _zeilen(ergebnis)
+            return ergebnis
+
+    return wrapper
+
+
+def schreibe_trace():
+    """Schreibt die bisher gesammelten Spannen atomar in die Trace-Datei."""
+    protokoll = _PROTOKOLL
+    if protokoll is None or not protokoll.ereignisse:
+        return None
+    with protokoll._lock:
+        ereignisse = sorted(protokoll.ereignisse, key=lambda e: e["ts"])
+    prozess = {
+        "name": "process_name",
+        "ph": "M",
+        "pid": os.getpid(),
+        "args": {"name": os.path.basename(sys.argv[0] or "python")},
+    }
+    inhalt = {
+        "traceEvents": [prozess, *ereignisse],
+        "displayTimeUnit": "ms",
+        "otherData": {
+            "argv": sys.argv,
+            "start": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "tracemalloc": protokoll.tracemalloc,
+        },
+    }
+    os.makedirs(os.path.dirname(protokoll.datei) or ".", exist_ok=True)
+    tmp = f"{protokoll.datei}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(inhalt, f, ensure_ascii=False)
+    os.replace(tmp, protokoll.datei)
+    print(f"   🧭 Trace gespeichert: {protokoll.datei} ({len(ereignisse)} Spannen)")
+    return protokoll.datei
+
+
+def beende():
+    """
+    Schreibt den Trace und schaltet das Tracing ab (z.B. am Ende eines
+    Worker-Prozesses, dort laufen keine atexit-Handler).
+
+    Returns:
+        Pfad der Trace-Datei oder None
+    """
+    global _PROTOKOLL
+    datei = schreibe_trace()
+    _PROTOKOLL = None
+    return datei
+
+
+def zusammenfassung(pfad):
+    """
+    Liest eine Trace-Datei als Tabelle (eine Zeile pro Spanne), z.B. um
+    nächtliche Läufe zu vergleichen.
+
+    Returns:
+        pd.DataFrame: name, kategorie, start_s, dauer_s und die Messwerte
+    """
+    with open(pfad, encoding="utf-8") as f:
+        ereignisse = [e for e in json.load(f)["traceEvents"] if e.get("ph") == "X"]
+    df = pd.DataFrame(
+        {
+            "name": [e["name"] for e in ereignisse],
+            "kategorie": [e.get("cat") for e in ereignisse],
+            "start_s": [e["ts"] / 1e6 for e in ereignisse],
+            "dauer_s": [e["dur"] / 1e6 for e in ereignisse],
+        }
+    )
+    return pd.concat([df, pd.DataFrame([e.get("args", {}) for e in ereignisse])], axis=1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trace-Datei als Tabelle ausgeben")
+    parser.add_argument("datei")
+    print(zusammenfassung(parser.parse_args().datei).to_string(index=False))
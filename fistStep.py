@@ -1,9 +1,5 @@
 import pandas as pd
 
-# 1️⃣ Datei einlesen
-datei = "1Rohdaten.xlsx"  # ggf. anpassen
-df = pd.read_excel(datei)
-
 # 2️⃣ Relevante Spalten für Volumenplanung (inkl. Baumarktartikel)
 relevante_spalten = [
     "Baumarktartikel",   # Produktname / Materialname
@@ -25,10 +21,6 @@ relevante_spalten = [
     "vol_gesamt_lab_mg"  # Volumen gesamt
 ]
 
-# 3️⃣ Nur vorhandene Spalten übernehmen
-vorhandene_spalten = [s for s in relevante_spalten if s in df.columns]
-df_relevant = df[vorhandene_spalten]
-
 # 4️⃣ Verständliche Spaltennamen vergeben
 neue_namen = {
     "Baumarktartikel": "Produktname",
@@ -50,9 +42,23 @@ neue_namen = {
     "vol_gesamt_lab_mg": "Volumen gesamt"
 }
 
-df_relevant = df_relevant.rename(columns=neue_namen)
 
-# 5️⃣ Neue Datei speichern
-df_relevant.to_excel("Rohdaten_nurVolumenplanung.xlsx", index=False)
+def volumenplanung(df):
+    """Nur die Spalten für die Volumenplanung behalten und verständlich benennen."""
+    # 3️⃣ Nur vorhandene Spalten übernehmen
+    vorhandene_spalten = [s for s in relevante_spalten if s in df.columns]
+    df_relevant = df[vorhandene_spalten]
+    return df_relevant.rename(columns=neue_namen)
+
+
+if __name__ == "__main__":
+    # 1️⃣ Datei einlesen
+    datei = "1Rohdaten.xlsx"  # ggf. anpassen
+    df = pd.read_excel(datei)
+
+    df_relevant = volumenplanung(df)
+
+    # 5️⃣ Neue Datei speichern
+    df_relevant.to_excel("Rohdaten_nurVolumenplanung.xlsx", index=False)
 
-print("✅ Fertig! Die Datei 'Rohdaten_nurVolumenplanung.xlsx' enthält nun auch die Spalte 'Produktname' und alle wichtigen Felder.")
+    print("✅ Fertig! Die Datei 'Rohdaten_nurVolumenplanung.xlsx' enthält nun auch die Spalte 'Produktname' und alle wichtigen Felder.")
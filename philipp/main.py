@@ -2,6 +2,13 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+import sys
+
+# Gemeinsame Module liegen im abgabeOrdner
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "abgabeOrdner")
+)
+from gruppierung import AGG_MENGEN, aggregiere_gruppen
 
 
 def load_data():
@@ -21,33 +28,11 @@ def sort_data(data):
     alle_matnr = data["matnr"].unique()
     print(f"Verarbeite {len(alle_matnr)} verschiedene Materialnummern...")
 
-    # Liste für alle Ergebnisse
-    alle_ergebnisse = []
-
-    for matnr in alle_matnr:
-        # Filter für spezifische Materialnummer
-        df_filtered = data[data["matnr"] == matnr].copy()
-
-        # Gruppierung und Summierung der wavor_bstlmg pro matnr, Baumarkt, Monat
-        result = (
-            df_filtered.groupby(["matnr", "Baumarkt", "bedmo"])
-            .agg(
-                {
-                    "wavor_bstlmg": "sum",
-                    "progmo": "first",
-                    "prog_mg1": "sum",
-                    "progmo2": "first",
-                    "prog_mg2": "sum",
-                }
-            )
-            .reset_index()
-        )
-
-        # Zu Gesamtergebnis hinzufügen
-        alle_ergebnisse.append(result)
-
-    # Alle Ergebnisse zusammenfügen
-    gesamt_result = pd.concat(alle_ergebnisse, ignore_index=True)
+    # Gruppierung und Summierung der wavor_bstlmg pro matnr, Baumarkt, Monat
+    # in einem Durchlauf (Reihenfolge wie früher: Blöcke je matnr)
+    gesamt_result = aggregiere_gruppen(
+        data, ["matnr", "Baumarkt", "bedmo"], AGG_MENGEN, block_nach="matnr"
+    )
 
     # Excel Export
     os.makedirs("./output", exist_ok=True)
@@ -63,33 +48,11 @@ def sum_art_monthly_by_baumarkt(data):
     alle_matnr = data["bedmo"].unique()
     print(f"Verarbeite {len(alle_matnr)} verschiedene Materialnummern...")
 
-    # Liste für alle Ergebnisse
-    alle_ergebnisse = []
-
-    for matnr in alle_matnr:
-        # Filter für spezifische Baumarkt
-        df_filtered = data[data["bedmo"] == matnr].copy()
-
-        # Gruppierung und Summierung der wavor_bstlmg pro matnr, Baumarkt, Monat
-        result = (
-            df_filtered.groupby(["Baumarkt", "bedmo"])
-            .agg(
-                {
-                    "wavor_bstlmg": "sum",
-                    "progmo": "first",
-                    "prog_mg1": "sum",
-                    "progmo2": "first",
-                    "prog_mg2": "sum",
-                }
-            )
-            .reset_index()
-        )
-
-        # Zu Gesamtergebnis hinzufügen
-        alle_ergebnisse.append(result)
-
-    # Alle Ergebnisse zusammenfügen
-    gesamt_result = pd.concat(alle_ergebnisse, ignore_index=True)
+    # Gruppierung und Summierung pro Baumarkt, Monat in einem Durchlauf
+    # (Reihenfolge wie früher: Blöcke je bedmo)
+    gesamt_result = aggregiere_gruppen(
+        data, ["Baumarkt", "bedmo"], AGG_MENGEN, block_nach="bedmo"
+    )
 
     # Excel Export
     os.makedirs("./output", exist_ok=True)
@@ -105,33 +68,11 @@ def sort_BaumartArtikel(data):
     alle_baumärkte = data["Baumarktartikel"].unique()
     print(f"Verarbeite {len(alle_baumärkte)} verschiedene Baumarktartikel...")
 
-    # Liste für alle Ergebnisse
-    alle_ergebnisse = []
-
-    for baumarkt in alle_baumärkte:
-        # Filter für spezifische Baumarkt
-        df_filtered = data[data["Baumarktartikel"] == baumarkt].copy()
-
-        # Gruppierung und Summierung der wavor_bstlmg pro Baumarkt, Artikel
-        result = (
-            df_filtered.groupby(["Baumarktartikel", "bedmo"])
-            .agg(
-                {
-                    "wavor_bstlmg": "sum",
-                    "progmo": "first",
-                    "prog_mg1": "sum",
-                    "progmo2": "first",
-                    "prog_mg2": "sum",
-                }
-            )
-            .reset_index()
-        )
-
-        # Zu Gesamtergebnis hinzufügen
-        alle_ergebnisse.append(result)
-
-    # Alle Ergebnisse zusammenfügen
-    gesamt_result = pd.concat(alle_ergebnisse, ignore_index=True)
+    # Gruppierung und Summierung der wavor_bstlmg pro Baumarkt, Artikel
+    # in einem Durchlauf (Reihenfolge wie früher: Blöcke je Baumarktartikel)
+    gesamt_result = aggregiere_gruppen(
+        data, ["Baumarktartikel", "bedmo"], AGG_MENGEN, block_nach="Baumarktartikel"
+    )
     gesamt_result.to_excel("./output/sorted_Baumarktartikel_bestellungen.xlsx", index=False)
 
     return gesamt_result
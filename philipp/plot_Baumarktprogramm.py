@@ -2,6 +2,18 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 import os
+import sys
+
+# Gemeinsame Module liegen im abgabeOrdner
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "abgabeOrdner")
+)
+from diagramme import Diagramm, rendere_diagramme, rendere_pdf, seiten, seiten_name
+from programmblatt import parse_programmblatt
+
+# --- KONFIGURATION ---
+# Baumarktvergleich: höchstens so viele Zeilen (à 3 Baumärkte) pro Seite
+ZEILEN_PRO_SEITE = 4
 
 
 def load_baumarktprogramm():
@@ -23,16 +35,13 @@ def load_baumarktprogramm():
 
 def extract_data_for_plotting(df):
     """
-    Extrahiert und strukturiert die Daten für das Plotting
-    Spaltenaufteilung:
-    - 2025: E-P (Spalten 4-15)
-    - 2026: R-AC (Spalten 17-28)
-    - 2027: AE-AP (Spalten 30-41)
-    - 2028: AR-BC (Spalten 43-54)
-    """
-    # Annahme: Erste Spalte enthält Baumarkt-Namen
-    baumärkte = df.iloc[:, 0].dropna().unique()
+    Extrahiert und strukturiert die Daten für das Plotting.
+    Die Jahresblöcke werden aus dem Tabellenkopf erkannt (siehe
+    abgabeOrdner/programmblatt.py), es gibt keine festen Spaltenbereiche mehr.
 
+    Returns:
+        dict {Baumarkt: {Jahr: [12 Monatswerte]}}, Monatsnamen
+    """
     # Monatsnamen für Labels
     monate = [
         "Jan",
@@ -49,157 +58,68 @@ def extract_data_for_plotting(df):
         "Dez",
     ]
 
-    # Spalten-Mapping (Excel-Spalten zu Index)
-    # A=0, B=1, C=2, D=3, E=4, F=5, ..., P=15, Q=16, R=17, ..., AC=28, AD=29, AE=30, ..., AP=41, AQ=42, AR=43, ..., BC=54
-    spalten_mapping = {
-        "2025": list(range(4, 16)),  # E bis P (Spalten 4-15)
-        "2026": list(range(17, 29)),  # R bis AC (Spalten 17-28)
-        "2027": list(range(30, 42)),  # AE bis AP (Spalten 30-41)
-        "2028": list(range(43, 55)),  # AR bis BC (Spalten 43-54)
-    }
-
-    print("Spalten-Mapping:")
-    for jahr, spalten in spalten_mapping.items():
-        print(
-            f"  {jahr}: Spalten {spalten[0]}-{spalten[-1]} ({chr(65+spalten[0])}-{chr(65+spalten[-1]) if spalten[-1] < 26 else 'A' + chr(65+spalten[-1]-26)})"
-        )
+    lang = parse_programmblatt(df, key_name="Baumarkt")
+    if lang.empty:
+        return {}, monate
 
-    # Dictionary für strukturierte Daten
-    plot_data = {}
+    lang["Jahr"] = (lang["Monat"] // 100).astype(str)
+    jahre = sorted(lang["Jahr"].unique())
+    print(f"Erkannte Jahre: {', '.join(jahre)}")
 
-    for baumarkt in baumärkte:
-        if pd.isna(baumarkt) or baumarkt == "":
-            continue
-
-        baumarkt_str = str(baumarkt)
-        print(f"Verarbeite Baumarkt: {baumarkt_str}")
-
-        # Filter für aktuellen Baumarkt
-        baumarkt_rows = df[df.iloc[:, 0] == baumarkt]
-
-        if len(baumarkt_rows) == 0:
-            continue
-
-        # Daten für 2025, 2026, 2027, 2028 extrahieren
-        jahre_data = {}
-
-        for jahr, spalten_indices in spalten_mapping.items():
-            jahr_daten = []
-
-            for spalte_idx in spalten_indices:
-                try:
-                    if spalte_idx < len(df.columns):
-                        wert = (
-                            baumarkt_rows.iloc[0, spalte_idx]
-                            if len(baumarkt_rows) > 0
-                            else 0
-                        )
-                        jahr_daten.append(float(wert) if pd.notna(wert) else 0)
-                    else:
-                        jahr_daten.append(0)
-                except:
-                    jahr_daten.append(0)
-
-            # Sicherstellen, dass genau 12 Monate vorhanden sind
-            while len(jahr_daten) < 12:
-                jahr_daten.append(0)
-            jahre_data[jahr] = jahr_daten[:12]
-
-        plot_data[baumarkt_str] = jahre_data
-
-        # Debug: Zeige erste paar Werte
-        print(f"  Beispieldaten für {baumarkt_str}:")
-        for jahr in ["2025", "2026", "2027", "2028"]:
-            summe = sum(jahre_data[jahr])
-            print(
-                f"    {jahr}: Summe = {summe:.2f}, erste 3 Monate = {jahre_data[jahr][:3]}"
-            )
+    # Eine Zeile pro Baumarkt, 12 Monate je Jahr nebeneinander
+    breit = lang.pivot_table(
+        index="Baumarkt", columns="Monat", values="Zahl", aggfunc="sum", fill_value=0
+    )
+    plot_data = {}
+    for baumarkt, werte in zip(breit.index, breit.to_numpy()):
+        plot_data[str(baumarkt)] = {
+            jahr: werte[i * 12 : (i + 1) * 12].tolist() for i, jahr in enumerate(jahre)
+        }
 
     return plot_data, monate
 
 
-def plot_baumarkt_vergleich(plot_data, monate):
+def zeichne_baumarkt_seite(fig, seite_daten, jahre, monate, rows, cols, titel_zusatz=""):
     """
-    Erstellt Liniendiagramme für jeden Baumarkt mit durchgehender Zeitlinie
+    Eine Seite des Baumarktvergleichs: rows x cols Liniendiagramme mit
+    durchgehender Zeitlinie (nicht belegte Felder werden ausgeblendet)
     """
-    if not plot_data:
-        print("❌ Keine Daten zum Plotten verfügbar")
-        return
+    zeitraum = f"{jahre[0]}-{jahre[-1]}"
 
-    # Anzahl Baumärkte
-    n_baumärkte = len(plot_data)
-
-    # Layout berechnen
-    cols = 3  # 3 Spalten
-    rows = (n_baumärkte + cols - 1) // cols
-
-    # Figure erstellen
-    fig, axes = plt.subplots(rows, cols, figsize=(18, 6 * rows))
+    axes = fig.subplots(rows, cols, squeeze=False)
     fig.suptitle(
-        "Baumarktprogramm - Zeitverlauf 2025-2028\n(Liniendiagramme)",
+        f"Baumarktprogramm - Zeitverlauf {zeitraum}\n(Liniendiagramme){titel_zusatz}",
         fontsize=16,
         fontweight="bold",
     )
 
-    # Wenn nur eine Zeile oder Spalte, axes zu Liste machen
-    if rows == 1 and cols == 1:
-        axes = [axes]
-    elif rows == 1:
-        axes = [axes]
-    elif cols == 1:
-        axes = [[ax] for ax in axes]
-
-    # Farben für die Jahre
-    farben = {
-        "2025": "#1f77b4",  # Blau
-        "2026": "#ff7f0e",  # Orange
-        "2027": "#2ca02c",  # Grün
-        "2028": "#d62728",  # Rot
-    }
-
-    # Durchgehende X-Achse: 48 Monate (4 Jahre × 12 Monate)
-    x_gesamt = list(range(48))  # 0 bis 47
+    # Farben für die Jahre (C0 Blau, C1 Orange, C2 Grün, C3 Rot, ...)
+    farben = {jahr: f"C{i % 10}" for i, jahr in enumerate(jahre)}
 
     # Labels für X-Achse (alle 6 Monate)
     x_labels = []
     x_ticks = []
-    for jahr_idx, jahr in enumerate(["2025", "2026", "2027", "2028"]):
+    for jahr_idx, jahr in enumerate(jahre):
         for monat_idx, monat in enumerate(monate):
             x_pos = jahr_idx * 12 + monat_idx
             if monat_idx % 6 == 0:  # Alle 6 Monate ein Label
                 x_labels.append(f"{monat} {jahr}")
                 x_ticks.append(x_pos)
 
-    baumarkt_names = list(plot_data.keys())
-
-    for i, baumarkt in enumerate(baumarkt_names):
-        row = i // cols
-        col = i % cols
-
-        # Aktueller Subplot
-        if rows == 1 and cols == 1:
-            ax = axes
-        elif rows == 1:
-            ax = axes[col]
-        elif cols == 1:
-            ax = axes[row]
-        else:
-            ax = axes[row][col]
-
-        # Daten für aktuellen Baumarkt
-        daten = plot_data[baumarkt]
+    for i, (baumarkt, daten) in enumerate(seite_daten.items()):
+        ax = axes[i // cols][i % cols]
 
-        # Durchgehende Datenliste erstellen (alle 4 Jahre hintereinander)
+        # Durchgehende Datenliste erstellen (alle Jahre hintereinander)
         y_werte = []
         x_werte = []
 
-        for jahr_idx, jahr in enumerate(["2025", "2026", "2027", "2028"]):
+        for jahr_idx, jahr in enumerate(jahre):
             for monat_idx in range(12):
                 x_pos = jahr_idx * 12 + monat_idx
                 x_werte.append(x_pos)
                 y_werte.append(daten[jahr][monat_idx])
 
-        # Hauptlinie plotten
+        # Hauptlinie plotten (Datenlinien gerastert, Text bleibt in der PDF Vektor)
         ax.plot(
             x_werte,
             y_werte,
@@ -208,10 +128,11 @@ def plot_baumarkt_vergleich(plot_data, monate):
             markersize=4,
             color="#1f77b4",
             label="Zeitverlauf",
+            rasterized=True,
         )
 
         # Optionale Jahres-Markierungen (verschiedene Farben für Segmente)
-        for jahr_idx, jahr in enumerate(["2025", "2026", "2027", "2028"]):
+        for jahr_idx, jahr in enumerate(jahre):
             start_idx = jahr_idx * 12
             end_idx = (jahr_idx + 1) * 12
             ax.plot(
@@ -221,11 +142,12 @@ def plot_baumarkt_vergleich(plot_data, monate):
                 alpha=0.7,
                 color=farben[jahr],
                 label=jahr,
+                rasterized=True,
             )
 
         # Plot formatieren
         ax.set_title(f"{baumarkt}", fontsize=14, fontweight="bold")
-        ax.set_xlabel("Zeit (2025-2028)")
+        ax.set_xlabel(f"Zeit ({zeitraum})")
         ax.set_ylabel("Werte")
         ax.legend()
         ax.grid(True, alpha=0.3)
@@ -238,28 +160,58 @@ def plot_baumarkt_vergleich(plot_data, monate):
         ax.set_ylim(bottom=0)
 
     # Leere Subplots ausblenden
-    for i in range(n_baumärkte, rows * cols):
-        row = i // cols
-        col = i % cols
-        if rows == 1:
-            axes[col].set_visible(False)
-        elif cols == 1:
-            axes[row].set_visible(False)
-        else:
-            axes[row][col].set_visible(False)
+    for i in range(len(seite_daten), rows * cols):
+        axes[i // cols][i % cols].set_visible(False)
 
-    plt.tight_layout()
+    fig.tight_layout()
 
-    # Plot speichern
-    os.makedirs("./output/images", exist_ok=True)
-    plt.savefig(
-        "./output/images/baumarktprogramm_jahresvergleich.png",
-        dpi=300,
-        bbox_inches="tight",
-    )
-    print("✅ Plot gespeichert: ./output/images/baumarktprogramm_jahresvergleich.png")
 
-    plt.show()
+def plot_baumarkt_vergleich(plot_data, monate, out_dir="./output/images"):
+    """
+    Erstellt Liniendiagramme für jeden Baumarkt mit durchgehender Zeitlinie.
+    Bei vielen Baumärkten auf Seiten fester Größe verteilt (je Seite ein PNG
+    und alle Seiten zusammen als PDF), nur geänderte Seiten werden neu gezeichnet.
+    """
+    if not plot_data:
+        print("❌ Keine Daten zum Plotten verfügbar")
+        return
+
+    # Erkannte Jahre
+    jahre = sorted(next(iter(plot_data.values())))
+
+    # Layout berechnen: alle Seiten gleich groß
+    cols = 3  # 3 Spalten
+    n_baumärkte = len(plot_data)
+    rows = min((n_baumärkte + cols - 1) // cols, ZEILEN_PRO_SEITE)
+
+    baumarkt_names = list(plot_data.keys())
+    teile = seiten(n_baumärkte, rows * cols)
+    diagramme = []
+    for i, teil in enumerate(teile):
+        titel_zusatz = f" - Seite {i + 1}/{len(teile)}" if len(teile) > 1 else ""
+        diagramme.append(
+            Diagramm(
+                seiten_name("baumarktprogramm_jahresvergleich.png", i, len(teile)),
+                zeichne_baumarkt_seite,
+                {
+                    "seite_daten": {b: plot_data[b] for b in baumarkt_names[teil]},
+                    "jahre": jahre,
+                    "monate": monate,
+                    "rows": rows,
+                    "cols": cols,
+                    "titel_zusatz": titel_zusatz,
+                },
+                figsize=(18, 6 * rows),
+                dpi=300,
+                bbox_inches="tight",
+            )
+        )
+
+    # Plot speichern
+    rendere_diagramme(diagramme, out_dir)
+    if len(diagramme) > 1:
+        rendere_pdf(diagramme, os.path.join(out_dir, "baumarktprogramm_jahresvergleich.pdf"))
+    print(f"✅ Plot gespeichert: {out_dir}/{diagramme[0].datei}")
 
 
 def plot_gesamt_übersicht(plot_data, monate):
@@ -272,22 +224,19 @@ def plot_gesamt_übersicht(plot_data, monate):
     plt.figure(figsize=(15, 10))
 
     # Farben für die Jahre
-    farben = {
-        "2025": "#1f77b4",
-        "2026": "#ff7f0e",
-        "2027": "#2ca02c",
-        "2028": "#d62728",
-    }
+    jahre = sorted(next(iter(plot_data.values())))
+    farben = {jahr: f"C{i % 10}" for i, jahr in enumerate(jahre)}
+    n_jahre = len(jahre)
 
     # X-Positionen
     x = np.arange(len(monate))
     n_baumärkte = len(plot_data)
-    width = 0.8 / (n_baumärkte * 4)  # Breite angepasst an Anzahl Baumärkte (4 Jahre)
+    width = 0.8 / (n_baumärkte * n_jahre)  # Breite angepasst an Anzahl Baumärkte und Jahre
 
     # Für jeden Baumarkt und jedes Jahr
     for i, (baumarkt, daten) in enumerate(plot_data.items()):
-        for j, jahr in enumerate(["2025", "2026", "2027", "2028"]):
-            offset = (i * 4 + j - (n_baumärkte * 4 - 1) / 2) * width
+        for j, jahr in enumerate(jahre):
+            offset = (i * n_jahre + j - (n_baumärkte * n_jahre - 1) / 2) * width
             plt.bar(
                 x + offset,
                 daten[jahr],
@@ -298,7 +247,7 @@ def plot_gesamt_übersicht(plot_data, monate):
             )
 
     plt.title(
-        "Baumarktprogramm - Gesamtübersicht\n(Alle Baumärkte und Jahre 2025-2028)",
+        f"Baumarktprogramm - Gesamtübersicht\n(Alle Baumärkte und Jahre {jahre[0]}-{jahre[-1]})",
         fontsize=16,
         fontweight="bold",
     )
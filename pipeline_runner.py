@@ -0,0 +1,85 @@
+import argparse
+import time
+
+import pandas as pd
+
+from fistStep import volumenplanung
+from secondStep import fehlende_werte
+from thirdStep import ohne_leere_produktnamen
+from fourthStep import artikel_liefermengen
+
+# Artefakte, die auf Wunsch als Excel geschrieben werden (Name -> Datei)
+ARTEFAKTE = {
+    "volumenplanung": "2Rohdaten_nurVolumenplanung.xlsx",
+    "fehlende_werte": "FehlendeWerte.xlsx",
+    "bereinigt": "3Rohdaten_ohneLeereProduktnamen.xlsx",
+    "top_artikel": "4Artikel_Liefermengen_sortiert.xlsx",
+}
+
+
+def run_pipeline(df):
+    """
+    Führt Schritt 1-4 im Speicher hintereinander aus, ohne Excel-Zwischendateien.
+
+    Returns:
+        dict: Ergebnisse pro Artefakt, dict: Laufzeit pro Schritt in Sekunden
+    """
+    ergebnisse = {}
+    laufzeiten = {}
+
+    start = time.perf_counter()
+    ergebnisse["volumenplanung"] = volumenplanung(df)
+    laufzeiten["1 Projektion"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ergebnisse["fehlende_werte"] = fehlende_werte(ergebnisse["volumenplanung"])
+    laufzeiten["2 Fehlende Werte"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ergebnisse["bereinigt"] = ohne_leere_produktnamen(ergebnisse["volumenplanung"])
+    laufzeiten["3 Dropna"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ergebnisse["top_artikel"] = artikel_liefermengen(ergebnisse["bereinigt"])
+    laufzeiten["4 Top-Artikel"] = time.perf_counter() - start
+
+    return ergebnisse, laufzeiten
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Schritt 1-4 im Speicher ausführen")
+    parser.add_argument("datei", nargs="?", default="1Rohdaten.xlsx")
+    parser.add_argument(
+        "--export",
+        nargs="*",
+        default=["top_artikel"],
+        choices=list(ARTEFAKTE),
+        help="Welche Ergebnisse als Excel gespeichert werden",
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    df = pd.read_excel(args.datei)
+    einlesen = time.perf_counter() - start
+
+    ergebnisse, laufzeiten = run_pipeline(df)
+
+    print("🧩 Fehlende Werte pro Spalte:\n")
+    print(ergebnisse["fehlende_werte"])
+
+    start = time.perf_counter()
+    for name in args.export:
+        ergebnis = ergebnisse[name]
+        ergebnis.to_excel(ARTEFAKTE[name], index=name == "fehlende_werte")
+        print(f"✅ Datei '{ARTEFAKTE[name]}' wurde erstellt!")
+    schreiben = time.perf_counter() - start
+
+    print("\n⏱️  Laufzeiten:")
+    print(f"   {'Einlesen':<20} {einlesen:8.3f}s")
+    for schritt, sekunden in laufzeiten.items():
+        print(f"   {schritt:<20} {sekunden:8.3f}s")
+    print(f"   {'Excel-Export':<20} {schreiben:8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
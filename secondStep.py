@@ -1,11 +1,18 @@
 import pandas as pd
 
-# 1️⃣ Datei laden
-df = pd.read_excel("2Rohdaten_nurVolumenplanung.xlsx")
 
-# 2️⃣ Fehlende Werte zählen
-fehlende_werte = df.isna().sum()
+def fehlende_werte(df):
+    """Zählt die fehlenden Werte pro Spalte."""
+    return df.isna().sum()
 
-# 3️⃣ Ausgabe im Terminal schön anzeigen
-print("🧩 Fehlende Werte pro Spalte:\n")
-print(fehlende_werte)
+
+if __name__ == "__main__":
+    # 1️⃣ Datei laden
+    df = pd.read_excel("2Rohdaten_nurVolumenplanung.xlsx")
+
+    # 2️⃣ Fehlende Werte zählen
+    fehlende = fehlende_werte(df)
+
+    # 3️⃣ Ausgabe im Terminal schön anzeigen
+    print("🧩 Fehlende Werte pro Spalte:\n")
+    print(fehlende)
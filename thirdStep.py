@@ -1,13 +1,19 @@
 import pandas as pd
 
-# Datei laden
-df = pd.read_excel("2Rohdaten_nurVolumenplanung.xlsx")
 
-# Zeilen löschen, wo der Produktname fehlt
-df = df.dropna(subset=["Produktname"])
+def ohne_leere_produktnamen(df):
+    """Zeilen löschen, wo der Produktname fehlt."""
+    return df.dropna(subset=["Produktname"])
 
-# Ergebnis speichern
-df.to_excel("3Rohdaten_ohneLeereProduktnamen.xlsx", index=False)
 
-print("✅ Fertig! Alle Zeilen ohne Produktname wurden gelöscht.")
-print("Neue Größe der Tabelle:", df.shape)
+if __name__ == "__main__":
+    # Datei laden
+    df = pd.read_excel("2Rohdaten_nurVolumenplanung.xlsx")
+
+    df = ohne_leere_produktnamen(df)
+
+    # Ergebnis speichern
+    df.to_excel("3Rohdaten_ohneLeereProduktnamen.xlsx", index=False)
+
+    print("✅ Fertig! Alle Zeilen ohne Produktname wurden gelöscht.")
+    print("Neue Größe der Tabelle:", df.shape)